@@ -0,0 +1,193 @@
+"""
+Adaptive Waits
+
+Replaces fixed time.sleep calls and implicit waits with polling for concrete DOM conditions
+(feed posts rendered, dialog present, dialog gone, ...).
+
+Every named condition learns its typical latency (an exponentially weighted average that is kept
+across runs in a JSON file), and polling starts close to that latency and then backs off
+exponentially, so fast conditions return almost immediately and slow ones do not hammer
+chromedriver.  The time spent waiting versus working is recorded for the end-of-run summary.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from selenium.common import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from selector_registry import registry
+
+
+class ConditionStats:
+    """Learned latency and counters for one named condition."""
+
+    def __init__(self, average: Optional[float] = None, samples: int = 0):
+        self.average = average  # seconds, exponentially weighted
+        self.samples = samples
+        self.met = 0  # successful waits in this run
+        self.timeouts = 0
+        self.polls = 0
+        self.waited = 0.0  # seconds spent waiting on this condition in this run
+
+    def learn(self, seconds: float, weight: float = 0.2) -> None:
+        self.average = seconds if self.average is None else (1 - weight) * self.average + weight * seconds
+        self.samples += 1
+
+
+class AdaptiveWaits:
+    """
+    Polls conditions with exponential backoff, seeded by the latency learned for each condition.
+
+    Args:
+        min_interval: Shortest pause between two polls, in seconds.
+        max_interval: Longest pause between two polls, in seconds.
+        backoff: Factor the pause grows by after every unsuccessful poll.
+    """
+
+    def __init__(self, min_interval: float = 0.05, max_interval: float = 1.0, backoff: float = 1.6):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.conditions: dict[str, ConditionStats] = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _stats(self, name: str) -> ConditionStats:
+        with self._lock:
+            if name not in self.conditions:
+                self.conditions[name] = ConditionStats()
+            return self.conditions[name]
+
+    def until(self, driver: WebDriver, name: str, condition: Callable[[WebDriver], Any], timeout: float = 10.0) -> Any:
+        """
+        Polls condition(driver) until it returns a truthy value, like WebDriverWait.until.
+
+        Args:
+            driver: The WebDriver instance.
+            name: The condition's name, used to learn its latency and in the summary.
+            condition: Called with the driver, NoSuchElementException and StaleElementReferenceException count as False.
+            timeout: Maximum seconds to wait.
+
+        Returns:
+            The truthy value returned by condition.
+
+        Raises:
+            TimeoutException: If the condition did not become truthy within timeout.
+        """
+        stats = self._stats(name)
+        started = time.monotonic()
+        deadline = started + timeout
+
+        # the first pause is a fraction of the learned latency, later pauses grow exponentially
+        interval = self.min_interval if stats.average is None else stats.average / 2
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        try:
+            while True:
+                stats.polls += 1
+                try:
+                    value = condition(driver)
+                    if value:
+                        stats.learn(time.monotonic() - started)
+                        stats.met += 1
+                        return value
+                except (NoSuchElementException, StaleElementReferenceException):
+                    pass
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    stats.timeouts += 1
+                    raise TimeoutException(f"Condition '{name}' not met after {timeout} seconds.")
+                time.sleep(min(interval, remaining))
+                interval = min(interval * self.backoff, self.max_interval)
+        finally:
+            stats.waited += time.monotonic() - started
+
+    def pause(self, driver: WebDriver, name: str, condition: Callable[[WebDriver], Any], timeout: float = 2.0) -> Any:
+        """Same as until, but a timeout is not an error (returns None), for waits that replace a fixed sleep."""
+        try:
+            return self.until(driver, name, condition, timeout)
+        except TimeoutException:
+            return None
+
+    def total_waited(self) -> float:
+        return sum(stats.waited for stats in self.conditions.values())
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        waited = self.total_waited()
+        lines = [f"{'condition':<22}{'waits':>7}{'timeouts':>10}{'polls':>8}{'learned ms':>12}{'waited s':>10}"]
+        for name, stats in sorted(self.conditions.items()):
+            learned = f"{stats.average * 1000:.0f}" if stats.average is not None else "-"
+            lines.append(f"{name:<22}{stats.met:>7}{stats.timeouts:>10}{stats.polls:>8}{learned:>12}{stats.waited:>10.1f}")
+        lines.append(f"waiting {waited:.1f}s / working {max(elapsed - waited, 0):.1f}s")
+        return "\n".join(lines)
+
+    def load(self, file_path: str) -> None:
+        """Loads the latencies learned in previous runs."""
+        if not file_path or not os.path.exists(file_path):
+            return
+        try:
+            with open(file_path, "r") as f:
+                saved = json.load(f)
+            for name, values in saved.items():
+                self.conditions[name] = ConditionStats(values.get("average"), values.get("samples", 0))
+        except Exception as e:
+            print(f"Could not load wait statistics from {file_path}: {e}")
+
+    def save(self, file_path: str) -> None:
+        """Stores the learned latencies for the next run."""
+        if not file_path:
+            return
+        try:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(file_path, "w") as f:
+                json.dump({name: {"average": stats.average, "samples": stats.samples}
+                           for name, stats in self.conditions.items() if stats.average is not None}, f, indent=4)
+        except Exception as e:
+            print(f"Could not save wait statistics to {file_path}: {e}")
+
+
+# Shared instance used by scraper_functions and main.py
+waits = AdaptiveWaits()
+
+
+# ------------------------------------------------
+# CONDITIONS
+# ------------------------------------------------
+
+def page_loaded(d: WebDriver) -> bool:
+    return d.execute_script("return document.readyState") == "complete"
+
+
+def feed_posts_rendered(d: WebDriver) -> bool:
+    """True once the feed has posts and every post has rendered its author (i.e. it is no longer a placeholder)."""
+    return d.execute_script("""
+        const feed = document.querySelector('div[role="feed"]');
+        if (!feed) return false;
+        const posts = feed.querySelectorAll(':scope > div [aria-posinset]');
+        if (!posts.length) return false;
+        for (const post of posts) {
+            if (!post.querySelector('[data-ad-rendering-role="profile_name"]')) return false;
+        }
+        return true;
+    """)
+
+
+def dialog_present(d: WebDriver):
+    elements = d.find_elements(By.XPATH, registry.xpath("pop_up_whole_window_class_obj"))
+    return elements[0] if elements else False
+
+
+def dialog_gone(d: WebDriver) -> bool:
+    return not d.find_elements(By.XPATH, registry.xpath("pop_up_whole_window_class_obj"))
+
+
+def url_changed(previous_url: str) -> Callable[[WebDriver], bool]:
+    return lambda d: d.current_url != previous_url
@@ -0,0 +1,348 @@
+"""
+Benchmark Suite
+
+Scrapes synthetic groups served by the replay server (see replay_server.py) with headless Chrome
+and reports where the time goes:
+- throughput (posts per minute) and the time for driver_init and the first page load
+- p50/p95/p99 latency of every scrape_feed stage (scroll, open, extract, close, remove, ...)
+  and of storage (the StoragePipeline 'store' stage, writing to the chosen output format)
+- chromedriver commands per post, in total and per command
+- peak RSS of this Python process and of chromedriver + Chrome
+
+Every run is written to a JSON file, two files can be compared:
+    python benchmark.py run --groups 20x5,50x20 --modes selenium,js,offline --output bench/current.json
+    python benchmark.py compare bench/baseline.json bench/current.json
+
+Cold start is measured separately: every module is imported in a fresh interpreter with
+'python -X importtime', and the median import time is reported with the packages that cost the
+most (main.py itself starts scraping when imported, scraper_functions is what it imports):
+    python benchmark.py startup --modules scraper_functions,worker_pool --output bench/startup.json --max-ms 400
+Startup files are compared with the same 'compare' command.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+import psutil
+from colorama import Fore, Style
+
+from replay_server import ReplayServer, generate_fixtures, render_feed_card, render_dialog, compare_posts
+
+
+class PeakMemory:
+    """Samples the RSS of this process and of the browser's process tree in a background thread."""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.browser_pid: Optional[int] = None
+        self.python_peak = 0
+        self.browser_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="peak-memory", daemon=True)
+
+    def sample(self) -> None:
+        self.python_peak = max(self.python_peak, psutil.Process().memory_info().rss)
+        if self.browser_pid is None:
+            return
+        try:
+            root = psutil.Process(self.browser_pid)
+            total = 0
+            for process in [root] + root.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.browser_peak = max(self.browser_peak, total)
+        except psutil.Error:
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self) -> "PeakMemory":
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def count_commands(driver) -> Counter:
+    """Counts every command sent to chromedriver from now on (WebElement calls go through driver.execute too)."""
+    counts: Counter = Counter()
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counts[driver_command] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counts
+
+
+def run_case(posts: int, comments: int, extraction_mode: str = "selenium", output_format: str = "jsonl",
+             feed_batch: int = 5, comment_batch: int = 10, latency: Optional[dict] = None, headless: bool = True,
+             seed: int = 0) -> dict:
+    """
+    Scrapes one synthetic group of 'posts' posts with 'comments' comments each.
+
+    Returns:
+        The measurements of this case (see the module docstring), JSON serializable.
+    """
+    from selenium.webdriver import ActionChains
+    from scraper_functions import driver_init, scrape_feed
+    from pipeline import StageStats, StoragePipeline
+    from output_sinks import open_sink
+
+    expected = generate_fixtures(posts, comments, seed)
+    fixtures = [{"name": str(index), "feed_html": render_feed_card(post, index + 1), "dialog_html": render_dialog(post),
+                 "expected": post} for index, post in enumerate(expected)]
+    stats = StageStats()
+    scraped: list[dict] = []
+
+    with tempfile.TemporaryDirectory() as directory, PeakMemory() as memory, \
+            ReplayServer(fixtures, feed_batch=feed_batch, comment_batch=comment_batch, latency=latency) as server:
+        sink = open_sink(os.path.join(directory, f"bench.{output_format}"), output_format)
+        storage = StoragePipeline(sink, stats=stats)
+
+        def on_post(post_info: dict) -> None:
+            scraped.append(post_info)
+            storage.submit(post_info)
+
+        started = time.perf_counter()
+        driver = driver_init(headless=headless)
+        stats.record("driver_init", time.perf_counter() - started)
+        try:
+            memory.browser_pid = driver.service.process.pid
+            commands = count_commands(driver)
+            driver.implicitly_wait(0)
+            with stats.time("page_load"):
+                driver.get(server.url)
+
+            scrape_started = time.perf_counter()
+            scrape_feed(driver, ActionChains(driver), on_post, extraction_mode=extraction_mode, stats=stats)
+            scrape_seconds = time.perf_counter() - scrape_started
+            memory.sample()
+        finally:
+            driver.quit()
+            storage.close()
+            sink.close()
+
+    total_commands = sum(commands.values())
+    return {
+        "posts": posts,
+        "comments_per_post": comments,
+        "extraction_mode": extraction_mode,
+        "output_format": output_format,
+        "scraped": len(scraped),
+        "mismatches": len(compare_posts(expected, scraped)),
+        "scrape_seconds": scrape_seconds,
+        "posts_per_minute": len(scraped) / scrape_seconds * 60 if scrape_seconds else 0.0,
+        "stages": stats.as_dict(),
+        "commands_total": total_commands,
+        "commands_per_post": total_commands / len(scraped) if scraped else None,
+        "commands": dict(commands.most_common()),
+        "peak_rss_python_mb": memory.python_peak / 2 ** 20,
+        "peak_rss_browser_mb": memory.browser_peak / 2 ** 20,
+    }
+
+
+def run_suite(groups: list[tuple[int, int]], modes: list[str], repeat: int = 1, **options) -> dict:
+    """Runs every (posts, comments) group in every extraction mode 'repeat' times."""
+    import selenium
+
+    cases = []
+    for posts, comments in groups:
+        for mode in modes:
+            for run in range(repeat):
+                print(f"{Fore.BLUE}{posts} posts x {comments} comments, {mode}, run {run + 1}/{repeat}{Style.RESET_ALL}")
+                case = run_case(posts, comments, extraction_mode=mode, **options)
+                case["run"] = run
+                cases.append(case)
+                print(f"  {case['posts_per_minute']:.1f} posts/min, {case['commands_per_post'] or 0:.1f} commands/post, "
+                      f"{case['mismatches']} mismatches")
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "selenium": selenium.__version__,
+        "platform": platform.platform(),
+        "options": options,
+        "cases": cases,
+    }
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """{module: (self microseconds, cumulative microseconds)} from the stderr of 'python -X importtime'."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not self_time.strip().isdigit():  # the header line
+            continue
+        modules[name.strip()] = (int(self_time), int(cumulative))
+    return modules
+
+
+def measure_startup(modules: list[str], repeat: int = 5, top: int = 10) -> dict:
+    """
+    Imports every module in a fresh interpreter 'repeat' times.
+
+    Returns:
+        {module: {"median_ms", "min_ms", "runs_ms", "packages_ms"}}, packages_ms being the self time of the 'top'
+        slowest top-level packages in the median run.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        runs = []
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                       cwd=directory, capture_output=True, text=True)
+            imports = parse_importtime(completed.stderr)
+            if completed.returncode != 0 or module not in imports:
+                raise RuntimeError(f"Could not import {module}:\n{completed.stderr[-2000:]}")
+            runs.append((imports[module][1], imports))
+
+        runs.sort(key=lambda run: run[0])
+        median_imports = runs[len(runs) // 2][1]
+        packages: Counter = Counter()
+        for name, (self_time, _) in median_imports.items():
+            packages[name.split(".")[0]] += self_time
+        results[module] = {
+            "median_ms": statistics.median(run[0] for run in runs) / 1000,
+            "min_ms": runs[0][0] / 1000,
+            "runs_ms": [run[0] / 1000 for run in runs],
+            "packages_ms": {name: micros / 1000 for name, micros in packages.most_common(top)},
+        }
+        print(f"{module}: {results[module]['median_ms']:.0f} ms (median of {repeat})")
+        for name, milliseconds in results[module]["packages_ms"].items():
+            print(f"    {name:<30}{milliseconds:>8.1f} ms")
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "startup": results,
+    }
+
+
+def compare_startup(baseline: dict, current: dict) -> str:
+    """A table of the median import times of two startup files."""
+    lines = [f"{'module':<24}{'median ms':>22}"]
+    for module, result in current["startup"].items():
+        before = baseline["startup"].get(module)
+        if before is not None:
+            change = f"{before['median_ms']:.0f} -> {result['median_ms']:.0f}"
+            lines.append(f"{module:<24}{change:>22}")
+    return "\n".join(lines)
+
+
+def _case_key(case: dict) -> tuple:
+    return case["posts"], case["comments_per_post"], case["extraction_mode"], case.get("run", 0)
+
+
+def compare_results(baseline: dict, current: dict) -> str:
+    """A table of the headline numbers of two result files, matched by group size, mode and run."""
+    baseline_cases = {_case_key(case): case for case in baseline["cases"]}
+    lines = [f"{'case':<24}{'posts/min':>22}{'commands/post':>22}{'extract p95 ms':>22}{'browser MB':>20}"]
+    for case in current["cases"]:
+        before = baseline_cases.get(_case_key(case))
+        if before is None:
+            continue
+
+        def pair(value_before, value_after, scale: float = 1.0) -> str:
+            if value_before is None or value_after is None:
+                return "-"
+            return f"{value_before * scale:.1f} -> {value_after * scale:.1f}"
+
+        name = f"{case['posts']}x{case['comments_per_post']} {case['extraction_mode']}"
+        lines.append(f"{name:<24}{pair(before['posts_per_minute'], case['posts_per_minute']):>22}"
+                     f"{pair(before['commands_per_post'], case['commands_per_post']):>22}"
+                     f"{pair(before['stages'].get('extract', {}).get('p95'), case['stages'].get('extract', {}).get('p95'), 1000):>22}"
+                     f"{pair(before['peak_rss_browser_mb'], case['peak_rss_browser_mb']):>20}")
+    return "\n".join(lines)
+
+
+def _parse_groups(value: str) -> list[tuple[int, int]]:
+    groups = []
+    for item in value.split(","):
+        posts, _, comments = item.strip().partition("x")
+        groups.append((int(posts), int(comments or 0)))
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against synthetic replay groups.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite.")
+    run_parser.add_argument("--groups", default="20x5,50x20", help="posts x comments per post, comma separated")
+    run_parser.add_argument("--modes", default="selenium,js,offline")
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--output-format", default="jsonl")
+    run_parser.add_argument("--feed-batch", type=int, default=5)
+    run_parser.add_argument("--comment-batch", type=int, default=10)
+    run_parser.add_argument("--feed-latency", type=float, default=0.0)
+    run_parser.add_argument("--dialog-latency", type=float, default=0.0)
+    run_parser.add_argument("--comment-latency", type=float, default=0.0)
+    run_parser.add_argument("--output", default="bench/results.json")
+
+    startup_parser = subparsers.add_parser("startup", help="Measure the import time of modules.")
+    startup_parser.add_argument("--modules", default="scraper_functions,worker_pool,replay_server,offline_parser")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--max-ms", type=float, default=0.0,
+                                help="exit with status 1 if a module's median import time exceeds this (0 = no limit)")
+    startup_parser.add_argument("--output", default="bench/startup.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(_parse_groups(args.groups), [mode.strip() for mode in args.modes.split(",")],
+                            repeat=args.repeat, output_format=args.output_format, feed_batch=args.feed_batch,
+                            comment_batch=args.comment_batch,
+                            latency={"feed": args.feed_latency, "dialog": args.dialog_latency,
+                                     "comments": args.comment_latency})
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"{Fore.GREEN}Results written to {args.output}{Style.RESET_ALL}")
+    elif args.command == "startup":
+        results = measure_startup([module.strip() for module in args.modules.split(",")], repeat=args.repeat)
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"{Fore.GREEN}Results written to {args.output}{Style.RESET_ALL}")
+        slow = [module for module, result in results["startup"].items()
+                if args.max_ms and result["median_ms"] > args.max_ms]
+        if slow:
+            print(f"{Fore.RED}Over the {args.max_ms:.0f} ms startup budget: {', '.join(slow)}{Style.RESET_ALL}")
+            sys.exit(1)
+    elif args.command == "compare":
+        with open(args.baseline, "r") as f:
+            baseline_results = json.load(f)
+        with open(args.current, "r") as f:
+            current_results = json.load(f)
+        if "startup" in baseline_results and "startup" in current_results:
+            print(compare_startup(baseline_results, current_results))
+        else:
+            print(compare_results(baseline_results, current_results))
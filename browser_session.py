@@ -0,0 +1,135 @@
+"""
+Browser Session
+
+Keeps one Chrome running between scraper runs, so a short incremental crawl does not pay for a
+cold browser launch and a fresh login every time.
+
+With 'debugger_address' set in settings.json (e.g. "127.0.0.1:9222") main.py attaches to the
+Chrome listening there instead of launching a new one.  If nothing is listening, that Chrome is
+started detached from the scraper with its own persistent profile ('browser_profile_dir'), so it
+keeps running, logged in, after the run ends (chromedriver does not close a browser it attached
+to).  With 'cookie_based_login_check' the attached browser's session is validated first (the
+c_user cookie on facebook.com, no login or checkpoint page), and the cookie login only runs when
+it is invalid.
+
+The browser can also be started or checked by hand:
+    python browser_session.py start --address 127.0.0.1:9222 --profile storage/chrome-profile
+    python browser_session.py status --address 127.0.0.1:9222
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from colorama import Fore, Style
+
+chrome_names = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+chrome_paths = (
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    os.path.expandvars(r"%ProgramFiles%\Google\Chrome\Application\chrome.exe"),
+    os.path.expandvars(r"%ProgramFiles(x86)%\Google\Chrome\Application\chrome.exe"),
+)
+
+
+def chrome_binary() -> Optional[str]:
+    """The path of the installed Chrome/Chromium, None if it cannot be found."""
+    for name in chrome_names:
+        path = shutil.which(name)
+        if path:
+            return path
+    return next((path for path in chrome_paths if os.path.exists(path)), None)
+
+
+def browser_version(address: str, timeout: float = 1.0) -> Optional[dict]:
+    """
+    Returns:
+        The /json/version info of the Chrome listening on address ("host:port"), None if nothing answers.
+    """
+    try:
+        with urllib.request.urlopen(f"http://{address}/json/version", timeout=timeout) as response:
+            return json.load(response)
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def launch_browser(address: str, profile_dir: str, headless: bool = False, binary: str = "",
+                   timeout: float = 15.0) -> bool:
+    """
+    Starts Chrome with remote debugging on address, detached from this process so it outlives the run.
+
+    Args:
+        address: "host:port", only the port is used (Chrome listens on localhost).
+        profile_dir: The persistent user-data-dir (cookies and cache survive restarts).
+        headless: Run Chrome without a window.
+        binary: The Chrome executable, found with chrome_binary() if empty.
+        timeout: Seconds to wait until the debugging port answers.
+
+    Returns:
+        True if Chrome is listening on address.
+    """
+    binary = binary or chrome_binary()
+    if not binary:
+        print(f"{Fore.RED}Could not find Chrome to start on {address}.{Style.RESET_ALL}")
+        return False
+    port = address.rpartition(":")[2]
+    arguments = [binary, f"--remote-debugging-port={port}", f"--user-data-dir={os.path.abspath(profile_dir)}",
+                 "--no-first-run", "--no-default-browser-check", "--disable-blink-features=AutomationControlled",
+                 "--disable-notifications", "--disable-dev-shm-usage"]
+    if headless:
+        arguments.append("--headless=new")
+    os.makedirs(profile_dir, exist_ok=True)
+    try:
+        if sys.platform == "win32":
+            subprocess.Popen(arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            subprocess.Popen(arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    except OSError as e:
+        print(f"{Fore.RED}Could not start Chrome: {e}{Style.RESET_ALL}")
+        return False
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if browser_version(address) is not None:
+            print(f"{Fore.GREEN}Started Chrome on {address} with the profile {profile_dir}{Style.RESET_ALL}")
+            return True
+        time.sleep(0.2)
+    print(f"{Fore.RED}Chrome did not open its debugging port {address} within {timeout:.0f} s.{Style.RESET_ALL}")
+    return False
+
+
+def ensure_browser(address: str, profile_dir: str, headless: bool = False) -> bool:
+    """
+    Returns:
+        True if a Chrome is listening on address, started with launch_browser if none was.
+    """
+    if browser_version(address) is not None:
+        return True
+    return launch_browser(address, profile_dir, headless=headless)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start or check the long-lived Chrome the scraper attaches to.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    start_parser = subparsers.add_parser("start", help="Start Chrome with remote debugging (if it is not running).")
+    start_parser.add_argument("--address", default="127.0.0.1:9222")
+    start_parser.add_argument("--profile", default="storage/chrome-profile")
+    start_parser.add_argument("--headless", action="store_true")
+    status_parser = subparsers.add_parser("status", help="Show the Chrome listening on an address.")
+    status_parser.add_argument("--address", default="127.0.0.1:9222")
+    args = parser.parse_args()
+
+    if args.command == "start":
+        sys.exit(0 if ensure_browser(args.address, args.profile, headless=args.headless) else 1)
+    elif args.command == "status":
+        version = browser_version(args.address)
+        if version is None:
+            print(f"{Fore.YELLOW}Nothing is listening on {args.address}.{Style.RESET_ALL}")
+            sys.exit(1)
+        print(f"{version.get('Browser', 'Chrome')} on {args.address}")
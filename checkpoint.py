@@ -0,0 +1,189 @@
+"""
+Crawl Checkpoints
+
+Records the progress of a group crawl so a crashed or stopped run can resume without re-opening
+every post, and so recurring crawls of chronological groups become incremental.
+
+Each group has its own checkpoint file (storage/checkpoint.<group hash>.json) holding only scalars and two short lists:
+- last_post_date:    the date of the last scraped post
+- scroll_depth:      how many feed posts the crawl has passed
+- crawl_newest:      the first 'marks' posts of the current crawl
+- high_water_marks:  the first 'marks' posts of the last crawl that completed
+- complete:          whether the current crawl reached the end of the feed (or a high-water mark)
+
+Several marks are kept so the next crawl still stops if one of those posts was deleted.  Pinned or
+featured posts are shown at the top out of order, they never become marks and never stop a crawl.
+
+The file is written atomically (temporary file + os.replace) every 'every' posts.
+
+The feed-card fingerprints of the posts already handled are not part of it: they are kept in a
+DedupIndex next to it (storage/checkpoint.<group hash>.known.db/.bloom), so memory and the cost of
+a save stay the same however many posts the group has.
+"""
+import hashlib
+import json
+import os
+import time
+
+from colorama import Fore, Style
+
+from dedup import DedupIndex
+
+
+def checkpoint_path(base_path: str, group_link: str) -> str:
+    """Returns the per-group checkpoint file, e.g. storage/checkpoint.json -> storage/checkpoint.1a2b3c4d5e.json."""
+    root, extension = os.path.splitext(base_path)
+    digest = hashlib.sha1(group_link.encode("utf-8")).hexdigest()[:10]
+    return f"{root}.{digest}{extension or '.json'}"
+
+
+def known_path(file_path: str) -> str:
+    """Returns the base path of a checkpoint's known-post index, e.g. checkpoint.1a2b.json -> checkpoint.1a2b.known."""
+    return os.path.splitext(file_path)[0] + ".known"
+
+
+def _as_list(value) -> list[str]:
+    """A stored list of fingerprints, older checkpoints stored a single one."""
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def is_chronological(group_link: str) -> bool:
+    return "sorting_setting=CHRONOLOGICAL" in group_link
+
+
+class Checkpoint:
+    """
+    Progress of one group crawl.
+
+    Args:
+        file_path: The checkpoint file of this group (see checkpoint_path).
+        group_link: The group being crawled.
+        every: Save after this many handled posts.
+        resume: Load the existing file, otherwise start from scratch.
+        known_capacity: Expected number of posts in the group, sizes the known-post index.
+        marks: How many of the newest posts of a crawl are kept as the next crawl's high-water marks.
+    """
+
+    def __init__(self, file_path: str, group_link: str, every: int = 25, resume: bool = True,
+                 known_capacity: int = 1_000_000, marks: int = 5):
+        self.file_path = file_path
+        self.group_link = group_link
+        self.every = max(1, every)
+        self.chronological = is_chronological(group_link)
+        self.marks = max(1, marks)
+
+        self.last_post_date = ""
+        self.scroll_depth = 0
+        self.posts_processed = 0
+        self.crawl_newest: list[str] = []
+        self.high_water_marks: list[str] = []
+        self.complete = False
+        self._unsaved = 0
+
+        if not resume:
+            for extension in (".db", ".db-wal", ".db-shm", ".bloom"):
+                if os.path.exists(known_path(file_path) + extension):
+                    os.remove(known_path(file_path) + extension)
+        self.known = DedupIndex(known_path(file_path), capacity=known_capacity)
+
+        if resume:
+            self.load()
+
+        # A completed crawl is the baseline of the next one: a new crawl starts at the top of the feed
+        if self.complete:
+            self.high_water_marks = self.crawl_newest or self.high_water_marks
+            self.crawl_newest = []
+            self.scroll_depth = 0
+            self.complete = False
+
+    def load(self) -> None:
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r") as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"{Fore.RED}Could not read the checkpoint {self.file_path}, starting fresh: {e}{Style.RESET_ALL}")
+            return
+        if state.get("group_link") != self.group_link:
+            return
+
+        self.last_post_date = state.get("last_post_date", "")
+        self.scroll_depth = state.get("scroll_depth", 0)
+        self.posts_processed = state.get("posts_processed", 0)
+        self.crawl_newest = _as_list(state.get("crawl_newest"))
+        self.high_water_marks = _as_list(state.get("high_water_marks", state.get("high_water_mark")))
+        self.complete = state.get("complete", False)
+        print(f"{Fore.GREEN}Resuming from checkpoint: {self.posts_processed} posts processed, "
+              f"depth {self.scroll_depth}, last post date '{self.last_post_date}'.{Style.RESET_ALL}")
+
+    def save(self) -> None:
+        """
+        Writes the checkpoint atomically, a crash while writing leaves the previous file intact.  The known-post index
+        is committed first, so the file never records progress the index does not have.
+        """
+        self.known.flush()
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = {
+            "group_link": self.group_link,
+            "updated": time.time(),
+            "last_post_date": self.last_post_date,
+            "scroll_depth": self.scroll_depth,
+            "posts_processed": self.posts_processed,
+            "crawl_newest": self.crawl_newest,
+            "high_water_marks": self.high_water_marks,
+            "complete": self.complete,
+        }
+        temporary_path = self.file_path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.file_path)
+        self._unsaved = 0
+
+    def is_known(self, fingerprint: str) -> bool:
+        return self.known.seen(fingerprint)
+
+    def reached_high_water_mark(self, fingerprint: str, pinned: bool = False) -> bool:
+        """
+        In chronological groups everything below the newest posts of the last completed crawl has been scraped,
+        so the crawl can stop at the first of them.  A pinned post is never a mark.
+        """
+        return self.chronological and not pinned and fingerprint in self.high_water_marks
+
+    def _note_newest(self, fingerprint: str, pinned: bool) -> None:
+        if fingerprint and not pinned and len(self.crawl_newest) < self.marks and fingerprint not in self.crawl_newest:
+            self.crawl_newest.append(fingerprint)
+
+    def passed(self, fingerprint: str = "", pinned: bool = False) -> None:
+        """Counts a feed post that was skipped (known) without scraping it."""
+        self._note_newest(fingerprint, pinned)
+        self.scroll_depth += 1
+
+    def record(self, fingerprint: str, date: str = "", pinned: bool = False) -> None:
+        """Marks a post as handled and saves every 'every' posts."""
+        self._note_newest(fingerprint, pinned)
+        self.known.add(fingerprint)
+        self.scroll_depth += 1
+        self.posts_processed += 1
+        if date:
+            self.last_post_date = date
+
+        self._unsaved += 1
+        if self._unsaved >= self.every:
+            self.save()
+
+    def finish(self) -> None:
+        """Marks the crawl as complete (end of feed or high-water mark reached) and saves."""
+        self.complete = True
+        self.save()
+
+    def close(self) -> None:
+        """Saves the checkpoint and closes the known-post index."""
+        self.save()
+        self.known.close()
@@ -1,8 +1,9 @@
-from constants import *
+import sys
 
-html_class = poster_info_class
+from selector_registry import registry
 
-html_class = html_class.split()
+# python class_to_css_selector.py [constant name], e.g. poster_info_class
+name = sys.argv[1] if len(sys.argv) > 1 else "poster_info_class"
 
-css_selector = '.' + '.'.join(html_class)
+css_selector = registry.css(name)
 print(css_selector)
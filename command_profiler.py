@@ -0,0 +1,140 @@
+"""
+WebDriver Command Profiler
+
+Counts and times every command sent to chromedriver and attributes it to the scraper function
+that issued it.  Every WebElement call (find_element, .text, .size, click, ...) and every
+ActionChains.perform goes through driver.execute, so wrapping that one method covers them all.
+
+Each command is recorded under the call stack of the scraper's own functions, e.g.
+scrape_feed;pop_up_scrape;scrape_for_post_info;findElement.  Only frames of the top-level modules
+next to this file count, so selenium, the standard library and a virtualenv inside the repository
+are left out.
+At the end of the run the profile is written in the folded-stack format, with the time in
+microseconds as the weight, so it can be rendered by flamegraph.pl or speedscope:
+    flamegraph.pl --countname=us storage/webdriver_profile.folded > profile.svg
+
+main.py turns the profiler on when 'debug' is set in settings.json.
+"""
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+_repo_dir = os.path.dirname(os.path.abspath(__file__))
+_this_file = os.path.abspath(__file__)
+# Installed packages and the standard library, in case an environment lives inside the repository
+_library_dirs = tuple({os.path.abspath(path) for name, path in sysconfig.get_paths().items()
+                       if name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+@lru_cache(maxsize=None)
+def _is_scraper_file(file_name: str) -> bool:
+    """
+    Whether a code file is one of the scraper's top-level modules (not a package, a test, a virtualenv, or a
+    pseudo-file like '<frozen runpy>' that abspath would place in the current directory).
+    """
+    if not file_name.endswith(".py"):
+        return False
+    file_name = os.path.abspath(file_name)
+    if file_name == _this_file or os.path.dirname(file_name) != _repo_dir:
+        return False
+    return not any(file_name.startswith(directory + os.sep) for directory in _library_dirs)
+
+
+class CommandProfiler:
+    """
+    Wraps driver.execute to count and time every WebDriver command per call stack.
+
+    Args:
+        driver: The WebDriver returned by driver_init.
+        max_depth: Maximum number of scraper frames kept per stack.
+    """
+
+    def __init__(self, driver: WebDriver, max_depth: int = 12):
+        self.driver = driver
+        self.max_depth = max_depth
+        self.started = time.perf_counter()
+        # (scraper frames..., command) -> [count, seconds]
+        self.stacks: dict[tuple[str, ...], list] = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+        self._execute = driver.execute
+        driver.execute = self._profiled_execute
+
+    def _call_stack(self) -> tuple[str, ...]:
+        frames = []
+        frame = sys._getframe(2)
+        while frame is not None and len(frames) < self.max_depth:
+            file_name = frame.f_code.co_filename
+            if _is_scraper_file(file_name):
+                name = frame.f_code.co_name
+                if name == "<module>":
+                    name = os.path.splitext(os.path.basename(file_name))[0]
+                frames.append(name)
+            frame = frame.f_back
+        return tuple(reversed(frames))
+
+    def _profiled_execute(self, driver_command: str, params: Optional[dict] = None):
+        stack = self._call_stack() + (driver_command,)
+        started = time.perf_counter()
+        try:
+            return self._execute(driver_command, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self.stacks[stack]
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def stop(self) -> None:
+        """Restores the original driver.execute."""
+        self.driver.execute = self._execute
+
+    def by_call_site(self) -> dict[str, list]:
+        """{innermost scraper function: [count, seconds]}"""
+        totals: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        with self._lock:
+            for stack, (count, seconds) in self.stacks.items():
+                site = stack[-2] if len(stack) > 1 else "<unknown>"
+                totals[site][0] += count
+                totals[site][1] += seconds
+        return dict(totals)
+
+    def by_command(self) -> dict[str, list]:
+        """{WebDriver command: [count, seconds]}"""
+        totals: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        with self._lock:
+            for stack, (count, seconds) in self.stacks.items():
+                totals[stack[-1]][0] += count
+                totals[stack[-1]][1] += seconds
+        return dict(totals)
+
+    def summary(self, limit: int = 20) -> str:
+        def table(title: str, rows: dict[str, list]) -> list[str]:
+            lines = [f"{title:<36}{'calls':>8}{'total s':>10}{'mean ms':>10}"]
+            for name, (count, seconds) in sorted(rows.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+                lines.append(f"{name[:35]:<36}{count:>8}{seconds:>10.2f}{seconds / count * 1000:>10.1f}")
+            return lines
+
+        calls = sum(count for count, _ in self.stacks.values())
+        seconds = sum(total for _, total in self.stacks.values())
+        elapsed = time.perf_counter() - self.started
+        lines = table("call site", self.by_call_site()) + [""] + table("command", self.by_command())
+        lines.append(f"{calls} WebDriver commands, {seconds:.1f}s of {elapsed:.1f}s spent in chromedriver round trips")
+        return "\n".join(lines)
+
+    def write_folded(self, file_path: str) -> None:
+        """Writes the profile as folded stacks ('frame;frame;command microseconds' per line)."""
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            lines = [f"{';'.join(stack)} {max(1, int(seconds * 1_000_000))}"
+                     for stack, (count, seconds) in sorted(self.stacks.items())]
+        with open(file_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
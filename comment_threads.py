@@ -0,0 +1,242 @@
+"""
+Comment Thread Expansion
+
+Loads the comments of an opened popup, including the nested replies hidden behind
+"View 3 replies" / "View more replies" / "View more comments" buttons.
+
+Each pass is one execute_script call that clicks every rendered expander in the comment section
+and scrolls the comment loader into view.  Between passes the scraper waits until the page has
+settled (no fetch/XHR request started in the last few seconds is still in flight, and either new
+comments arrived or the loader is gone) instead of spinning on the loader's size.
+
+Requests are counted by wrapping window.fetch and XMLHttpRequest.prototype.send for the duration
+of one post's expansion only, the page's own functions are put back when it ends.  (The DevTools
+Network events would avoid the wrapper, but they are only recorded in the performance log with
+capture_network or a resource policy, and that log can be read only once by its single consumer.)
+
+Loading stops when nothing is left to expand, when 'max_comments' comments are loaded, or after
+'comment_timeout' seconds, so a single huge thread cannot stall the whole crawl.
+
+Replies are extracted with a reference to the comment they answer: every comment dict gets a
+'parent' key with the index of its parent comment in the post's comment list (None for top-level
+comments).  A reply is a comment inside an element whose preceding sibling is its parent comment,
+which is how both Facebook and the replay server nest reply lists.
+"""
+import time
+from typing import Optional
+
+from colorama import Fore, Style
+from selenium.common import JavascriptException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from adaptive_wait import waits
+from selector_registry import registry
+
+# The text of buttons that load more comments or replies, e.g. "View all 12 replies", "View 1 reply",
+# "View more replies", "View more comments", "See previous comments"
+expander_pattern = r"^(view|see)\s+(all\s+|more\s+|previous\s+|\d+\s+)*(more\s+)?(repl(y|ies)|comments?)\b"
+
+# Counts the fetch/XHR requests in flight while one post's comments are expanded.  The page's own window.fetch and
+# XMLHttpRequest.prototype.send are kept and put back by js_untrack_requests.
+js_track_requests = """
+if (window.__scraperRequests) return true;
+const state = window.__scraperRequests = {next: 0, started: new Map()};
+function track() {
+    const id = state.next++;
+    state.started.set(id, performance.now());
+    return () => state.started.delete(id);
+}
+const originalFetch = window.fetch;
+if (originalFetch) {
+    state.fetch = originalFetch;
+    state.trackedFetch = window.fetch = function (...args) {
+        const done = track();
+        return originalFetch.apply(this, args).finally(done);
+    };
+}
+const originalSend = XMLHttpRequest.prototype.send;
+state.send = originalSend;
+state.trackedSend = XMLHttpRequest.prototype.send = function (...args) {
+    this.addEventListener('loadend', track(), {once: true});
+    return originalSend.apply(this, args);
+};
+return true;
+"""
+
+# Puts the page's fetch and XMLHttpRequest.prototype.send back, unless the page replaced them in the meantime (its
+# wrapper still calls ours, which keeps working without the state).  Returns false if one could not be restored.
+js_untrack_requests = """
+const state = window.__scraperRequests;
+if (!state) return true;
+delete window.__scraperRequests;
+let restored = true;
+if (state.trackedFetch) {
+    if (window.fetch === state.trackedFetch) window.fetch = state.fetch;
+    else restored = false;
+}
+if (XMLHttpRequest.prototype.send === state.trackedSend) XMLHttpRequest.prototype.send = state.send;
+else restored = false;
+return restored;
+"""
+
+# Shared by the expansion pass and the settled check
+_js_comment_state = """
+function first(xpath, context) {
+    return document.evaluate(xpath, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function countComments(popup, xpaths) {
+    const container = first(xpaths.comment_container, popup);
+    if (!container) return 0;
+    return document.evaluate('count(' + xpaths.comment + ')', container, null, XPathResult.NUMBER_TYPE, null).numberValue;
+}
+function loaderVisible(popup, xpaths) {
+    const loader = first(xpaths.loader, popup);
+    if (!loader) return false;
+    const box = loader.getBoundingClientRect();
+    return box.width > 0 && box.height > 0 && loader.querySelector('div') !== null;
+}
+function pendingRequests(idleMs) {
+    const state = window.__scraperRequests;
+    if (!state) return 0;
+    const now = performance.now();
+    let pending = 0;
+    for (const started of state.started.values()) if (now - started < idleMs) pending++;  // long polls are ignored
+    return pending;
+}
+"""
+
+js_expand_pass = _js_comment_state + """
+const popup = arguments[0];
+const xpaths = arguments[1];
+const pattern = new RegExp(arguments[2], 'i');
+const maxComments = arguments[3];
+const idleMs = arguments[4];
+
+const comments = countComments(popup, xpaths);
+const capped = maxComments > 0 && comments >= maxComments;
+let clicked = 0;
+if (!capped) {
+    for (const button of popup.querySelectorAll('[role="button"]:not([data-scraper-expanded])')) {
+        if (!button.getClientRects().length) continue;  // not rendered
+        if (!pattern.test((button.innerText || '').trim())) continue;
+        button.dataset.scraperExpanded = '1';
+        button.click();
+        clicked++;
+    }
+    const loader = first(xpaths.loader, popup);
+    if (loader) loader.scrollIntoView({block: 'end'});
+}
+return {comments: comments, clicked: clicked, capped: capped, loading: loaderVisible(popup, xpaths),
+        pending: pendingRequests(idleMs)};
+"""
+
+js_comments_settled = _js_comment_state + """
+const popup = arguments[0];
+const xpaths = arguments[1];
+const before = arguments[2];
+const idleMs = arguments[3];
+if (pendingRequests(idleMs) > 0) return false;
+return countComments(popup, xpaths) !== before || !loaderVisible(popup, xpaths);
+"""
+
+# The parent index of a comment (null for top-level comments), see the module docstring.
+# index maps every comment element of the post to its position.
+js_parent_of = """
+function parentOf(comment, container, index) {
+    for (let node = comment.parentElement; node && node !== container; node = node.parentElement) {
+        for (let sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (index.has(sibling)) return index.get(sibling);
+        }
+    }
+    return null;
+}
+"""
+
+js_comment_parents = js_parent_of + """
+const container = arguments[0];
+const comments = arguments[1];
+const index = new Map(comments.map((comment, position) => [comment, position]));
+return comments.map(comment => parentOf(comment, container, index));
+"""
+
+
+def _xpaths() -> dict:
+    return {
+        "comment_container": registry.xpath("comment_pop_up_class_obj"),
+        "comment": registry.xpath("individual_comment_class_obj"),
+        "loader": registry.xpath("comment_loader_class_obj"),
+    }
+
+
+def expand_comments(popup_window: WebElement, driver: WebDriver, max_comments: int = 0, timeout: float = 30.0,
+                    idle_seconds: float = 5.0, debug: bool = False) -> int:
+    """
+    Loads every comment and reply of an opened popup.
+
+    Args:
+        popup_window: The popup WebElement returned by open_post.
+        driver: The WebDriver instance.
+        max_comments: Stop expanding once this many comments are loaded (0 = no limit).
+        timeout: Maximum seconds spent loading the comments of one post.
+        idle_seconds: Requests running longer than this (long polls) do not keep the page from being settled.
+        debug: Print every pass.
+
+    Returns:
+        The number of comments loaded.
+    """
+    xpaths = _xpaths()
+    idle_ms = idle_seconds * 1000
+    deadline = time.monotonic() + timeout
+    comments, stalled = 0, 0
+    try:
+        driver.execute_script(js_track_requests)
+        while True:
+            state = driver.execute_script(js_expand_pass, popup_window, xpaths, expander_pattern, max_comments, idle_ms)
+            if debug: print(f"Comment pass: {state}")
+            if state["capped"]:
+                print(f"{Fore.YELLOW}Stopped loading comments at {state['comments']} (max_comments).{Style.RESET_ALL}")
+                return int(state["comments"])
+            if not state["clicked"] and not state["loading"] and not state["pending"]:
+                return int(state["comments"])
+
+            # a loader that stays visible without delivering anything is given up on after a few passes
+            stalled = stalled + 1 if state["comments"] == comments and not state["clicked"] else 0
+            comments = state["comments"]
+            remaining = deadline - time.monotonic()
+            if stalled >= 3 or remaining <= 0:
+                print(f"{Fore.YELLOW}Stopped loading comments at {comments}, the thread did not finish loading."
+                      f"{Style.RESET_ALL}")
+                return int(comments)
+
+            waits.pause(driver, "comments_settled",
+                        lambda d: d.execute_script(js_comments_settled, popup_window, xpaths, comments, idle_ms),
+                        timeout=min(remaining, 10.0))
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Error while loading the comments:\n{e}{Style.RESET_ALL}")
+        return int(comments)
+    finally:
+        _untrack_requests(driver)
+
+
+def _untrack_requests(driver: WebDriver) -> None:
+    try:
+        if not driver.execute_script(js_untrack_requests):
+            print(f"{Fore.YELLOW}The page replaced fetch/XMLHttpRequest while the comments loaded, its wrappers were "
+                  f"left in place.{Style.RESET_ALL}")
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Could not remove the request tracking:\n{e}{Style.RESET_ALL}")
+
+
+def comment_parents(driver: WebDriver, comment_container: WebElement, comments: list[WebElement]) -> list[Optional[int]]:
+    """
+    Returns:
+        The parent index of every comment (None for top-level comments), in one execute_script call.
+    """
+    if not comments:
+        return []
+    try:
+        return driver.execute_script(js_comment_parents, comment_container, comments)
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Could not resolve the reply parents:\n{e}{Style.RESET_ALL}")
+        return [None] * len(comments)
@@ -0,0 +1,306 @@
+"""
+Date Engine
+
+Resolves post dates without hovering over the date link and waiting for its tooltip.  In order:
+1. timestamps carried by the date link: data-utime / datetime attributes, a unix time or an
+   ISO-8601 date in its aria-label or title, or a time parameter in its href
+2. the label the page shows, parsed against the crawl time with the locale tables below:
+   "Just now", "3m", "2 hrs", "Yesterday at 4:12 PM", "Monday at 9:03 AM", "March 12 at 4:37 PM",
+   "March 12, 2023", or the full tooltip "Wednesday, March 12, 2025 at 4:37 PM"
+
+Relative labels of recent posts ("3h") are only precise to the hour.  With date_resolution "auto"
+(the default) those posts still get the exact tooltip date by hovering, every label with a time of
+day or an absolute date is resolved without it; "label" never hovers and "hover" always does.
+
+Every post gets the normalized date next to the tooltip-formatted 'date':
+- date_iso:   ISO-8601 with the local UTC offset, e.g. "2025-03-12T16:37:00+01:00"
+- timestamp:  unix epoch seconds
+Parsed labels are memoized per crawl minute.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Seconds and precision of every relative unit
+_units = {
+    "seconds": (1, "second"),
+    "minutes": (60, "minute"),
+    "hours": (3600, "hour"),
+    "days": (86400, "day"),
+    "weeks": (7 * 86400, "day"),
+    "years": (365 * 86400, "year"),
+}
+
+LOCALES = {
+    "en": {
+        "now": ("just now", "now"),
+        "ago": ("ago",),
+        "units": {
+            "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds",
+            "m": "minutes", "min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+            "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+            "d": "days", "day": "days", "days": "days",
+            "w": "weeks", "wk": "weeks", "wks": "weeks", "week": "weeks", "weeks": "weeks",
+            "y": "years", "yr": "years", "yrs": "years", "year": "years", "years": "years",
+        },
+        "yesterday": ("yesterday",),
+        "today": ("today",),
+        "at": ("at",),
+        "fillers": ("on",),
+        "am": ("am", "a.m."),
+        "pm": ("pm", "p.m."),
+        "months": ("january", "february", "march", "april", "may", "june", "july", "august", "september",
+                   "october", "november", "december"),
+        "weekdays": ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"),
+    },
+    "es": {
+        "now": ("justo ahora", "ahora"),
+        "ago": ("hace",),
+        "units": {
+            "s": "seconds", "seg": "seconds", "segundo": "seconds", "segundos": "seconds",
+            "min": "minutes", "minuto": "minutes", "minutos": "minutes",
+            "h": "hours", "hora": "hours", "horas": "hours",
+            "d": "days", "día": "days", "días": "days",
+            "sem": "weeks", "semana": "weeks", "semanas": "weeks",
+            "a": "years", "año": "years", "años": "years",
+        },
+        "yesterday": ("ayer",),
+        "today": ("hoy",),
+        "at": ("a las", "a la"),
+        "fillers": ("de", "del", "el"),
+        "am": ("a.m.", "a. m.", "am"),
+        "pm": ("p.m.", "p. m.", "pm"),
+        "months": ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre",
+                   "octubre", "noviembre", "diciembre"),
+        "weekdays": ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"),
+    },
+}
+
+_spaces = re.compile(r"[\s\u00a0\u202f]+")
+_relative = re.compile(r"^(\d+)\s*([^\d\s]+)$")
+_time_of_day = re.compile(r"(\d{1,2})[:.](\d{2})(?:\s*([ap]\.?\s?m\.?))?")
+_href_time_keys = ("utime", "time", "timestamp", "created_time")
+
+# The timestamps a date link may carry, prepended to the scripts that read date links
+js_date_hints = """
+function dateHints(link) {
+    const stamped = link.closest('[data-utime]') || link.querySelector('[data-utime], time[datetime]');
+    const hints = stamped ? [stamped.getAttribute('data-utime') || stamped.getAttribute('datetime') || ''] : [];
+    hints.push(link.getAttribute('aria-label') || '', link.getAttribute('title') || '');
+    return hints.filter(hint => hint);
+}
+"""
+
+# The label, href and hints of the date link in (or at) arguments[0], in one call
+js_read_date_link = js_date_hints + """
+const section = arguments[0];
+const link = section.tagName === 'A' ? section : (section.querySelector('a') || section);
+return {label: (link.innerText || '').trim(), href: link.href || '', hints: dateHints(link)};
+"""
+
+# The text of the rendered date tooltip (the first element with the tooltip's classes whose text contains the
+# narrow no-break space of the time), "" while it has not rendered
+js_read_date_tooltip = """
+for (const node of document.getElementsByClassName(arguments[0])) {
+    const text = node.innerText || '';
+    if (text.includes('\\u202f')) return text;
+}
+return '';
+"""
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Formats a unix timestamp like the date tooltip, e.g. 'Monday, January 6, 2025 at 3:04 PM' (narrow no-break space)."""
+    moment = datetime.fromtimestamp(timestamp)
+    return (f"{moment:%A}, {moment:%B} {moment.day}, {moment.year} at "
+            f"{moment.hour % 12 or 12}:{moment:%M}\u202f{moment:%p}")
+
+
+def iso_date(timestamp: float) -> str:
+    """ISO-8601 with the local UTC offset, e.g. '2025-03-12T16:37:00+01:00'."""
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat()
+
+
+def parse_tooltip_date(text: str) -> Optional[float]:
+    """The unix timestamp of a tooltip date (the inverse of format_timestamp), None if it has another format."""
+    try:
+        return datetime.strptime(text.replace("\u202f", " "), "%A, %B %d, %Y at %I:%M %p").timestamp()
+    except ValueError:
+        return None
+
+
+class ResolvedDate(NamedTuple):
+    epoch: int
+    precision: str  # "second", "minute", "hour", "day" or "year"
+    source: str  # "attribute", "href" or "label"
+
+    @property
+    def precise(self) -> bool:
+        """Precise to the minute, as good as the tooltip."""
+        return self.precision in ("second", "minute")
+
+    @property
+    def iso(self) -> str:
+        return iso_date(self.epoch)
+
+    @property
+    def tooltip(self) -> str:
+        return format_timestamp(self.epoch)
+
+
+def _without_phrases(text: str, phrases: Iterable[str]) -> str:
+    for phrase in sorted(phrases, key=len, reverse=True):
+        text = re.sub(rf"(?<!\w){re.escape(phrase)}(?!\w)", " ", text)
+    return text
+
+
+@lru_cache(maxsize=4096)
+def parse_label(label: str, locale: str, now: int) -> Optional[tuple[int, str]]:
+    """
+    Parses a date label against 'now' (epoch seconds, the engine passes the crawl minute so results are memoized).
+
+    Returns:
+        (epoch seconds, precision), or None if the label has no recognizable date.
+    """
+    table = LOCALES.get(locale, LOCALES["en"])
+    text = _spaces.sub(" ", label).strip().strip("·").strip().lower()
+    if not text:
+        return None
+    if text in table["now"]:
+        return now, "minute"
+
+    relative = _relative.match(_spaces.sub(" ", _without_phrases(text, table["ago"])).strip())
+    if relative and relative.group(2).rstrip(".") in table["units"]:
+        seconds, precision = _units[table["units"][relative.group(2).rstrip(".")]]
+        return now - int(relative.group(1)) * seconds, precision
+
+    hour = minute = None
+    clock = _time_of_day.search(text)
+    if clock:
+        hour, minute = int(clock.group(1)), int(clock.group(2))
+        meridiem = (clock.group(3) or "").replace(" ", "")
+        if meridiem:
+            if meridiem in {m.replace(" ", "") for m in table["pm"]} and hour < 12:
+                hour += 12
+            elif meridiem in {m.replace(" ", "") for m in table["am"]} and hour == 12:
+                hour = 0
+        if hour > 23 or minute > 59:
+            return None
+        text = text[:clock.start()] + " " + text[clock.end():]
+
+    text = _without_phrases(text, table["at"] + table["fillers"])
+    words = [word for word in re.split(r"[\s,]+", text) if word]
+    crawl = datetime.fromtimestamp(now)
+    today = crawl.date()
+    day: Optional[date] = None
+
+    months = [index for index, name in enumerate(table["months"])
+              if any(word == name or (len(word) >= 3 and name.startswith(word.rstrip("."))) for word in words)]
+    numbers = [int(word) for word in words if word.isdigit()]
+    if any(word in table["yesterday"] for word in words):
+        day = today - timedelta(days=1)
+    elif any(word in table["today"] for word in words):
+        day = today
+    elif months:
+        days = [number for number in numbers if 1 <= number <= 31]
+        years = [number for number in numbers if number >= 1900]
+        if not days:
+            return None
+        try:
+            day = date(years[0] if years else today.year, months[0] + 1, days[0])
+        except ValueError:
+            return None
+        if not years and day > today + timedelta(days=1):  # "December 30" seen in January
+            day = day.replace(year=day.year - 1)
+    else:
+        weekdays = [index for index, name in enumerate(table["weekdays"]) if name in words]
+        if weekdays:
+            day = today - timedelta(days=(today.weekday() - weekdays[0]) % 7 or 7)
+        elif clock:  # a time of day only, the last time it was that time
+            day = today if (hour, minute) <= (crawl.hour, crawl.minute) else today - timedelta(days=1)
+        else:
+            return None
+
+    if hour is None:
+        return int(datetime(day.year, day.month, day.day).timestamp()), "day"
+    return int(datetime(day.year, day.month, day.day, hour, minute).timestamp()), "minute"
+
+
+class DateEngine:
+    """
+    Resolves dates from a date link's attributes, href and label.
+
+    Args:
+        locale: Key of LOCALES for the page's language.
+        resolution: "auto", "label" or "hover" (see the module docstring).
+        now: Fixed crawl time (epoch seconds), the current time if None.
+    """
+
+    def __init__(self, locale: str = "en", resolution: str = "auto", now: Optional[float] = None):
+        self.locale = locale
+        self.resolution = resolution
+        self.now = now
+
+    def _crawl_minute(self) -> int:
+        now = self.now if self.now is not None else datetime.now().timestamp()
+        return int(now) // 60 * 60
+
+    @staticmethod
+    def _from_attribute(value: str) -> Optional[int]:
+        value = value.strip()
+        if re.fullmatch(r"\d{9,10}", value):
+            return int(value)
+        if re.fullmatch(r"\d{12,13}", value):  # milliseconds
+            return int(value) // 1000
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return int(moment.timestamp())
+
+    def resolve(self, label: str = "", href: str = "", hints: Iterable[str] = ()) -> Optional[ResolvedDate]:
+        """
+        Args:
+            label: The text of the date link ("3h", "Yesterday at 4:12 PM", a tooltip date, ...).
+            href: The date link's href.
+            hints: Attribute values of the date link (data-utime, datetime, aria-label, title).
+
+        Returns:
+            The resolved date, or None.
+        """
+        now = self._crawl_minute()
+        for hint in hints:
+            if not hint:
+                continue
+            epoch = self._from_attribute(hint)
+            if epoch is not None:
+                return ResolvedDate(epoch, "second", "attribute")
+            parsed = parse_label(hint, self.locale, now)
+            if parsed is not None and parsed[1] == "minute":
+                return ResolvedDate(parsed[0], parsed[1], "attribute")
+
+        if href:
+            query = parse_qs(urlparse(href).query)
+            for key in _href_time_keys:
+                for value in query.get(key, []):
+                    epoch = self._from_attribute(value)
+                    if epoch is not None:
+                        return ResolvedDate(epoch, "second", "href")
+
+        parsed = parse_label(label, self.locale, now) if label else None
+        if parsed is None:
+            return None
+        return ResolvedDate(parsed[0], parsed[1], "label")
+
+    def fields(self, date_text: str) -> dict:
+        """The normalized fields of a post's 'date' string: {"date_iso": str, "timestamp": Optional[int]}."""
+        resolved = self.resolve(date_text) if date_text else None
+        if resolved is None:
+            return {"date_iso": "", "timestamp": None}
+        return {"date_iso": resolved.iso, "timestamp": resolved.epoch}
+
+
+# Shared engine, configured by main.py ('date_locale', 'date_resolution')
+dates = DateEngine()
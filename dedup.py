@@ -0,0 +1,163 @@
+"""
+Duplicate Detection
+
+Keeps every post fingerprint ever stored (see fingerprint.py) so a post that is rendered twice,
+or scraped again in a later run, is skipped.
+
+Lookups go through a fixed-size Bloom filter first: a "no" is certain and costs no disk access,
+a "maybe" is confirmed against the exact set stored in SQLite.  Memory therefore stays bounded
+by the filter size (about 18 MB for 10 million posts at a 0.1% false-positive rate) no matter
+how many posts have been seen.  The filter is saved next to the database between runs and
+rebuilt from the database if it is missing or out of date.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+
+from colorama import Fore, Style
+
+
+class BloomFilter:
+    """
+    A plain Bloom filter over strings.
+
+    Args:
+        capacity: The number of items the filter is sized for.
+        error_rate: The false-positive rate at that capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def save(self, file_path: str) -> None:
+        temporary_path = file_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(f"{self.capacity} {self.error_rate} {self.count}\n".encode("ascii"))
+            f.write(self.bits)
+        os.replace(temporary_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> "BloomFilter":
+        with open(file_path, "rb") as f:
+            capacity, error_rate, count = f.readline().decode("ascii").split()
+            bloom = cls(int(capacity), float(error_rate))
+            bits = f.read()
+        if len(bits) != len(bloom.bits):
+            raise ValueError(f"{file_path} has an unexpected size.")
+        bloom.bits = bytearray(bits)
+        bloom.count = int(count)
+        return bloom
+
+
+class DedupIndex:
+    """
+    Bloom filter in memory, exact fingerprint set on disk.
+
+    Args:
+        base_path: Files are <base_path>.db (exact set) and <base_path>.bloom (filter).
+        capacity: Expected number of fingerprints across all runs.
+        error_rate: Bloom filter false-positive rate at capacity (a false positive only costs one SQLite lookup).
+        commit_every: Commit the exact set after this many additions.
+    """
+
+    def __init__(self, base_path: str, capacity: int = 10_000_000, error_rate: float = 0.001, commit_every: int = 100):
+        self.base_path = base_path
+        self.commit_every = max(1, commit_every)
+        self.lookups = 0
+        self.disk_lookups = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # used from the browser thread and the storage pipeline thread, always under self._lock
+        self.connection = sqlite3.connect(base_path + ".db", check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS seen (fingerprint TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.connection.commit()
+
+        stored = self.connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+        self.bloom = self._load_bloom(capacity, error_rate, stored)
+
+    def _load_bloom(self, capacity: int, error_rate: float, stored: int) -> BloomFilter:
+        bloom_path = self.base_path + ".bloom"
+        if os.path.exists(bloom_path):
+            try:
+                bloom = BloomFilter.load(bloom_path)
+                if bloom.count == stored and bloom.capacity == capacity and bloom.error_rate == error_rate:
+                    return bloom
+            except Exception as e:
+                print(f"{Fore.YELLOW}Rebuilding the dedup filter ({e}).{Style.RESET_ALL}")
+
+        bloom = BloomFilter(capacity, error_rate)
+        for (fingerprint,) in self.connection.execute("SELECT fingerprint FROM seen"):
+            bloom.add(fingerprint)
+        if stored > capacity:
+            print(f"{Fore.YELLOW}The dedup index holds {stored} fingerprints, more than its capacity of {capacity}; "
+                  f"raise dedup_capacity to keep the false-positive rate low.{Style.RESET_ALL}")
+        return bloom
+
+    def _contains(self, fingerprint: str) -> bool:
+        self.lookups += 1
+        if fingerprint not in self.bloom:
+            return False
+        self.disk_lookups += 1
+        return self.connection.execute("SELECT 1 FROM seen WHERE fingerprint = ?", (fingerprint,)).fetchone() is not None
+
+    def seen(self, fingerprint: str) -> bool:
+        """True if the fingerprint has been added before (in this or an earlier run)."""
+        with self._lock:
+            return self._contains(fingerprint)
+
+    def add(self, fingerprint: str) -> bool:
+        """
+        Adds a fingerprint.
+
+        Returns:
+            True if it was new, False if it had been seen before.
+        """
+        with self._lock:
+            if self._contains(fingerprint):
+                return False
+            self.connection.execute("INSERT OR IGNORE INTO seen (fingerprint) VALUES (?)", (fingerprint,))
+            self.bloom.add(fingerprint)
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.connection.commit()
+                self._pending = 0
+            return True
+
+    def flush(self) -> None:
+        """Commits the fingerprints added since the last commit."""
+        with self._lock:
+            self.connection.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.commit()
+            self.bloom.save(self.base_path + ".bloom")
+            self.connection.close()
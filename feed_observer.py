@@ -0,0 +1,283 @@
+"""
+Feed Observer
+
+Detects new posts with an in-page MutationObserver on div[role="feed"] instead of scrolling and
+counting every post in the document on each poll.
+
+The observer pushes every post node inserted into the feed onto a JavaScript-side queue (other
+feed children are ignored, and placeholders that never render are dropped after a while).  Python
+drains that queue in batches with one execute_script call, so detecting new posts costs O(new)
+instead of O(all), and the end of the feed is reached when nothing was inserted for the whole
+timeout while no loading indicator was visible.
+
+The feed is processed in batches: one call returns every new post together with its cheap feed-card
+metadata (author, text, permalink, date label and timestamp hints, comment count, whether the text
+is truncated behind "See more", whether it is pinned, optionally its outerHTML), and one call
+removes every processed post at the end of the batch, so the per-batch overhead does not grow with
+the number of posts.
+"""
+from typing import Optional
+
+from colorama import Fore, Style
+from selenium.common import TimeoutException, JavascriptException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from adaptive_wait import waits
+from date_engine import js_date_hints
+
+js_install_feed_observer = """
+const feed = document.querySelector('div[role="feed"]');
+if (!feed) return false;
+const state = window.__scraperFeed;
+if (state && state.feed === feed) return true;  // already observing this feed element
+if (state && state.observer) state.observer.disconnect();
+
+// Only post nodes are queued (the post classes, or an [aria-posinset] already inside), other feed children
+// (headers, "new posts" banners, loading skeletons) never become posts and would wait in the queue forever
+const classes = arguments[0] || (state && state.classes) || [];
+const isPost = node => node.nodeType === Node.ELEMENT_NODE
+    && ((classes.length && classes.every(name => node.classList.contains(name)))
+        || !!node.querySelector('[aria-posinset]'));
+const queuedAt = new WeakMap();  // node -> when it was queued, a node still not rendered after maxPending is dropped
+const queue = [];
+const enqueue = node => { if (isPost(node)) { queue.push(node); queuedAt.set(node, Date.now()); } };
+Array.from(feed.children).forEach(enqueue);  // the posts that were rendered before the observer existed
+const observer = new MutationObserver(mutations => {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) enqueue(node);
+    }
+    window.__scraperFeed.lastInsert = Date.now();
+});
+observer.observe(feed, {childList: true});
+window.__scraperFeed = {feed: feed, observer: observer, queue: queue, queuedAt: queuedAt, classes: classes,
+                        lastInsert: Date.now()};
+return true;
+"""
+
+# Drops detached nodes and nodes that were queued more than arguments[0] ms ago without rendering as a post,
+# and returns whether a rendered post is queued.  Prepended to the scripts that read the queue.
+js_prune_feed_queue = """
+function pruneFeedQueue(state, maxPending) {
+    const now = Date.now();
+    state.queue = state.queue.filter(node => node.isConnected
+        && (isRendered(node) || now - (state.queuedAt.get(node) || now) < maxPending));
+    return state.queue.some(isRendered);
+}
+function isRendered(node) {
+    return !!node.querySelector('[aria-posinset]');
+}
+"""
+
+# Reads what a feed card shows without opening it, prepended to the scripts that return posts
+js_read_card = js_date_hints + """
+function cardPermalink(node) {
+    const link = node.querySelector('a[href*="/posts/"], a[href*="/permalink/"], a[href*="story_fbid="]')
+        || node.querySelector('a[attributionsrc][target="_blank"], a[attributionsrc]');
+    if (!link) return {permalink: "", label: "", hints: []};
+    let permalink = link.href;
+    try {
+        const url = new URL(link.href);
+        for (const key of Array.from(url.searchParams.keys())) if (key.startsWith('__')) url.searchParams.delete(key);
+        permalink = url.toString();
+    } catch (error) {}
+    return {permalink: permalink, label: link.innerText.trim(), hints: dateHints(link)};
+}
+function cardCommentCount(node) {
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    for (let text = walker.nextNode(); text; text = walker.nextNode()) {
+        const match = /^([\d.,]+)\s*([KM]?)\s+comments?$/i.exec(text.data.trim());
+        if (!match) continue;
+        const scale = {K: 1e3, M: 1e6}[match[2].toUpperCase()] || 1;
+        return Math.round(parseFloat(match[1].replace(/,/g, '')) * scale);
+    }
+    return 0;  // no counter is shown for posts without comments
+}
+// Pinned and featured posts sit at the top of a chronological feed out of order, they must not end an incremental crawl
+function cardPinned(node) {
+    const labels = '[aria-label="Pinned post" i], [aria-label="Featured" i], [aria-label="Pinned" i]';
+    if (node.querySelector(labels)) return true;
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    for (let text = walker.nextNode(); text; text = walker.nextNode()) {
+        if (/^(pinned post|featured|pinned by an admin|announcement)$/i.test(text.data.trim())) return true;
+    }
+    return false;
+}
+function readCard(node, withHtml) {
+    const name = node.querySelector('[data-ad-rendering-role="profile_name"]');
+    const message = node.querySelector('[data-ad-rendering-role="story_message"]');
+    const link = cardPermalink(node);
+    return {
+        element: node,
+        username: name ? name.innerText.trim() : "",
+        post_text: message ? message.innerText.trim() : "",
+        permalink: link.permalink,
+        date_label: link.label,
+        date_hints: link.hints,
+        comment_count: cardCommentCount(node),
+        pinned: cardPinned(node),
+        truncated: !!message && Array.from(message.querySelectorAll('[role="button"]'))
+            .some(button => /^see more$/i.test(button.innerText.trim())),
+        html: withHtml ? node.outerHTML : ""
+    };
+}
+"""
+
+# Pops up to arguments[0] queued nodes that are still attached and have rendered as a post.  Nodes that are
+# attached but still placeholders are put back, so they are picked up once they have rendered, unless they have been
+# waiting for more than arguments[2] ms.
+js_drain_feed_queue = js_read_card + js_prune_feed_queue + """
+const state = window.__scraperFeed;
+if (!state) return null;
+const limit = arguments[0];
+pruneFeedQueue(state, arguments[2]);
+const ready = [];
+const pending = [];
+while (state.queue.length && ready.length < limit) {
+    const node = state.queue.shift();
+    if (isRendered(node)) ready.push(node);
+    else pending.push(node);
+}
+state.queue.unshift(...pending);
+return ready.map(node => readCard(node, arguments[1]));
+"""
+
+# Without the observer: every direct child of the feed that has all the classes in arguments[0]
+js_read_rendered_posts = js_read_card + """
+const feed = document.querySelector('div[role="feed"]');
+if (!feed) return null;
+const classes = arguments[0];
+return Array.from(feed.children)
+    .filter(node => classes.every(name => node.classList.contains(name)))
+    .map(node => readCard(node, arguments[1]));
+"""
+
+js_remove_posts = """
+for (const node of arguments[0]) node.remove();
+return arguments[0].length;
+"""
+
+# One round trip per poll: report the queued rendered posts, otherwise scroll to the bottom so the feed loads more
+# (placeholders still waiting to render do not count, the feed is scrolled while they do)
+js_poll_feed_queue = js_prune_feed_queue + """
+const state = window.__scraperFeed;
+if (!state || !state.feed.isConnected) return -1;
+if (pruneFeedQueue(state, arguments[0])) return state.queue.filter(isRendered).length;
+window.scrollTo(0, document.body.scrollHeight);
+return 0;
+"""
+
+js_feed_loading = """
+const state = window.__scraperFeed;
+const scope = state && state.feed.parentElement ? state.feed.parentElement : document;
+return !!scope.querySelector('[role="progressbar"], [aria-busy="true"], [aria-label="Loading..."]');
+"""
+
+
+def install_feed_observer(driver: WebDriver, post_classes: Optional[list[str]] = None) -> bool:
+    """
+    Installs the MutationObserver on the feed (idempotent, re-installs if the feed element was replaced).
+
+    Args:
+        driver: The WebDriver instance.
+        post_classes: The classes of a post node, feed children without them (or an [aria-posinset] inside) are not
+                      queued.  Defaults to the classes of the previous install.
+
+    Returns:
+        True if the feed was found and is being observed.
+    """
+    try:
+        return bool(driver.execute_script(js_install_feed_observer, post_classes))
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Could not install the feed observer: {e}{Style.RESET_ALL}")
+        return False
+
+
+def drain_new_posts(driver: WebDriver, limit: int = 100, with_html: bool = False,
+                    max_pending: float = 10.0) -> Optional[list[dict]]:
+    """
+    Returns up to 'limit' newly inserted, rendered posts and their feed-card metadata in one execute_script call.
+
+    Args:
+        driver: The WebDriver instance.
+        limit: Maximum number of posts returned.
+        with_html: Also return every post's outerHTML (capture mode).
+        max_pending: Seconds a queued node may stay a placeholder before it is dropped from the queue.
+
+    Returns:
+        [{"element": WebElement, "username": str, "post_text": str, "permalink": str, "date_label": str,
+        "date_hints": [str], "comment_count": int, "truncated": bool, "pinned": bool, "html": str}, ...] (possibly
+        empty), or None if the observer is not installed.
+    """
+    try:
+        return driver.execute_script(js_drain_feed_queue, limit, with_html, max_pending * 1000)
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Could not drain the feed queue: {e}{Style.RESET_ALL}")
+        return None
+
+
+def read_rendered_posts(driver: WebDriver, post_classes: list[str], with_html: bool = False) -> list[dict]:
+    """
+    Same as drain_new_posts for when the observer is unavailable: every post currently in the feed (the direct
+    children with all of post_classes), in one execute_script call.
+    """
+    try:
+        return driver.execute_script(js_read_rendered_posts, post_classes, with_html) or []
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Unable to read the rendered posts: {e}{Style.RESET_ALL}")
+        return []
+
+
+def remove_posts(driver: WebDriver, elements: list[WebElement]) -> int:
+    """
+    Removes every processed post from the DOM in one execute_script call.
+
+    Returns:
+        The number of posts removed.
+    """
+    if not elements:
+        return 0
+    try:
+        return driver.execute_script(js_remove_posts, elements) or 0
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.RED}Error removing processed posts from the DOM: {e}{Style.RESET_ALL}")
+        return 0
+
+
+def wait_for_new_posts(driver: WebDriver, timeout: float = 25, max_pending: float = 10.0) -> bool:
+    """
+    Scrolls and waits until the observer has queued at least one new rendered post.  The feed keeps being scrolled
+    while only placeholders are queued, and placeholders that have not rendered after max_pending seconds are
+    dropped, so a feed child that never becomes a post cannot hold the loop.
+
+    If the timeout is reached while the feed still shows a loading indicator, it waits one more timeout period
+    before deciding that the end of the feed has been reached.
+
+    Returns:
+        True if new posts are queued, False at the end of the feed.
+    """
+    def queued(d: WebDriver) -> int:
+        count = d.execute_script(js_poll_feed_queue, max_pending * 1000)
+        if count == -1:  # the feed element was replaced (e.g. a navigation), observe the new one
+            install_feed_observer(d)
+            return 0
+        return count
+
+    for attempt in range(2):
+        try:
+            waits.until(driver, "new_posts", queued, timeout=timeout)
+            return True
+        except TimeoutException:
+            try:
+                still_loading = driver.execute_script(js_feed_loading)
+            except (JavascriptException, WebDriverException):
+                still_loading = False
+            if not still_loading:
+                break
+            print(f"{Fore.YELLOW}Feed is still loading after {timeout} seconds, waiting once more.{Style.RESET_ALL}")
+        except (JavascriptException, WebDriverException) as e:
+            print(f"{Fore.RED}An unexpected error occurred while waiting for new posts: {e}{Style.RESET_ALL}")
+            return False
+
+    print(f"{Fore.YELLOW}Timeout: No new posts inserted after {timeout} seconds. End of feed.{Style.RESET_ALL}")
+    return False
@@ -0,0 +1,73 @@
+"""
+Post Fingerprints
+
+A stable identifier for a post, built from its post id when the permalink carries one and from its
+username and text otherwise, so the same post scraped twice (in one run or across runs) maps to the
+same key.
+"""
+import hashlib
+import re
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_field(value: str) -> str:
+    """Collapses all whitespace (including the narrow no-break space Facebook uses in dates) and case."""
+    if not value:
+        return ""
+    return _whitespace.sub(" ", str(value)).strip().casefold()
+
+
+# The post id in a permalink: /groups/<group>/posts/<id>/, /permalink/<id>/, ?story_fbid=<id>, ?multi_permalinks=<id>
+_post_id = re.compile(r"/(?:posts|permalink)/([\w.-]+)|[?&](?:story_fbid|multi_permalinks|fbid)=([\w.-]+)")
+
+
+def post_id_from_url(url: str) -> str:
+    """Returns the post id in a permalink, or "" if the URL has none (e.g. a tracking redirect)."""
+    match = _post_id.search(url or "")
+    return (match.group(1) or match.group(2)) if match else ""
+
+
+def post_fingerprint(username: str, post_text: str, post_id: str = "") -> str:
+    """
+    Returns a hex digest identifying a post.
+
+    No date is part of it: a date read from a relative label ("3h") changes from run to run, and the same post would
+    get a new key (a new row in SQLite) on every re-scrape.
+
+    Args:
+        username: The author of the post.
+        post_text: The text of the post.
+        post_id: The post id (see post_id_from_url), the key when it is known.
+    """
+    if post_id:
+        return hashlib.sha1(f"id\x1f{post_id}".encode("utf-8")).hexdigest()
+    text_hash = hashlib.sha1(normalize_field(post_text).encode("utf-8")).hexdigest()
+    key = "\x1f".join((normalize_field(username), "", text_hash))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def post_key(post_data: dict) -> str:
+    """The post_fingerprint of a post-dict, from its post_id or permalink when it has one."""
+    post_id = post_data.get("post_id") or post_id_from_url(post_data.get("permalink", ""))
+    return post_fingerprint(post_data.get("username", ""), post_data.get("post_text", ""), post_id)
+
+
+def card_fingerprint(username: str, post_text: str, post_id: str = "") -> str:
+    """
+    Returns the key of a post as seen from the feed (its card or the feed's network response), used to skip posts
+    before they are opened.
+
+    Feed keys live in their own namespace ("card:" prefix): the storage pipeline adds post_fingerprint keys to the
+    same dedup index, and a post the browser has just seen must not look like a post that was already stored.  No date
+    is part of the key, the card only shows a relative label ("3h", later "Yesterday at 9:00 AM") that changes as the
+    post ages.
+
+    Args:
+        username: The author of the post.
+        post_text: The text of the post.
+        post_id: The post id (see post_id_from_url), the key when it is known.
+    """
+    if post_id:
+        return "card:id:" + post_id
+    return "card:" + post_fingerprint(username, post_text)
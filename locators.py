@@ -0,0 +1,268 @@
+"""
+Self-Healing Locators
+
+Every logical element (the post's date link, the popup, the comment container, ...) has an
+ordered chain of strategies built from the selector registry, usually the structural XPath from a
+*_obj dict followed by the CSS selector of the matching class string.
+
+Instead of waiting for the first strategy to time out before trying the next one, every attempt
+tries the whole chain once (find_elements never waits), and the chain is reordered at runtime by
+each strategy's success rate and latency (exponentially weighted, kept across runs in a JSON file).
+After Facebook changes its class names or its structure, the strategy that still works moves to
+the front.  A strategy that used to work and starts failing is reported once.
+"""
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from colorama import Fore, Style
+from selenium.common import NoSuchElementException, StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from adaptive_wait import waits
+from selector_registry import registry
+
+
+class Strategy:
+    """
+    One way of locating an element.
+
+    Args:
+        name: Unique within its chain, used in the statistics file.
+        by: By.XPATH or By.CSS_SELECTOR.
+        value: The selector.
+        selector: The registry selector it was built from (its hit/miss counters are updated as well).
+    """
+
+    def __init__(self, name: str, by: str, value: str, selector: str):
+        self.name = name
+        self.by = by
+        self.value = value
+        self.selector = selector
+
+
+class StrategyStats:
+    """Exponentially weighted success rate and latency of one strategy."""
+
+    def __init__(self, rate: float = 0.5, latency: Optional[float] = None, attempts: int = 0):
+        self.rate = rate
+        self.latency = latency
+        self.attempts = attempts
+        self.failing = 0  # consecutive failures
+        self.reported = False
+
+    def learn(self, found: bool, seconds: Optional[float], weight: float = 0.2) -> None:
+        self.rate = (1 - weight) * self.rate + weight * (1.0 if found else 0.0)
+        if seconds is not None:
+            self.latency = seconds if self.latency is None else (1 - weight) * self.latency + weight * seconds
+        self.attempts += 1
+        self.failing = 0 if found else self.failing + 1
+
+
+def default_chains() -> dict[str, list[Strategy]]:
+    """The strategy chains of the scraper's elements, in their initial order."""
+    xpath, css = By.XPATH, By.CSS_SELECTOR
+    return {
+        "post_date_link": [
+            Strategy("date_link_xpath", xpath, registry["date_enclosing_span_obj"].relative_xpath,
+                     "date_enclosing_span_obj"),
+            Strategy("date_link_classes", css,
+                     registry.css("poster_info_class") + " " + registry.css("date_enclosing_span"),
+                     "date_enclosing_span"),
+        ],
+        "popup_window": [
+            Strategy("popup_xpath", xpath, registry.xpath("pop_up_whole_window_class_obj"),
+                     "pop_up_whole_window_class_obj"),
+            Strategy("popup_classes", css, "div[role='dialog']" + registry.css("pop_up_whole_window_class"),
+                     "pop_up_whole_window_class"),
+        ],
+        "popup_username": [
+            Strategy("username_xpath", xpath, registry.xpath("username_popup_obj"), "username_popup_obj"),
+            Strategy("username_classes", css, "div[role='dialog'] " + registry.css("pop_up_username_class"),
+                     "pop_up_username_class"),
+        ],
+        "popup_post_text": [
+            Strategy("post_text_xpath", xpath, registry.xpath("post_text_obj"), "post_text_obj"),
+        ],
+        "popup_date": [
+            Strategy("date_xpath", xpath, registry.xpath("date_popup_obj"), "date_popup_obj"),
+            Strategy("date_classes", css, "div[role='dialog'] " + registry.css("pop_up_date_section"),
+                     "pop_up_date_section"),
+        ],
+        "comment_container": [
+            Strategy("comments_xpath", xpath, registry.xpath("comment_pop_up_class_obj"), "comment_pop_up_class_obj"),
+            Strategy("comments_classes", css, "div[role='dialog'] " + registry.css("comment_pop_up_class"),
+                     "comment_pop_up_class"),
+        ],
+        "comment_loader": [
+            Strategy("loader_xpath", xpath, registry.xpath("comment_loader_class_obj"), "comment_loader_class_obj"),
+            Strategy("loader_classes", css, registry.css("comment_loader_class"), "comment_loader_class"),
+        ],
+        "comment": [
+            Strategy("comment_xpath", xpath, registry.xpath("individual_comment_class_obj"),
+                     "individual_comment_class_obj"),
+            Strategy("comment_classes", css, registry.css("individual_comment_class"), "individual_comment_class"),
+        ],
+        "comment_name": [
+            Strategy("comment_name_xpath", xpath, registry.xpath("individual_comment_name_obj"),
+                     "individual_comment_name_obj"),
+            Strategy("comment_name_classes", css, registry.css("individual_comment_name_class"),
+                     "individual_comment_name_class"),
+        ],
+        "comment_text": [
+            Strategy("comment_text_xpath", xpath, registry.xpath("individual_comment_text_obj"),
+                     "individual_comment_text_obj"),
+            Strategy("comment_text_classes", css, registry.css("individual_comment_text_class"),
+                     "individual_comment_text_class"),
+        ],
+    }
+
+
+class LocatorEngine:
+    """
+    Locates logical elements through their strategy chains, best strategy first.
+
+    Args:
+        chains: {element name: [Strategy, ...]} in their initial order (see default_chains).
+        report_after: Consecutive failures after which a strategy that used to work is reported.
+    """
+
+    def __init__(self, chains: dict[str, list[Strategy]], report_after: int = 5):
+        self.chains = chains
+        self.report_after = report_after
+        self.stats: dict[str, dict[str, StrategyStats]] = {
+            element: {strategy.name: StrategyStats() for strategy in strategies}
+            for element, strategies in chains.items()
+        }
+        self._lock = threading.Lock()
+
+    def ordered(self, element: str) -> list[Strategy]:
+        """The chain of an element, highest success rate first, then lowest latency (stable for ties)."""
+        stats = self.stats[element]
+        return sorted(self.chains[element],
+                      key=lambda strategy: (-round(stats[strategy.name].rate, 3),
+                                            stats[strategy.name].latency or 0.0))
+
+    def _learn(self, element: str, strategy: Strategy, found: bool, seconds: Optional[float]) -> None:
+        registry.record(strategy.selector, found)
+        with self._lock:
+            stats = self.stats[element][strategy.name]
+            stats.learn(found, seconds)
+            if found:
+                stats.reported = False
+            elif stats.failing >= self.report_after and stats.attempts > stats.failing and not stats.reported:
+                stats.reported = True
+                print(f"{Fore.YELLOW}Locator '{strategy.name}' for {element} failed {stats.failing} times in a row, "
+                      f"the selector may be outdated: {strategy.value}{Style.RESET_ALL}")
+
+    def locate(self, context, element: str, multiple: bool = False):
+        """
+        Tries every strategy once, best first, without waiting.
+
+        Strategies that were tried before the one that matched are recorded as failures.  When nothing matches
+        nothing is recorded (the element may just not have rendered yet), see miss().
+
+        Returns:
+            The first matching element (or every match if multiple), or None / [] if no strategy matched.
+        """
+        tried = []
+        for strategy in self.ordered(element):
+            started = time.perf_counter()
+            try:
+                matches = context.find_elements(strategy.by, strategy.value)
+            except StaleElementReferenceException:
+                raise
+            except Exception:
+                matches = []
+            seconds = time.perf_counter() - started
+            if matches:
+                for previous, previous_seconds in tried:
+                    self._learn(element, previous, False, previous_seconds)
+                self._learn(element, strategy, True, seconds)
+                return matches if multiple else matches[0]
+            tried.append((strategy, seconds))
+        return [] if multiple else None
+
+    def miss(self, element: str) -> None:
+        """Records a failure for every strategy of an element that could not be found at all."""
+        for strategy in self.chains[element]:
+            self._learn(element, strategy, False, None)
+
+    def find(self, context, element: str):
+        """
+        Like find_element, through the element's strategy chain.
+
+        Raises:
+            NoSuchElementException: If no strategy matched.
+        """
+        found = self.locate(context, element)
+        if found is None:
+            self.miss(element)
+            raise NoSuchElementException(f"No locator strategy matched '{element}'.")
+        return found
+
+    def find_all(self, context, element: str) -> list:
+        """Every match of the first strategy that matches anything, [] if none does (not recorded as a miss)."""
+        return self.locate(context, element, multiple=True)
+
+    def until(self, driver: WebDriver, context, element: str, timeout: float = 10.0, name: str = ""):
+        """
+        Polls the whole chain with the adaptive waits until a strategy matches.
+
+        Raises:
+            TimeoutException: If no strategy matched within timeout (recorded as a miss of every strategy).
+        """
+        try:
+            return waits.until(driver, name or element, lambda d: self.locate(context, element), timeout=timeout)
+        except TimeoutException:
+            self.miss(element)
+            raise
+
+    def load(self, file_path: str) -> None:
+        """Loads the statistics of previous runs."""
+        if not file_path or not os.path.exists(file_path):
+            return
+        try:
+            with open(file_path, "r") as f:
+                saved = json.load(f)
+            for element, strategies in saved.items():
+                for strategy_name, values in strategies.items():
+                    if strategy_name in self.stats.get(element, {}):
+                        self.stats[element][strategy_name] = StrategyStats(values.get("rate", 0.5),
+                                                                           values.get("latency"),
+                                                                           values.get("attempts", 0))
+        except Exception as e:
+            print(f"Could not load locator statistics from {file_path}: {e}")
+
+    def save(self, file_path: str) -> None:
+        """Stores the statistics for the next run."""
+        if not file_path:
+            return
+        try:
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(file_path, "w") as f:
+                json.dump({element: {name: {"rate": stats.rate, "latency": stats.latency, "attempts": stats.attempts}
+                                     for name, stats in strategies.items()}
+                           for element, strategies in self.stats.items()}, f, indent=4)
+        except Exception as e:
+            print(f"Could not save locator statistics to {file_path}: {e}")
+
+    def summary(self) -> str:
+        lines = [f"{'element':<20}{'strategy':<24}{'success':>9}{'ms':>8}{'attempts':>10}"]
+        for element in self.chains:
+            for strategy in self.ordered(element):
+                stats = self.stats[element][strategy.name]
+                if not stats.attempts:
+                    continue
+                latency = f"{stats.latency * 1000:.0f}" if stats.latency is not None else "-"
+                lines.append(f"{element:<20}{strategy.name:<24}{stats.rate:>9.2f}{latency:>8}{stats.attempts:>10}")
+        return "\n".join(lines)
+
+
+# Shared engine used by scraper_functions and main.py
+locators = LocatorEngine(default_chains())
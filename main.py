@@ -5,23 +5,40 @@ This script orchestrates the Facebook scraping process by initializing the brows
 logging into Facebook, and collecting posts from a specified Facebook group.
 
 The script handles:
-1. Driver initialization with anti-detection measures
+1. Driver initialization with anti-detection measures (or attaching to a long-lived Chrome, see browser_session.py)
 2. Login to Facebook (using stored cookies or credentials)
 3. Scrolling through the group feed to load posts incrementally
 4. Extracting data from each post (text, username, date, comments)
-5. Storing the collected data in JSON format
+5. Storing the collected data through the output sink chosen in settings.json (JSON, JSON Lines, compressed
+   segments or SQLite)
 
 The scraper continues running until no new posts are loaded on scroll,
 suggesting that it has reached the end of available content.
+
+To scrape several groups at once with one browser per group, use worker_pool.py instead.
 """
 import sys
-from scraper_functions import *
+from scraper_functions import driver_init, login, session_valid, captcha_interact, check_facebook_captcha_links, \
+    scrape_feed
 from colorama import Fore, Style
 from selenium.webdriver.common.by import By
 import time
 from selenium.webdriver.ie.webdriver import WebDriver
-from constants import *
 from selenium.webdriver import ActionChains
+from output_sinks import open_sink
+from pipeline import StoragePipeline, StageStats
+from adaptive_wait import waits, page_loaded
+from checkpoint import Checkpoint, checkpoint_path
+from dedup import DedupIndex
+from command_profiler import CommandProfiler
+from metrics import start_metrics_server
+from memory_governor import MemoryGovernor
+from selector_registry import registry
+from locators import locators
+from date_engine import dates
+from network_capture import NetworkCapture, capture_feed
+from resource_policy import ResourcePolicy
+from browser_session import ensure_browser
 import json
 
 
@@ -36,6 +53,41 @@ with open('settings.json', 'r') as settings_file:
         cookie_bool: bool = settings['cookie_login']
         group_link: str = settings['group_scrape_link']
         debug: bool = settings['debug']
+        output_format: str = settings.get('output_format', 'json')
+        fsync_interval: float = settings.get('fsync_interval', 5.0)
+        segment_size: int = settings.get('segment_size', 5000)
+        sqlite_batch_size: int = settings.get('sqlite_batch_size', 50)
+        sqlite_batch_seconds: float = settings.get('sqlite_batch_seconds', 10.0)
+        extraction_mode: str = settings.get('extraction_mode', 'selenium')
+        snapshot_dir: str = settings.get('snapshot_dir', '')
+        pipeline_queue_size: int = settings.get('pipeline_queue_size', 64)
+        wait_stats_file: str = settings.get('wait_stats_file', 'storage/wait_stats.json')
+        feed_observer: bool = settings.get('feed_observer', True)
+        checkpoint_file: str = settings.get('checkpoint_file', 'storage/checkpoint.json')
+        resume: bool = settings.get('resume', True)
+        checkpoint_every: int = settings.get('checkpoint_every', 25)
+        dedup_index: str = settings.get('dedup_index', 'storage/dedup')
+        dedup_capacity: int = settings.get('dedup_capacity', 10_000_000)
+        dedup_error_rate: float = settings.get('dedup_error_rate', 0.001)
+        profile_file: str = settings.get('profile_file', 'storage/webdriver_profile.folded')
+        metrics_port: int = settings.get('metrics_port', 0)
+        memory_governor: bool = settings.get('memory_governor', True)
+        memory_max_heap_mb: float = settings.get('memory_max_heap_mb', 1024)
+        memory_max_nodes: int = settings.get('memory_max_nodes', 150_000)
+        memory_check_every: int = settings.get('memory_check_every', 25)
+        locator_stats_file: str = settings.get('locator_stats_file', 'storage/locator_stats.json')
+        max_comments: int = settings.get('max_comments', 0)
+        comment_timeout: float = settings.get('comment_timeout', 30.0)
+        network_capture: bool = settings.get('network_capture', False)
+        network_capture_dir: str = settings.get('network_capture_dir', '')
+        fast_mode: bool = settings.get('fast_mode', False)
+        fast_comment_threshold: int = settings.get('fast_comment_threshold', 0)
+        date_locale: str = settings.get('date_locale', 'en')
+        date_resolution: str = settings.get('date_resolution', 'auto')
+        resource_preset: str = settings.get('resource_policy', 'full')
+        resource_block_extra: list = settings.get('resource_block_extra', [])
+        debugger_address: str = settings.get('debugger_address', '')
+        browser_profile_dir: str = settings.get('browser_profile_dir', 'storage/chrome-profile')
     except Exception as e:
         print(f"{Fore.RED}There was an error with the settings file.{Style.RESET_ALL}")
         print(f"{Fore.RED}{e}{Style.RESET_ALL}")
@@ -48,6 +100,41 @@ with open('settings.json', 'r') as settings_file:
         cookie_login = False
         group_link: str = input("Please enter the URL of the Facebook Group you would like to scrape: ")
         debug = False
+        output_format = "json"
+        fsync_interval = 5.0
+        segment_size = 5000
+        sqlite_batch_size = 50
+        sqlite_batch_seconds = 10.0
+        extraction_mode = "selenium"
+        snapshot_dir = ""
+        pipeline_queue_size = 64
+        wait_stats_file = "storage/wait_stats.json"
+        feed_observer = True
+        checkpoint_file = "storage/checkpoint.json"
+        resume = True
+        checkpoint_every = 25
+        dedup_index = "storage/dedup"
+        dedup_capacity = 10_000_000
+        dedup_error_rate = 0.001
+        profile_file = "storage/webdriver_profile.folded"
+        metrics_port = 0
+        memory_governor = True
+        memory_max_heap_mb = 1024
+        memory_max_nodes = 150_000
+        memory_check_every = 25
+        locator_stats_file = "storage/locator_stats.json"
+        max_comments = 0
+        comment_timeout = 30.0
+        network_capture = False
+        network_capture_dir = ""
+        fast_mode = False
+        fast_comment_threshold = 0
+        date_locale = "en"
+        date_resolution = "auto"
+        resource_preset = "full"
+        resource_block_extra = []
+        debugger_address = ""
+        browser_profile_dir = "storage/chrome-profile"
 
 if cookie_bool:
     # check that cookies.json contains cookies (is not empty)
@@ -64,16 +151,50 @@ if cookie_bool:
         cookie_bool = False
 
 
-driver: WebDriver = driver_init(headless=headless_bool, window_size=window_size)
+if metrics_port:
+    start_metrics_server(metrics_port)
+
+sink = open_sink(file_path, output_format, fsync_interval=fsync_interval, segment_size=segment_size,
+                 batch_size=sqlite_batch_size, batch_seconds=sqlite_batch_seconds)
+stage_stats = StageStats()
+waits.load(wait_stats_file)
+locators.load(locator_stats_file)
+dates.locale, dates.resolution = date_locale, date_resolution
+checkpoint = Checkpoint(checkpoint_path(checkpoint_file, group_link), group_link, every=checkpoint_every,
+                        resume=resume) if checkpoint_file else None
+dedup = DedupIndex(dedup_index, capacity=dedup_capacity, error_rate=dedup_error_rate) if dedup_index else None
+governor = MemoryGovernor(group_link, max_heap_mb=memory_max_heap_mb, max_nodes=memory_max_nodes,
+                           check_every=memory_check_every, can_resume=checkpoint is not None or dedup is not None,
+                           debug=debug) if memory_governor else None
+storage = StoragePipeline(sink, maxsize=pipeline_queue_size, stats=stage_stats, debug=debug, dedup=dedup)
+try:
+    resource_policy = ResourcePolicy(resource_preset, resource_block_extra)
+except ValueError as e:
+    print(f"{Fore.RED}{e}, nothing is blocked.{Style.RESET_ALL}")
+    resource_policy = ResourcePolicy()
+# a long-lived Chrome is reused between runs (and started, detached, if it is not running), see browser_session.py
+if debugger_address and not ensure_browser(debugger_address, browser_profile_dir, headless=headless_bool):
+    print(f"{Fore.YELLOW}Launching a new browser instead.{Style.RESET_ALL}")
+    debugger_address = ""
+driver: WebDriver = driver_init(headless=headless_bool, window_size=window_size, capture_network=network_capture,
+                                resource_policy=resource_policy, debugger_address=debugger_address)
+# in debug mode every WebDriver command is counted and timed per call site
+profiler = CommandProfiler(driver) if debug else None
 actions = ActionChains(driver)
 
 try:
-    # Log in to Facebook using stored cookies if available
-    login(driver, group_link, use_cookies=cookie_bool)
+    # An attached browser is usually still logged in, it is only logged in again if its session is invalid
+    session_reused = bool(debugger_address) and cookie_based_login_check and session_valid(driver, group_link)
+    if session_reused:
+        print(f"{Fore.GREEN}Reusing the browser's Facebook session.{Style.RESET_ALL}")
+        driver.get(group_link)  # a fresh feed, the tab may still show the previous run's
+    else:
+        # Log in to Facebook using stored cookies if available
+        login(driver, group_link, use_cookies=cookie_bool)
     if debug: print(f"Post-Login Cookies - {driver.get_cookies()}")
 
-    if not cookie_bool:
-        time.sleep(1)
+    if not cookie_bool and not session_reused:
+        waits.pause(driver, "page_loaded", page_loaded, timeout=5)
         status, image, audio = check_facebook_captcha_links(driver.page_source)
         if status: # if there is a captcha
             if not auto_captcha:
@@ -115,89 +236,45 @@ try:
 
     # Store the original window handle to ensure we stay on the main window
     original_window_handle = driver.current_window_handle
-    time.sleep(1)
 
 # ----------------------------------------------------------------------------------------------------------------------
 
-    # Check for new content and scroll to the page-bottom
-    loaded = scroll_and_wait_for_new_posts(driver, 0)
-
-    # set num_posts
-    num_posts = 0
-
-    # Main scraping loop: continue scrolling and scraping until no new posts load
-    while loaded:
-        # Allow time for new posts to render
-        time.sleep(2)
-
-        # Get all posts currently in the DOM
-        post_class_selector = "." + ".".join(post_class.split())
-
-        # rendered_posts: list[WebElement] = driver.execute_script(
-        #     f"return document.querySelectorAll('[class=\"{post_class}\"]')"
-        # )
-        rendered_posts = get_rendered_posts(driver)
-
-        # Process only newly loaded posts (those beyond our previously processed count)
-        wait = WebDriverWait(driver, 10)  # Default wait time (seconds) for conditions
-
-        # Process only newly loaded posts (those beyond our previously processed count)
-        if debug: print(f"{Fore.BLUE}Processing posts len: {len(rendered_posts)}{Style.RESET_ALL}")
-        for rendered_post in rendered_posts:
-            # post_info = scrape_post(driver, rendered_post, actions) # Scrape the posts
-
-            # click for the pop-up
-            pop_up_window = open_post(rendered_post, driver, actions)  # Use the specific element
-
-            if pop_up_window:
-                try:
-                    try: # scrape data from post
-                        post_info = pop_up_scrape(pop_up_window, driver, actions)
-                        store_post_data(file_path, post_info)
-                        print(f"{Fore.BLUE}{post_info}{Style.RESET_ALL}")
-                    except Exception as e:
-                        print(f"{Fore.RED}{e}{Style.RESET_ALL}")
-                    if debug: print(
-                        f"Popup window element found: {pop_up_window.tag_name if pop_up_window else 'None'}. Attempting to close with ESCAPE.")
-                    # Send ESCAPE key - targeting body is often effective
-                    body_element = driver.find_element(By.TAG_NAME, 'body')
-                    body_element.send_keys(Keys.ESCAPE)
-                    if debug: print("Sent ESCAPE key.")
-
-                    # Wait until the popup window element is no longer attached to the DOM (stale)
-                    if debug: print("Waiting for popup to become stale (max 10s)...")
-                    wait.until(EC.staleness_of(pop_up_window))
-                    if debug: print(f"{Fore.GREEN}Popup element is stale (closed/removed).{Style.RESET_ALL}")
-
-                except TimeoutException:
-                    # The popup didn't become stale within the wait time after sending ESCAPE
-                    print(
-                        f"{Fore.YELLOW}Popup element did not become stale after sending ESCAPE.{Style.RESET_ALL}")
-                    # You might want additional fallback logic here if the popup is stuck
-                except StaleElementReferenceException:
-                    # This is actually GOOD - means the element was already gone before the wait even checked properly.
-                    print(f"{Fore.GREEN}Popup element was already stale before explicit wait.{Style.RESET_ALL}")
-                except NoSuchElementException:
-                    print(f"{Fore.RED}Could not find body element to send ESCAPE key.{Style.RESET_ALL}")
-                except Exception as e:
-                    # Catch other potential errors during the close attempt
-                    print(f"{Fore.RED}Error occurred during popup close/wait: {e}{Style.RESET_ALL}")
-
-            try: # for memory efficieny and cleanness, remove the post after processing
-                driver.execute_script("arguments[0].remove();", rendered_post)
-            except StaleElementReferenceException:
-                if debug: print(
-                    f"{Fore.YELLOW}Post was already stale before explicit removal.{Style.RESET_ALL}")
-                pass  # Already gone, no action needed
-            except Exception as e_remove:
-                print(f"{Fore.RED}Error removing post index from DOM: {e_remove}{Style.RESET_ALL}")
-
-        # Check if new content was loaded
-        loaded = scroll_and_wait_for_new_posts(driver, 0)
+    # In capture mode the posts are read from the feed's network payloads, DOM scraping is the fallback
+    captured = None
+    if network_capture:
+        capture = NetworkCapture(driver, record_dir=network_capture_dir, debug=debug, resource_policy=resource_policy)
+        captured = capture_feed(driver, storage.submit, capture, dedup=dedup, debug=debug)
+
+    # Scrape the feed until no new posts load, every post-dict is stored on a background thread
+    if captured is None:
+        scrape_feed(driver, actions, storage.submit, extraction_mode=extraction_mode, snapshot_dir=snapshot_dir,
+                    debug=debug, stats=stage_stats, use_observer=feed_observer, checkpoint=checkpoint, dedup=dedup,
+                    governor=governor, max_comments=max_comments, comment_timeout=comment_timeout,
+                    fast_mode=fast_mode, fast_comment_threshold=fast_comment_threshold,
+                    resource_policy=resource_policy)
 
     # Clean up resources
+    resource_policy.collect(driver)
     driver.quit()
     sys.exit()
 except KeyboardInterrupt:
     driver.quit()
     sys.exit()
+finally:
+    # write and flush any queued posts, this also runs on sys.exit()
+    storage.close()
+    sink.close()
+    if dedup is not None: dedup.close()
+    if checkpoint is not None: checkpoint.close()
+    waits.save(wait_stats_file)
+    locators.save(locator_stats_file)
+    print(stage_stats.summary())
+    print(waits.summary())
+    print(registry.summary())
+    print(locators.summary())
+    print(resource_policy.summary())
+    if profiler is not None:
+        print(profiler.summary())
+        if profile_file:
+            profiler.write_folded(profile_file)
+            print(f"WebDriver profile written to {profile_file}")
@@ -0,0 +1,185 @@
+"""
+Memory Governor
+
+Keeps the tab's memory bounded during very long feed sessions.  Removing every processed post is
+not enough on its own: detached dialog trees, images and videos keep Chrome's memory growing
+until the tab slows to a crawl.
+
+Between feed batches (when no popup is open) the governor:
+1. samples the JS heap and the DOM node count through CDP (Performance.getMetrics), falling back
+   to performance.memory and an element count where CDP is unavailable
+2. prunes offscreen media (images, videos, iframes) and leftover dialog nodes, in batches
+3. recycles the tab when the heap or the node count is still above its threshold: a fresh tab is
+   opened on the group with the cookies from storage/cookies.json and the old tab is closed.
+   The crawl then continues where it was, because the Checkpoint (or DedupIndex) skips every post
+   that was already scraped without opening it.
+"""
+import os
+from typing import Optional
+
+from colorama import Fore, Style
+from selenium.common import JavascriptException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+import metrics
+
+js_memory_sample = """
+const memory = performance.memory;
+return {
+    heap: memory ? memory.usedJSHeapSize : 0,
+    nodes: document.getElementsByTagName('*').length
+};
+"""
+
+# Only called between posts: any dialog still in the page is a remnant of a closed popup
+js_prune_page = """
+const limit = arguments[0];
+let pruned = 0;
+for (const dialog of document.querySelectorAll('div[role="dialog"]')) {
+    if (pruned >= limit) break;
+    dialog.remove();
+    pruned++;
+}
+const top = -window.innerHeight;
+const bottom = 2 * window.innerHeight;
+for (const media of document.querySelectorAll('img:not([data-pruned]), video:not([data-pruned]), iframe')) {
+    if (pruned >= limit) break;
+    const box = media.getBoundingClientRect();
+    if (box.bottom >= top && box.top <= bottom) continue;  // on or near the screen
+    if (media.tagName === 'IFRAME') {
+        media.remove();
+    } else if (media.tagName === 'VIDEO') {
+        media.pause();
+        media.removeAttribute('src');
+        for (const source of media.querySelectorAll('source')) source.remove();
+        media.load();
+        media.dataset.pruned = '1';
+    } else {
+        media.removeAttribute('srcset');
+        media.src = 'data:,';
+        media.dataset.pruned = '1';
+    }
+    pruned++;
+}
+return pruned;
+"""
+
+
+class MemoryGovernor:
+    """
+    Samples, prunes and, if needed, recycles the scraping tab.
+
+    Args:
+        group_link: The group being scraped, reopened when the tab is recycled.
+        max_heap_mb: Recycle above this JS heap size.
+        max_nodes: Recycle above this many DOM nodes.
+        check_every: Sample after at least this many scraped posts.
+        prune_batch: Maximum number of nodes pruned per check.
+        cookies_file: The stored login cookies used for the fresh tab.
+        can_resume: Whether scraped posts are skipped after a reload (a Checkpoint or DedupIndex is in use),
+                    without it the tab is only pruned, never recycled.
+        debug: Print every sample.
+    """
+
+    def __init__(self, group_link: str, max_heap_mb: float = 1024, max_nodes: int = 150_000, check_every: int = 25,
+                 prune_batch: int = 500, cookies_file: str = "storage/cookies.json", can_resume: bool = True,
+                 debug: bool = False):
+        self.group_link = group_link
+        self.max_heap_mb = max_heap_mb
+        self.max_nodes = max_nodes
+        self.check_every = max(1, check_every)
+        self.prune_batch = prune_batch
+        self.cookies_file = cookies_file
+        self.can_resume = can_resume
+        self.debug = debug
+        self.recycles = 0
+        self.pruned = 0
+        self._last_check = 0
+        self._cdp_handle: Optional[str] = None  # the tab Performance.enable was sent for
+
+    def sample(self, driver: WebDriver) -> dict:
+        """
+        Returns:
+            {"heap_mb": float, "nodes": int}
+        """
+        try:
+            if self._cdp_handle != driver.current_window_handle:
+                driver.execute_cdp_cmd("Performance.enable", {})
+                self._cdp_handle = driver.current_window_handle
+            values = {metric["name"]: metric["value"]
+                      for metric in driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]}
+            sample = {"heap_mb": values.get("JSHeapUsedSize", 0) / 2 ** 20, "nodes": int(values.get("Nodes", 0))}
+        except (AttributeError, KeyError, WebDriverException):  # not a Chromium driver
+            try:
+                values = driver.execute_script(js_memory_sample)
+                sample = {"heap_mb": values["heap"] / 2 ** 20, "nodes": int(values["nodes"])}
+            except (JavascriptException, WebDriverException) as e:
+                print(f"{Fore.RED}Could not sample the page's memory: {e}{Style.RESET_ALL}")
+                return {"heap_mb": 0.0, "nodes": 0}
+        metrics.dom_nodes.set(sample["nodes"])
+        return sample
+
+    def over_limit(self, sample: dict) -> bool:
+        return sample["heap_mb"] > self.max_heap_mb or sample["nodes"] > self.max_nodes
+
+    def prune(self, driver: WebDriver) -> int:
+        """Removes leftover dialogs and the content of offscreen media, at most prune_batch nodes."""
+        try:
+            pruned = driver.execute_script(js_prune_page, self.prune_batch) or 0
+        except (JavascriptException, WebDriverException) as e:
+            print(f"{Fore.RED}Could not prune the page: {e}{Style.RESET_ALL}")
+            return 0
+        self.pruned += pruned
+        return pruned
+
+    def recycle(self, driver: WebDriver) -> bool:
+        """
+        Opens the group in a fresh tab (logged in with the stored cookies) and closes the old one.
+
+        Returns:
+            True if the driver is now on the group page in the fresh tab.
+        """
+        from scraper_functions import login
+
+        old_handle = driver.current_window_handle
+        try:
+            driver.switch_to.new_window("tab")
+            new_handle = driver.current_window_handle
+            driver.switch_to.window(old_handle)
+            driver.close()
+            driver.switch_to.window(new_handle)
+            if os.path.exists(self.cookies_file):
+                login(driver, self.group_link, use_cookies=True)
+            else:
+                driver.get(self.group_link)  # same browser profile, the session cookies are still set
+        except WebDriverException as e:
+            print(f"{Fore.RED}Could not recycle the tab: {e}{Style.RESET_ALL}")
+            return False
+        self.recycles += 1
+        metrics.tab_recycles.inc()
+        print(f"{Fore.YELLOW}Recycled the tab (#{self.recycles}), continuing from the checkpoint.{Style.RESET_ALL}")
+        return True
+
+    def check(self, driver: WebDriver, posts_scraped: int) -> bool:
+        """
+        Called between feed batches, while no popup is open.  Every check_every posts it prunes the page, samples
+        it, and recycles the tab when it is still over a threshold.
+
+        Returns:
+            True if the tab was recycled (the feed has to be observed again).
+        """
+        if posts_scraped - self._last_check < self.check_every:
+            return False
+        self._last_check = posts_scraped
+
+        pruned = self.prune(driver)
+        sample = self.sample(driver)
+        if self.debug: print(f"Memory: pruned {pruned} nodes, {sample['heap_mb']:.0f} MB heap, {sample['nodes']} nodes")
+        if not self.over_limit(sample):
+            return False
+
+        if not self.can_resume:
+            print(f"{Fore.YELLOW}The page is over its memory limits but cannot be recycled without a checkpoint or "
+                  f"dedup index.{Style.RESET_ALL}")
+            return False
+        return self.recycle(driver)
@@ -0,0 +1,89 @@
+"""
+Prometheus Metrics
+
+Counters, histograms and gauges for long unattended runs, served on http://<host>:<metrics_port>/metrics
+when 'metrics_port' is set in settings.json:
+- scraper_posts_scraped_total, scraper_comments_scraped_total
+- scraper_popup_open_failures_total{reason}:  the popup did not open (click failed or dialog timeout)
+- scraper_popup_close_timeouts_total:         the popup did not go stale after ESCAPE
+- scraper_storage_write_seconds:              latency of one sink write
+- scraper_stage_seconds{stage}:               every StageStats stage (scroll, open, extract, close, ...)
+- scraper_dom_nodes:                          elements in the page, sampled once per feed batch
+- scraper_tab_recycles_total:                 tabs replaced by the memory governor
+- scraper_requests_blocked_total{type}:       requests blocked by the resource policy, per resource type
+
+Until the endpoint is started (and whenever prometheus_client is not installed) the metrics are
+no-ops, prometheus_client is only imported by start_metrics_server.
+"""
+from colorama import Fore, Style
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+_latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# No-ops until start_metrics_server replaces them, callers always go through the module (metrics.posts_scraped.inc())
+posts_scraped = comments_scraped = popup_open_failures = popup_close_timeouts = _NoopMetric()
+storage_write_seconds = stage_seconds = dom_nodes = tab_recycles = requests_blocked = _NoopMetric()
+
+
+def _create_metrics() -> None:
+    """Replaces the no-ops by prometheus_client metrics (raises ImportError if it is not installed)."""
+    from prometheus_client import Counter, Gauge, Histogram
+
+    global posts_scraped, comments_scraped, popup_open_failures, popup_close_timeouts, storage_write_seconds
+    global stage_seconds, dom_nodes, tab_recycles, requests_blocked
+    posts_scraped = Counter("scraper_posts_scraped", "Posts scraped.")
+    comments_scraped = Counter("scraper_comments_scraped", "Comments scraped.")
+    popup_open_failures = Counter("scraper_popup_open_failures", "Posts whose popup could not be opened.", ["reason"])
+    popup_close_timeouts = Counter("scraper_popup_close_timeouts", "Popups that did not go stale after ESCAPE.")
+    storage_write_seconds = Histogram("scraper_storage_write_seconds", "Latency of one sink write.",
+                                      buckets=_latency_buckets)
+    stage_seconds = Histogram("scraper_stage_seconds", "Latency of a scrape stage.", ["stage"],
+                              buckets=_latency_buckets)
+    dom_nodes = Gauge("scraper_dom_nodes", "Elements in the page.")
+    tab_recycles = Counter("scraper_tab_recycles", "Tabs replaced by the memory governor.")
+    requests_blocked = Counter("scraper_requests_blocked", "Requests blocked by the resource policy.", ["type"])
+
+
+# True once the endpoint is running, for metrics that cost a WebDriver call to collect
+enabled = False
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> bool:
+    """
+    Serves the metrics on http://host:port/metrics from a daemon thread.
+
+    Returns:
+        True if the endpoint is running.
+    """
+    global enabled
+    if enabled:
+        return True
+    try:
+        from prometheus_client import start_http_server
+    except ImportError:
+        print(f"{Fore.YELLOW}prometheus_client is not installed, metrics are disabled.{Style.RESET_ALL}")
+        return False
+    try:
+        if isinstance(posts_scraped, _NoopMetric):
+            _create_metrics()
+        start_http_server(port, addr=host)
+    except OSError as e:
+        print(f"{Fore.RED}Could not start the metrics server on port {port}: {e}{Style.RESET_ALL}")
+        return False
+    enabled = True
+    print(f"{Fore.GREEN}Metrics available at http://{host}:{port}/metrics{Style.RESET_ALL}")
+    return True
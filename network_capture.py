@@ -0,0 +1,316 @@
+"""
+Network Capture
+
+An optional capture mode that reads posts from the GraphQL responses the group page already
+fetches while the feed is scrolled, instead of opening every post, hovering its date and waiting
+for the popup to close.
+
+Chrome's performance log (enabled by driver_init(capture_network=True)) carries the DevTools
+Network events.  For every finished response whose URL matches the GraphQL endpoint the body is
+fetched with Network.getResponseBody and parsed as a stream of JSON documents (Facebook sends
+several newline separated documents per response, sometimes behind a 'for (;;);' guard):
+- every {"__typename": "Story"} node becomes a post-dict (actors[0].name, message.text and the
+  exact creation_time, kept as 'timestamp' and 'date_iso' next to the tooltip-formatted 'date')
+- every {"__typename": "Comment"} node inside it becomes a comment (author.name, body.text), with
+  'parent' pointing at the comment whose replies it was found in
+
+Only the comments included in the feed's payloads are captured (Facebook includes a preview, not
+the whole thread).  When the first page yields no posts (e.g. the payload format changed) the
+caller falls back to DOM scraping (scrape_feed).
+
+Every payload can be recorded to 'network_capture_dir' and served again by the replay server:
+    python replay_server.py run fixtures/ --network-capture --payloads storage/payloads/
+"""
+import base64
+import json
+import os
+import re
+from typing import Callable, Iterator, Optional
+
+from colorama import Fore, Style
+from selenium.common import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from date_engine import format_timestamp, iso_date
+from dedup import DedupIndex
+from fingerprint import card_fingerprint
+from resource_policy import ResourcePolicy
+
+graphql_url_pattern = r"/api/graphql/?(\?|$)"
+
+_decoder = json.JSONDecoder()
+_guard = "for (;;);"
+
+
+def iter_json_documents(body: str) -> Iterator[object]:
+    """
+    Yields every JSON document of a response body one at a time (newline delimited or concatenated documents, with
+    or without the 'for (;;);' guard).  A malformed document ends the stream.
+    """
+    position, length = 0, len(body)
+    while position < length:
+        while position < length and body[position] in " \t\r\n":
+            position += 1
+        if body.startswith(_guard, position):
+            position += len(_guard)
+            continue
+        if position >= length:
+            return
+        try:
+            document, position = _decoder.raw_decode(body, position)
+        except ValueError:
+            return
+        yield document
+
+
+def _path(node, *keys):
+    for key in keys:
+        if isinstance(key, int):
+            if not isinstance(node, list) or len(node) <= key:
+                return None
+        elif not isinstance(node, dict):
+            return None
+        node = node[key] if isinstance(key, int) else node.get(key)
+    return node
+
+
+def _find(node, key: str, stop_types: tuple = ("Story", "Comment")):
+    """The first value of 'key' in a node's subtree, without descending into nested stories or comments."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            if key in current:
+                return current[key]
+            stack.extend(value for value in reversed(list(current.values()))
+                         if not (isinstance(value, dict) and value.get("__typename") in stop_types))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+    return None
+
+
+def _text(value) -> str:
+    if isinstance(value, dict):
+        value = value.get("text")
+    return value if isinstance(value, str) else ""
+
+
+def _comments(story: dict) -> list[dict]:
+    """Every comment in a story's subtree in document order, replies reference the comment they were nested in."""
+    comments: list[dict] = []
+    seen: set = set()
+    stack: list[tuple[object, Optional[int]]] = [(story, None)]
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, dict):
+            if node.get("__typename") == "Story" and node is not story:
+                continue
+            if node.get("__typename") == "Comment":
+                comment_id = node.get("id")
+                if comment_id is not None and comment_id in seen:
+                    continue
+                seen.add(comment_id)
+                comments.append({
+                    "username": _text(_path(node, "author", "name")),
+                    "comment_text": _text(node.get("body")),
+                    "parent": parent,
+                })
+                parent = len(comments) - 1
+            stack.extend((value, parent) for value in reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend((value, parent) for value in reversed(node))
+    return comments
+
+
+def parse_story(story: dict) -> Optional[dict]:
+    """
+    Converts a Story node into a post-dict.
+
+    Returns:
+        {"username", "post_text", "date", "date_iso", "timestamp", "comments", "id"}, or None if the node has neither
+        an author nor a text (e.g. a shared attachment's inner story).
+    """
+    username = _text(_path(story, "actors", 0, "name")) or _text(_path(_find(story, "actors"), 0, "name"))
+    post_text = _text(story.get("message")) or _text(_find(story, "message"))
+    if not username and not post_text:
+        return None
+    timestamp = story.get("creation_time") or _find(story, "creation_time")
+    exact = isinstance(timestamp, (int, float))
+    return {
+        "username": username,
+        "post_text": post_text,
+        "date": format_timestamp(timestamp) if exact else "",
+        "date_iso": iso_date(timestamp) if exact else "",
+        "timestamp": timestamp if exact else None,
+        "comments": _comments(story),
+        "id": str(story.get("post_id") or story.get("id") or ""),
+    }
+
+
+def parse_payload(body: str) -> list[dict]:
+    """Every post in a response body, outermost stories only (a shared post's original is part of its text)."""
+    posts = []
+    for document in iter_json_documents(body):
+        stack = [document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if node.get("__typename") == "Story":
+                    post = parse_story(node)
+                    if post is not None:
+                        posts.append(post)
+                        continue
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+    return posts
+
+
+class NetworkCapture:
+    """
+    Collects the GraphQL response bodies from the driver's performance log.
+
+    Args:
+        driver: A WebDriver created with driver_init(capture_network=True).
+        url_pattern: Regular expression matched against the response URLs.
+        record_dir: If set, every captured body is written there as <sequence>.graphql.txt.
+        debug: Print every captured response.
+        resource_policy: Optional ResourcePolicy that is handed every Network event (the performance log can only be
+                         read once).
+    """
+
+    def __init__(self, driver: WebDriver, url_pattern: str = graphql_url_pattern, record_dir: str = "",
+                 debug: bool = False, resource_policy: Optional[ResourcePolicy] = None):
+        self.driver = driver
+        self.url_pattern = re.compile(url_pattern)
+        self.record_dir = record_dir
+        self.debug = debug
+        self.resource_policy = resource_policy
+        self.responses = 0
+        self._pending: dict[str, str] = {}  # requestId -> url
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def drain(self) -> list[str]:
+        """Returns the bodies of every matching response that finished since the last call."""
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException as e:
+            print(f"{Fore.RED}Could not read the performance log (was the driver created with capture_network?):\n"
+                  f"{e}{Style.RESET_ALL}")
+            return []
+
+        bodies = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method, params = message.get("method"), message.get("params", {})
+            if self.resource_policy is not None:
+                self.resource_policy.observe(method, params)
+            if method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if self.url_pattern.search(url):
+                    self._pending[params["requestId"]] = url
+            elif method == "Network.loadingFailed":
+                self._pending.pop(params.get("requestId"), None)
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                url = self._pending.pop(params["requestId"])
+                body = self._body(params["requestId"])
+                if body is None:
+                    continue
+                if self.debug: print(f"Captured {len(body)} characters from {url}")
+                self._record(body)
+                bodies.append(body)
+        return bodies
+
+    def _body(self, request_id: str) -> Optional[str]:
+        try:
+            response = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except WebDriverException as e:  # evicted from the buffer, or a redirect without a body
+            if self.debug: print(f"{Fore.YELLOW}No body for request {request_id}: {e}{Style.RESET_ALL}")
+            return None
+        body = response.get("body", "")
+        if response.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", errors="replace")
+        return body
+
+    def _record(self, body: str) -> None:
+        self.responses += 1
+        if not self.record_dir:
+            return
+        try:
+            with open(os.path.join(self.record_dir, f"{self.responses:05d}.graphql.txt"), "w", encoding="utf-8") as f:
+                f.write(body)
+        except OSError as e:
+            print(f"{Fore.RED}Could not record the payload: {e}{Style.RESET_ALL}")
+
+
+def capture_feed(driver: WebDriver, on_post: Callable[[dict], None], capture: NetworkCapture,
+                 dedup: Optional[DedupIndex] = None, should_stop: Optional[Callable[[], bool]] = None,
+                 debug: bool = False) -> Optional[int]:
+    """
+    Scrolls the feed and hands every post parsed from the captured payloads to on_post, until no new posts load.
+    Rendered posts are removed after every round, their data has already been captured.
+
+    Args:
+        driver: A WebDriver created with driver_init(capture_network=True), on the group page.
+        on_post: Called with every post-dict.
+        capture: The NetworkCapture reading the driver's performance log.
+        dedup: Optional DedupIndex, posts whose fingerprint was seen before are skipped (and new ones added).
+        should_stop: Optional callable checked after every round.
+        debug: Print additional information.
+
+    Returns:
+        The number of posts captured, or None if the first page rendered posts but no payload could be parsed (the
+        caller should fall back to scrape_feed, nothing was removed from the page).
+    """
+    from scraper_functions import scroll_and_wait_for_new_posts
+    from feed_observer import read_rendered_posts, remove_posts
+    from selector_registry import registry
+    import metrics
+
+    seen_ids: set = set()
+    num_posts = 0
+
+    def emit(posts: list[dict]) -> None:
+        nonlocal num_posts
+        for post in posts:
+            post_id = post.pop("id")
+            if post_id and post_id in seen_ids:
+                continue
+            seen_ids.add(post_id)
+            post["post_id"] = post_id  # the storage key (see fingerprint.post_key)
+            fingerprint = card_fingerprint(post["username"], post["post_text"], post_id)
+            if dedup is not None:
+                if dedup.seen(fingerprint):
+                    if debug: print(f"{Fore.YELLOW}Skipping duplicate post {fingerprint}{Style.RESET_ALL}")
+                    continue
+                dedup.add(fingerprint)
+            on_post(post)
+            num_posts += 1
+            metrics.posts_scraped.inc()
+            metrics.comments_scraped.inc(len(post["comments"]))
+            print(f"{Fore.BLUE}{post}{Style.RESET_ALL}")
+
+    first_round = True
+    loaded = True
+    while loaded:
+        posts = [post for body in capture.drain() for post in parse_payload(body)]
+        rendered = read_rendered_posts(driver, registry["post_class"].classes)
+        if first_round and not posts and rendered:
+            print(f"{Fore.YELLOW}No posts could be parsed from the network payloads, falling back to DOM scraping."
+                  f"{Style.RESET_ALL}")
+            return None
+        first_round = False
+
+        emit(posts)
+        if debug: print(f"{Fore.BLUE}Captured {len(posts)} posts, removing {len(rendered)} rendered posts{Style.RESET_ALL}")
+        remove_posts(driver, [card["element"] for card in rendered])
+        if should_stop is not None and should_stop():
+            break
+        loaded = scroll_and_wait_for_new_posts(driver, 0)
+
+    emit([post for body in capture.drain() for post in parse_payload(body)])  # the responses of the last scroll
+    return num_posts
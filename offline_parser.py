@@ -0,0 +1,347 @@
+"""
+Offline Popup Parser
+
+Instead of asking chromedriver for every field, the opened post dialog is snapshotted once
+(its outerHTML) and every XPath from constants.py is evaluated locally with compiled lxml
+XPath objects.  The raw snapshots can be kept on disk and re-parsed later.
+
+Parity between the offline parser and the live Selenium extraction can be checked against
+saved snapshots (each <name>.html is stored next to the <name>.json the scraper produced):
+    python offline_parser.py parity snapshots/
+
+The scraper also keeps the post's feed card as <name>.feed.html, so a snapshot directory doubles
+as a set of replay fixtures (see replay_server.py).
+
+Snapshots from a real session can be checked in as test fixtures once they are anonymized: every
+word of the names and texts is replaced by a pseudo-word (consistently in the .html, .feed.html and
+.json files, so parity is kept), links, images, scripts and unknown attributes are dropped:
+    python offline_parser.py anonymize snapshots/ tests/fixtures/captured/
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Optional
+
+from lxml import etree, html as lxml_html
+
+from selector_registry import registry
+
+# Every XPath in constants.py, compiled once by the selector registry: {"post_text_obj": etree.XPath, ...}
+compiled_xpaths: dict[str, etree.XPath] = registry.lxml_xpaths()
+
+# Tags whose content is rendered on its own line, mirroring how WebElement.text separates blocks
+_block_tags = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "tr", "ul",
+}
+_skipped_tags = {"script", "style", "noscript", "template"}
+_inline_whitespace = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+def visible_text(element) -> str:
+    """
+    Approximates WebElement.text for an lxml element: script/style content and elements hidden
+    with the 'hidden' attribute or an inline 'display: none' are skipped, block elements start new
+    lines, and whitespace is collapsed.
+    """
+    if element is None:
+        return ""
+    parts: list[str] = []
+
+    def walk(node) -> None:
+        if not isinstance(node.tag, str):  # comments and processing instructions
+            if node.tail:
+                parts.append(node.tail)
+            return
+        tag = node.tag.lower()
+        hidden = tag in _skipped_tags or node.get("hidden") is not None or "display: none" in (node.get("style") or "")
+        if not hidden:
+            block = tag in _block_tags
+            if block:
+                parts.append("\n")
+            if tag == "br":
+                parts.append("\n")
+            if node.text:
+                parts.append(node.text)
+            for child in node:
+                walk(child)
+            if block:
+                parts.append("\n")
+        if node.tail:
+            parts.append(node.tail)
+
+    tail = element.tail
+    element.tail = None
+    try:
+        walk(element)
+    finally:
+        element.tail = tail
+
+    lines = [_inline_whitespace.sub(" ", line).strip() for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def _first(name: str, context):
+    matches = compiled_xpaths[name](context)
+    registry.record(name, bool(matches))
+    return matches[0] if matches else None
+
+
+def _parent_of(comment, container, index: dict) -> Optional[int]:
+    """The parent index of a comment, like js_parent_of in comment_threads.py."""
+    node = comment.getparent()
+    while node is not None and node is not container:
+        sibling = node.getprevious()
+        while sibling is not None:
+            if sibling in index:
+                return index[sibling]
+            sibling = sibling.getprevious()
+        node = node.getparent()
+    return None
+
+
+def parse_popup_html(snapshot: str, date: str = "") -> dict:
+    """
+    Parses a dialog snapshot into the same dict shape pop_up_scrape returns.
+
+    Args:
+        snapshot: outerHTML of the post dialog (see snapshot_popup).
+        date: The date read from the hover tooltip, which is not part of the static HTML.
+
+    Returns:
+        {"username": str, "post_text": str, "date": str,
+         "comments": [{"username": str, "comment_text": str, "parent": Optional[int]}, ...]}
+    """
+    root = lxml_html.fromstring(snapshot)
+    document = root.getroottree()
+
+    username = visible_text(_first("username_popup_obj", document)).replace("'s post", "")
+    post_text = visible_text(_first("post_text_obj", document))
+
+    comment_list = []
+    comment_container = _first("comment_pop_up_class_obj", document)
+    if comment_container is not None:
+        comments = compiled_xpaths["individual_comment_class_obj"](comment_container)
+        index = {comment: position for position, comment in enumerate(comments)}
+        for comment in comments:
+            comment_list.append({
+                "username": visible_text(_first("individual_comment_name_obj", comment)),
+                "comment_text": visible_text(_first("individual_comment_text_obj", comment)),
+                "parent": _parent_of(comment, comment_container, index),
+            })
+
+    return {"username": username, "post_text": post_text, "date": date, "comments": comment_list}
+
+
+def snapshot_popup(popup_window, driver) -> str:
+    """
+    Returns the outerHTML of the whole dialog that contains the popup, in one WebDriver call.
+    The dialog (not only the popup element) is kept so the absolute '//div[@role='dialog']' XPaths still match.
+    """
+    return driver.execute_script(
+        "const dialog = arguments[0].closest('[role=\"dialog\"]') || arguments[0];"
+        "return dialog.outerHTML;",
+        popup_window,
+    )
+
+
+def save_snapshot(snapshot_dir: str, snapshot: str, post_info: dict, feed_html: str = "") -> str:
+    """
+    Stores a snapshot and the post-dict the scraper produced for it, for later re-parsing and parity checks.
+    If given, the outerHTML of the post's feed card is stored as well (used by replay_server.py).
+
+    Returns:
+        The path of the stored .html file.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    digest = hashlib.sha1(snapshot.encode("utf-8")).hexdigest()[:12]
+    name = os.path.join(snapshot_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{digest}")
+    with open(name + ".html", "w", encoding="utf-8") as f:
+        f.write(snapshot)
+    with open(name + ".json", "w", encoding="utf-8") as f:
+        json.dump(post_info, f, indent=4, ensure_ascii=False)
+    if feed_html:
+        with open(name + ".feed.html", "w", encoding="utf-8") as f:
+            f.write(feed_html)
+    return name + ".html"
+
+
+# Words the XPaths rely on ("'s post", 'Leave a comment', 'Loading...') or that only label the interface, kept as they
+# are by the anonymizer
+_interface_words = {
+    "s", "post", "leave", "a", "comment", "comments", "loading", "see", "more", "less", "view", "replies", "reply",
+    "like", "share", "most", "relevant", "all", "write", "answer", "as", "at", "am", "pm", "yesterday", "just", "now",
+    "pinned", "featured", "by", "and", "others", "edited", "author", "admin", "top", "contributor",
+}
+# Attributes the XPaths, the feed-card reader and visible_text read, every other attribute is dropped
+_kept_attributes = {"class", "role", "dir", "aria-label", "aria-hidden", "aria-posinset", "data-ad-rendering-role",
+                    "hidden", "style", "href", "target", "attributionsrc", "tabindex"}
+_word = re.compile(r"[^\W\d_]+")
+
+
+class Anonymizer:
+    """
+    Replaces words by pseudo-words of the same length and case, the same word always by the same pseudo-word.
+
+    Args:
+        salt: Secret mixed into the mapping, so the pseudo-words cannot be reversed with a dictionary (random if not
+              given, pass the same salt to anonymize several directories consistently).
+    """
+
+    def __init__(self, salt: Optional[bytes] = None):
+        self.salt = salt if salt is not None else os.urandom(16)
+
+    def word(self, word: str) -> str:
+        if word.lower() in _interface_words:
+            return word
+        digest = hashlib.blake2b(word.lower().encode("utf-8"), key=self.salt, digest_size=32).digest()
+        pseudo = "".join(chr(ord("a") + digest[index % len(digest)] % 26) for index in range(len(word)))
+        if len(word) > 1 and word.isupper():
+            return pseudo.upper()
+        return pseudo.capitalize() if word[0].isupper() else pseudo
+
+    def text(self, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return value
+        return _word.sub(lambda match: self.word(match.group(0)), value)
+
+    def html(self, snapshot: str) -> str:
+        """Anonymizes the text and aria-labels of a snapshot, drops scripts, links and unknown attributes."""
+        root = lxml_html.fragment_fromstring(snapshot)
+        for node in root.xpath(".//script | .//style | .//noscript | .//link | .//img | .//svg"):
+            node.drop_tree()
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            element.text = self.text(element.text)
+            if element is not root:
+                element.tail = self.text(element.tail)
+            for name in list(element.attrib):
+                if name not in _kept_attributes:
+                    del element.attrib[name]
+            if element.get("aria-label"):
+                element.set("aria-label", self.text(element.get("aria-label")))
+            if element.get("href") is not None:
+                element.set("href", "#")
+        return etree.tostring(root, encoding="unicode", method="html")
+
+    def post(self, post_info: dict) -> dict:
+        """Anonymizes a post-dict like its snapshot (the date is kept, the permalink dropped)."""
+        anonymized = dict(post_info, username=self.text(post_info.get("username", "")),
+                          post_text=self.text(post_info.get("post_text", "")),
+                          comments=[dict(comment, username=self.text(comment.get("username", "")),
+                                         comment_text=self.text(comment.get("comment_text", "")))
+                                    for comment in post_info.get("comments", [])])
+        for field in ("permalink", "post_id", "date_label"):
+            anonymized.pop(field, None)
+        return anonymized
+
+
+def anonymize_snapshots(snapshot_dir: str, output_dir: str, salt: Optional[bytes] = None) -> int:
+    """
+    Writes an anonymized copy of every snapshot (<name>.html, <name>.json and <name>.feed.html) to output_dir.
+
+    Returns:
+        The number of snapshots written.
+    """
+    anonymizer = Anonymizer(salt)
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    for html_path in sorted(glob.glob(os.path.join(snapshot_dir, "*.html"))):
+        if html_path.endswith(".feed.html"):
+            continue
+        name = html_path[:-len(".html")]
+        if not os.path.exists(name + ".json"):
+            continue
+        target = os.path.join(output_dir, os.path.basename(name))
+        with open(html_path, "r", encoding="utf-8") as f:
+            snapshot = anonymizer.html(f.read())
+        with open(name + ".json", "r", encoding="utf-8") as f:
+            post_info = anonymizer.post(json.load(f))
+        with open(target + ".html", "w", encoding="utf-8") as f:
+            f.write(snapshot)
+        with open(target + ".json", "w", encoding="utf-8") as f:
+            json.dump(post_info, f, indent=4, ensure_ascii=False)
+        if os.path.exists(name + ".feed.html"):
+            with open(name + ".feed.html", "r", encoding="utf-8") as f:
+                feed_html = anonymizer.html(f.read())
+            with open(target + ".feed.html", "w", encoding="utf-8") as f:
+                f.write(feed_html)
+        count += 1
+    return count
+
+
+def check_parity(snapshot_dir: str) -> list[tuple[str, str]]:
+    """
+    Re-parses every stored snapshot and compares it with the post-dict stored next to it.
+
+    Returns:
+        A list of (snapshot path, description) for every mismatching field.
+    """
+    mismatches = []
+    for html_path in sorted(glob.glob(os.path.join(snapshot_dir, "*.html"))):
+        if html_path.endswith(".feed.html"):
+            continue
+        json_path = html_path[:-len(".html")] + ".json"
+        if not os.path.exists(json_path):
+            continue
+        with open(html_path, "r", encoding="utf-8") as f:
+            snapshot = f.read()
+        with open(json_path, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+
+        parsed = parse_popup_html(snapshot, date=expected.get("date", ""))
+        for field in ("username", "post_text"):
+            if parsed[field] != expected.get(field, ""):
+                mismatches.append((html_path, f"{field}: {parsed[field]!r} != {expected.get(field, '')!r}"))
+
+        expected_comments = expected.get("comments", [])
+        if len(parsed["comments"]) != len(expected_comments):
+            mismatches.append((html_path, f"comments: {len(parsed['comments'])} parsed != {len(expected_comments)} expected"))
+        for index, (got, want) in enumerate(zip(parsed["comments"], expected_comments)):
+            for field, default in (("username", ""), ("comment_text", ""), ("parent", None)):
+                if got.get(field, default) != want.get(field, default):
+                    mismatches.append((html_path, f"comments[{index}].{field}: {got.get(field)!r} != {want.get(field)!r}"))
+    return mismatches
+
+
+def reparse_snapshot(html_path: str) -> dict:
+    """Parses a stored snapshot again, e.g. after the XPaths in constants.py have been updated."""
+    with open(html_path, "r", encoding="utf-8") as f:
+        snapshot = f.read()
+    date = ""
+    json_path = html_path[:-len(".html")] + ".json"
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            date = json.load(f).get("date", "")
+    return parse_popup_html(snapshot, date=date)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline popup parser utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parity_parser = subparsers.add_parser("parity", help="Compare offline parsing with the stored scraper output.")
+    parity_parser.add_argument("snapshot_dir")
+    reparse_parser = subparsers.add_parser("reparse", help="Parse a stored snapshot and print the result.")
+    reparse_parser.add_argument("html_path")
+    anonymize_parser = subparsers.add_parser("anonymize", help="Write anonymized copies of stored snapshots.")
+    anonymize_parser.add_argument("snapshot_dir")
+    anonymize_parser.add_argument("output_dir")
+    args = parser.parse_args()
+
+    if args.command == "parity":
+        found = check_parity(args.snapshot_dir)
+        for path, description in found:
+            print(f"{path}: {description}")
+        print(f"{len(found)} mismatches")
+        raise SystemExit(1 if found else 0)
+    elif args.command == "reparse":
+        print(json.dumps(reparse_snapshot(args.html_path), indent=4, ensure_ascii=False))
+    elif args.command == "anonymize":
+        written = anonymize_snapshots(args.snapshot_dir, args.output_dir)
+        print(f"Wrote {written} anonymized snapshots to {args.output_dir}")
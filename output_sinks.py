@@ -0,0 +1,304 @@
+"""
+Output Sinks
+
+Pluggable writers for the post dictionaries produced by pop_up_scrape.
+
+Available formats (chosen with the 'output_format' setting):
+- json:      the original single-array layout (data.json), appended in place instead of re-written
+- jsonl:     JSON Lines, one post per line, buffered writes with periodic fsync
+- jsonl.gz:  gzip compressed JSON Lines, rolled over into numbered segments
+- jsonl.zst: zstd compressed JSON Lines segments (requires the 'zstandard' package)
+- sqlite:    normalized posts/comments tables with batched transactions (see sqlite_storage.py),
+             also chosen automatically when output_file ends with .db, .sqlite or .sqlite3
+
+Any of the JSON Lines layouts can be turned back into the single-array layout with:
+    python output_sinks.py convert data.jsonl data.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+from typing import Iterator, Optional
+
+
+def append_to_json_array(file_path: str, post_data: dict) -> None:
+    """
+    Appends one post to a JSON array file without reading or re-writing the existing content.
+
+    The closing bracket at the end of the file is overwritten by the new element, followed by a new
+    closing bracket, so the file stays a valid (indent=4) JSON array after every call.
+
+    Args:
+        file_path: Path of the JSON array file, created if it does not exist.
+        post_data: The post-dict to append.
+    """
+    element = json.dumps(post_data, indent=4)
+    element = "\n".join("    " + line for line in element.splitlines())
+
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        with open(file_path, "w") as f:
+            f.write("[\n" + element + "\n]")
+        return
+
+    with open(file_path, "rb+") as f:
+        # walk backwards from the end of the file to find the closing bracket of the array
+        position = f.seek(0, os.SEEK_END)
+        last_char = b""
+        while position > 0:
+            position -= 1
+            f.seek(position)
+            last_char = f.read(1)
+            if not last_char.isspace():
+                break
+        if last_char != b"]":
+            raise ValueError(f"{file_path} does not end with a JSON array.")
+
+        # check whether the array is empty ("[]") to know if a separating comma is needed
+        previous = position
+        previous_char = b""
+        while previous > 0:
+            previous -= 1
+            f.seek(previous)
+            previous_char = f.read(1)
+            if not previous_char.isspace():
+                break
+
+        # drop the closing bracket and the whitespace before it, then write the new tail
+        f.seek(previous + 1)
+        f.truncate()
+        separator = "\n" if previous_char == b"[" else ",\n"
+        f.write((separator + element + "\n]").encode("utf-8"))
+
+
+class JsonArraySink:
+    """Writes posts into the original single JSON array file (e.g. data.json)."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def write(self, post_data: dict) -> None:
+        append_to_json_array(self.file_path, post_data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonLinesSink:
+    """
+    Appends posts to a JSON Lines file.
+
+    Lines are buffered in memory and written once 'buffer_size' posts are pending, or once
+    'fsync_interval' seconds have passed since the last fsync, so a slow crawl that never fills the
+    buffer still loses at most that window of data in a crash.
+    """
+
+    def __init__(self, file_path: str, buffer_size: int = 20, fsync_interval: float = 5.0):
+        self.file_path = file_path
+        self.buffer_size = max(1, buffer_size)
+        self.fsync_interval = fsync_interval
+        self._buffer: list[str] = []
+        self._file = open(file_path, "a", encoding="utf-8")
+        self._last_sync = time.monotonic()
+
+    def write(self, post_data: dict) -> None:
+        self._buffer.append(json.dumps(post_data, ensure_ascii=False))
+        if len(self._buffer) >= self.buffer_size or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+class SegmentedJsonLinesSink:
+    """
+    Writes compressed JSON Lines into rolling segments: data.00001.jsonl.gz, data.00002.jsonl.gz, ...
+
+    A new segment is started every 'segment_size' posts, so a finished segment is never touched
+    again and a crash can only affect the segment that is currently open.
+    """
+
+    def __init__(self, file_path: str, compression: str = "gzip", segment_size: int = 5000):
+        if compression not in ("gzip", "zstd"):
+            raise ValueError(f"Unknown compression '{compression}', expected 'gzip' or 'zstd'.")
+        self.compression = compression
+        self.segment_size = max(1, segment_size)
+        self.base_path = _strip_extensions(file_path)
+        self._file = None
+        self._segment_posts = 0
+        # continue after the highest existing segment, earlier segments may have been moved away or deleted
+        self._segment_index = max((segment_index(path) for path in segment_paths(self.base_path)), default=0)
+
+    def _open_next_segment(self) -> None:
+        self._close_segment()
+        self._segment_index += 1
+        extension = ".jsonl.gz" if self.compression == "gzip" else ".jsonl.zst"
+        path = f"{self.base_path}.{self._segment_index:05d}{extension}"
+
+        if self.compression == "gzip":
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        else:
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("The 'jsonl.zst' output_format requires the 'zstandard' package (pip install zstandard).")
+            raw_file = open(path, "ab")
+            self._file = zstandard.ZstdCompressor().stream_writer(raw_file, closefd=True)
+        self._segment_posts = 0
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, post_data: dict) -> None:
+        if self._file is None or self._segment_posts >= self.segment_size:
+            self._open_next_segment()
+        line = json.dumps(post_data, ensure_ascii=False) + "\n"
+        if self.compression == "gzip":
+            self._file.write(line)
+        else:
+            self._file.write(line.encode("utf-8"))
+        self._segment_posts += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        self._close_segment()
+
+
+def open_sink(file_path: str, output_format: str = "json", **options):
+    """
+    Returns the sink for the given output_format.
+
+    Args:
+        file_path: The 'output_file' setting.
+        output_format: One of 'json', 'jsonl', 'jsonl.gz', 'jsonl.zst' or 'sqlite'.
+        **options: Optional tuning, 'buffer_size', 'fsync_interval', 'segment_size', 'batch_size'
+                   and 'batch_seconds'.
+
+    Returns:
+        An object with write(post_data), flush() and close().
+    """
+    if output_format == "sqlite" or file_path.endswith((".db", ".sqlite", ".sqlite3")):
+        from sqlite_storage import SqliteSink
+        return SqliteSink(file_path, batch_size=options.get("batch_size", 50),
+                          batch_seconds=options.get("batch_seconds", 10.0))
+    if output_format == "json":
+        return JsonArraySink(file_path)
+    if output_format == "jsonl":
+        return JsonLinesSink(file_path, buffer_size=options.get("buffer_size", 20),
+                             fsync_interval=options.get("fsync_interval", 5.0))
+    if output_format in ("jsonl.gz", "jsonl.zst"):
+        compression = "gzip" if output_format == "jsonl.gz" else "zstd"
+        return SegmentedJsonLinesSink(file_path, compression=compression,
+                                      segment_size=options.get("segment_size", 5000))
+    raise ValueError(f"Unknown output_format '{output_format}'.")
+
+
+def _strip_extensions(file_path: str) -> str:
+    for extension in (".jsonl.gz", ".jsonl.zst", ".jsonl", ".json"):
+        if file_path.endswith(extension):
+            return file_path[:-len(extension)]
+    return file_path
+
+
+def segment_paths(base_path: str) -> list[str]:
+    """Returns the existing compressed segments for a base path, in write order."""
+    base_path = _strip_extensions(base_path)
+    paths = glob.glob(f"{glob.escape(base_path)}.[0-9][0-9][0-9][0-9][0-9].jsonl.gz")
+    paths += glob.glob(f"{glob.escape(base_path)}.[0-9][0-9][0-9][0-9][0-9].jsonl.zst")
+    return sorted(paths)
+
+
+def segment_index(path: str) -> int:
+    """Returns the number of a segment, e.g. data.00012.jsonl.gz -> 12."""
+    return int(_strip_extensions(path).rsplit(".", 1)[1])
+
+
+def iter_posts(source: str) -> Iterator[dict]:
+    """
+    Yields posts one at a time from a JSON Lines file, a single compressed segment, or a
+    segment base path (e.g. 'data' for data.00001.jsonl.gz, data.00002.jsonl.gz, ...).
+    """
+    if os.path.exists(source):
+        paths = [source]
+    else:
+        paths = segment_paths(source)
+        if not paths:
+            raise FileNotFoundError(f"No JSON Lines file or segments found for '{source}'.")
+
+    for path in paths:
+        if path.endswith(".gz"):
+            f = gzip.open(path, "rt", encoding="utf-8")
+        elif path.endswith(".zst"):
+            import io
+            import zstandard
+            f = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+                                 encoding="utf-8")
+        else:
+            f = open(path, "r", encoding="utf-8")
+        with f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def convert_to_json_array(source: str, destination: str, limit: Optional[int] = None) -> int:
+    """
+    Streams JSON Lines posts into the original single-array layout, so existing consumers of
+    data.json keep working.  Only one post is held in memory at a time.
+
+    Args:
+        source: A .jsonl file, a compressed segment, or a segment base path.
+        destination: The JSON array file to write (overwritten).
+        limit: Optionally stop after this many posts.
+
+    Returns:
+        The number of posts written.
+    """
+    count = 0
+    with open(destination, "w", encoding="utf-8") as out:
+        out.write("[")
+        for post in iter_posts(source):
+            if limit is not None and count >= limit:
+                break
+            element = "\n".join("    " + line for line in json.dumps(post, indent=4).splitlines())
+            out.write(("\n" if count == 0 else ",\n") + element)
+            count += 1
+        out.write("\n]" if count else "]")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Output sink utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert JSON Lines output into a single JSON array.")
+    convert_parser.add_argument("source", help="JSON Lines file, compressed segment, or segment base path")
+    convert_parser.add_argument("destination", help="JSON array file to write, e.g. data.json")
+    convert_parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        written = convert_to_json_array(args.source, args.destination, limit=args.limit)
+        print(f"Wrote {written} posts to {args.destination}")
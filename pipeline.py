@@ -0,0 +1,130 @@
+"""
+Scrape Pipeline
+
+Splits the per-post work so the browser never waits on storage:
+- the browser thread opens, extracts and closes posts (scrape_feed)
+- a background thread fingerprints, de-duplicates (against a DedupIndex when one is given, see dedup.py),
+  serializes and writes every post to the sink
+
+The two are connected by a bounded queue, so a slow disk eventually slows the browser down
+(backpressure) instead of growing memory without limit.  Every stage records its latency in a
+StageStats, printed at the end of the run to show where the time goes.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from colorama import Fore, Style
+
+from fingerprint import post_key
+import metrics
+
+
+class StageStats:
+    """Thread-safe latency samples per pipeline stage."""
+
+    def __init__(self):
+        self._samples: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+        metrics.stage_seconds.labels(stage=stage).observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def percentiles(self, stage: str) -> dict:
+        with self._lock:
+            samples = sorted(self._samples.get(stage, []))
+        if not samples:
+            return {"count": 0}
+
+        def pick(fraction: float) -> float:
+            return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+        return {"count": len(samples), "total": sum(samples), "p50": pick(0.50), "p95": pick(0.95),
+                "p99": pick(0.99), "max": samples[-1]}
+
+    def stages(self) -> list[str]:
+        with self._lock:
+            return list(self._samples)
+
+    def as_dict(self) -> dict:
+        return {stage: self.percentiles(stage) for stage in self.stages()}
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<14}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for stage, values in self.as_dict().items():
+            lines.append(f"{stage:<14}{values['count']:>8}{values['total']:>10.1f}{values['p50'] * 1000:>10.1f}"
+                         f"{values['p95'] * 1000:>10.1f}{values['max'] * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+class StoragePipeline:
+    """
+    Hands post-dicts to a background thread that de-duplicates and writes them to the sink.
+
+    Use submit() as the on_post callback of scrape_feed and close() at the end of the run.
+    """
+
+    _stop = object()
+
+    def __init__(self, sink, maxsize: int = 64, stats: Optional[StageStats] = None, debug: bool = False,
+                 dedup=None):
+        self.sink = sink
+        self.dedup = dedup
+        self.stats = stats if stats is not None else StageStats()
+        self.debug = debug
+        self.written = 0
+        self.duplicates = 0
+        self._seen: set[str] = set()
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._thread = threading.Thread(target=self._run, name="storage-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, post_info: dict) -> None:
+        """Queues a post for storage, blocking while the queue is full."""
+        with self.stats.time("handoff"):
+            self._queue.put((time.perf_counter(), post_info))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._stop:
+                break
+            queued_at, post_info = item
+            self.stats.record("queued", time.perf_counter() - queued_at)
+            try:
+                with self.stats.time("store"):
+                    fingerprint = post_key(post_info)
+                    if self.dedup is not None:
+                        duplicate = not self.dedup.add(fingerprint)
+                    else:
+                        duplicate = fingerprint in self._seen
+                        self._seen.add(fingerprint)
+                    if duplicate:
+                        self.duplicates += 1
+                        if self.debug: print(f"{Fore.YELLOW}Skipping duplicate post {fingerprint}{Style.RESET_ALL}")
+                        continue
+                    write_started = time.perf_counter()
+                    self.sink.write(post_info)
+                    metrics.storage_write_seconds.observe(time.perf_counter() - write_started)
+                    self.written += 1
+            except Exception as e:
+                print(f"{Fore.RED}Error storing post data: {e}{Style.RESET_ALL}")
+
+    def close(self) -> None:
+        """Waits until every queued post has been written, then flushes the sink."""
+        if self._thread.is_alive():
+            self._queue.put(self._stop)
+            self._thread.join()
+        self.sink.flush()
@@ -0,0 +1,706 @@
+"""
+Replay Server
+
+A local stand-in for a Facebook group, so open_post, pop_up_scrape, get_rendered_posts and the
+feed scrolling can be exercised (and timed) without a live session.
+
+The page has the same structure the XPaths in constants.py rely on: a div[role="feed"] whose
+posts carry aria-posinset / profile_name / story_message, a date link that opens a
+div[role="dialog"] popup, the "'s post" header, the hover tooltip with the readable date, and a
+comment section (the second match of comment_pop_up_class_obj) that loads lazily behind a
+role="status" loader, with reply threads collapsed behind "View N replies" buttons.  The feed scrolls infinitely in batches and every request can be given a
+fixed latency, so runs are deterministic.
+
+Before every feed batch is rendered the page fetches /api/graphql/ like the real group page does,
+so network capture (see network_capture.py) can be run against it too.  The payloads are either
+recorded ones (network_capture_dir, loaded with --payloads) or generated from the fixtures.
+
+Fixtures come from a directory of captured snapshots (run the scraper with snapshot_dir set:
+every post stores <name>.feed.html, <name>.html and <name>.json there) or are generated.
+
+Usage:
+    python replay_server.py generate fixtures/ --posts 50 --comments 12 --replies 3
+    python replay_server.py serve fixtures/ --port 8765
+    python replay_server.py run fixtures/ --extraction-mode js     (headless scrape, checked against the fixtures)
+    python replay_server.py run fixtures/ --network-capture        (capture mode, checked against the fixtures)
+"""
+import argparse
+import glob
+import html
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from colorama import Fore, Style
+from lxml import etree, html as lxml_html
+
+from constants import post_class, js_date_class
+from offline_parser import compiled_xpaths
+from date_engine import format_timestamp, parse_tooltip_date
+
+replay_page = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Replay Group</title>
+<style>
+body { font-family: sans-serif; margin: 0; }
+div[role="feed"] > div { min-height: 240px; margin: 12px auto; max-width: 640px; border: 1px solid #ccc; padding: 8px; }
+div[role="dialog"] { position: fixed; inset: 0; overflow-y: auto; background: #fff; z-index: 10; padding: 16px; }
+div[role="status"] { min-height: 40px; }
+</style>
+</head>
+<body>
+<div role="main"><div role="feed"></div></div>
+<script>
+const replay = {offset: 0, more: true, loading: false, batch: __FEED_BATCH__};
+const feed = document.querySelector('div[role="feed"]');
+
+async function getJson(url) {
+    const response = await fetch(url);
+    return response.json();
+}
+
+async function loadPosts() {
+    if (replay.loading || !replay.more) return;
+    replay.loading = true;
+    const indicator = document.createElement('div');
+    indicator.setAttribute('role', 'progressbar');
+    feed.parentElement.appendChild(indicator);
+    try {
+        const query = '?offset=' + replay.offset + '&limit=' + replay.batch;
+        await (await fetch('/api/graphql/' + query)).text();  // the data the real page renders the batch from
+        const page = await getJson('/feed' + query);
+        for (const post of page.posts) feed.insertAdjacentHTML('beforeend', post);
+        replay.offset += page.posts.length;
+        replay.more = page.more;
+    } finally {
+        indicator.remove();
+        replay.loading = false;
+    }
+}
+
+function nearBottom() {
+    return window.innerHeight + window.scrollY >= document.body.scrollHeight - 300;
+}
+window.addEventListener('scroll', () => { if (nearBottom()) loadPosts(); });
+setInterval(() => { if (nearBottom()) loadPosts(); }, 100);  // also when removed posts shrink the page
+
+function closeDialog() {
+    for (const node of document.querySelectorAll('div[role="dialog"], .replay-tooltip')) node.remove();
+}
+
+async function loadComments(dialog, loader) {
+    if (loader.dataset.loading) return;
+    loader.dataset.loading = '1';
+    const page = await getJson('/comments/' + dialog.dataset.replayId + '/' + loader.dataset.batch);
+    loader.insertAdjacentHTML('beforebegin', page.html);
+    delete loader.dataset.loading;
+    if (!page.more) { loader.remove(); return; }
+    loader.dataset.batch = String(Number(loader.dataset.batch) + 1);
+    const box = loader.getBoundingClientRect();
+    if (box.top < window.innerHeight && box.bottom > 0) loadComments(dialog, loader);  // still in view
+}
+
+async function openDialog(id) {
+    closeDialog();
+    const page = await getJson('/dialog/' + id);
+    document.body.insertAdjacentHTML('beforeend', page.html);
+    const dialog = document.body.lastElementChild;
+    dialog.dataset.replayDate = page.date;
+    const loader = dialog.querySelector('div[role="status"][aria-label="Loading..."]');
+    if (loader) {
+        loader.dataset.batch = '1';
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadComments(dialog, loader);
+        }).observe(loader);
+    }
+}
+
+document.addEventListener('click', event => {
+    const link = event.target.closest('a');
+    if (!link) return;
+    event.preventDefault();
+    const post = link.closest('[data-replay-id]');
+    if (post && post.parentElement === feed) openDialog(post.dataset.replayId);
+}, true);
+
+document.addEventListener('click', async event => {
+    const button = event.target.closest('[data-replay-replies]');
+    if (!button || button.dataset.loading) return;
+    button.dataset.loading = '1';
+    const dialog = button.closest('div[role="dialog"]');
+    const page = await getJson('/replies/' + dialog.dataset.replayId + '/' + button.dataset.replayReplies);
+    button.outerHTML = page.html;
+});
+
+document.addEventListener('keydown', event => { if (event.key === 'Escape') closeDialog(); });
+
+document.addEventListener('mouseover', event => {
+    const dialog = event.target.closest('div[role="dialog"]');
+    if (!dialog || document.querySelector('.replay-tooltip')) return;
+    if (!event.target.closest('a[attributionsrc]') && !event.target.querySelector(':scope > a[attributionsrc]')) return;
+    const tooltip = document.createElement('span');
+    tooltip.className = 'replay-tooltip __JS_DATE_CLASS__';
+    tooltip.textContent = dialog.dataset.replayDate;
+    document.body.appendChild(tooltip);
+});
+
+loadPosts();
+</script>
+</body>
+</html>
+"""
+
+
+# ------------------------------------------------
+# FIXTURES
+# ------------------------------------------------
+
+def _text_lines(text: str, tag: str = "div") -> str:
+    lines = [html.escape(line) for line in text.split("\n")] or [""]
+    if tag == "br":
+        return "<br>".join(lines)
+    return "".join(f'<div dir="auto">{line}</div>' for line in lines)
+
+
+def render_feed_card(post: dict, position: int, truncate_at: int = 200) -> str:
+    """
+    Renders a feed post with the structure of post_class_obj, date_enclosing_span_obj and the feed-card reader: texts
+    longer than truncate_at are cut behind a "See more" button, and posts with comments show their comment count.
+    """
+    username = html.escape(post.get("username", ""))
+    post_text = post.get("post_text", "")
+    message = _text_lines(post_text)
+    if len(post_text) > truncate_at:
+        message = _text_lines(post_text[:truncate_at] + "…") + '<div role="button">See more</div>'
+    comment_count = len(post.get("comments", []))
+    counter = f'<div><span>{comment_count} comment{"" if comment_count == 1 else "s"}</span></div>' if comment_count else ""
+    return (
+        f'<div class="{post_class}">'
+        f'<div aria-posinset="{position}">'
+        f'<div><div><div data-ad-rendering-role="profile_name"><h4><span><a href="#" role="link"><strong>'
+        f'<span>{username}</span></strong></a></span></h4></div></div>'
+        f'<div><span><span><a target="_blank" attributionsrc="/replay" href="#" role="link">1h</a></span></span>'
+        f'</div></div>'
+        f'<div data-ad-rendering-role="story_message">{message}</div>'
+        f'{counter}'
+        f'</div></div>'
+    )
+
+
+def render_comment(comment: dict) -> str:
+    """Renders one comment matching individual_comment_class_obj and its name/text XPaths."""
+    name = html.escape(comment.get("username", ""))
+    return (
+        f'<div role="article" aria-label="Comment by {name}">'
+        f'<div><a aria-hidden="false" href="#"><span><span dir="auto">{name}</span></span></a></div>'
+        f'<div dir="auto">{_text_lines(comment.get("comment_text", ""), tag="br")}</div>'
+        f'</div>'
+    )
+
+
+def render_thread(comments: list[dict]) -> str:
+    """
+    Renders a flat comment list (replies reference their parent's index) as nested threads: every comment is wrapped
+    in a div, followed by a div with its replies.
+    """
+    top_level: list[int] = []
+    replies: dict[int, list[int]] = {index: [] for index in range(len(comments))}
+    for index, comment in enumerate(comments):
+        parent = comment.get("parent")
+        (replies[parent] if parent is not None else top_level).append(index)
+
+    def thread(index: int) -> str:
+        nested = "".join(thread(reply) for reply in replies[index])
+        return f'<div>{render_comment(comments[index])}{f"<div>{nested}</div>" if nested else ""}</div>'
+
+    return "".join(thread(index) for index in top_level)
+
+
+def render_dialog(post: dict) -> str:
+    """
+    Renders the popup of a post.  The comment list is the second match of comment_pop_up_class_obj: the first match
+    is the reaction summary after the "Leave a comment" button, the second the last div of the comment section.
+    """
+    username = html.escape(post.get("username", ""))
+    comments = render_thread(post.get("comments", []))
+    return (
+        f'<div role="dialog">'
+        f'<div>'
+        f'<div><h2><span>{username}\'s post</span></h2><hr></div>'
+        f'<div>'
+        f'<div><div><div data-ad-rendering-role="profile_name"><h4><a href="#"><strong><span>{username}</span></strong>'
+        f'</a></h4></div></div>'
+        f'<div><span><a attributionsrc="/replay" href="#">1h</a></span> <span><a attributionsrc="/replay" href="#">1h</a>'
+        f'</span></div></div>'
+        f'<div data-ad-rendering-role="story_message">{_text_lines(post.get("post_text", ""))}</div>'
+        f'<div><div aria-label="Leave a comment" role="button">Comment</div></div>'
+        f'<div><div>{len(post.get("comments", []))} comments</div></div>'
+        f'</div>'
+        f'<div><div>Most relevant</div><div>{comments}</div></div>'
+        f'</div>'
+        f'</div>'
+    )
+
+
+def generate_fixtures(count: int, comments_per_post: int = 10, seed: int = 0, max_replies: int = 0) -> list[dict]:
+    """
+    Generates 'count' deterministic post-dicts, the dates have the tooltip format (with a narrow no-break space).
+    Every top-level comment gets up to max_replies replies.
+    """
+    rng = random.Random(seed)
+    words = ("group", "rent", "bike", "free", "meeting", "tonight", "anyone", "lost", "found", "keys", "garden",
+             "sale", "help", "thanks", "question", "update", "photos", "event", "parking", "street")
+    months = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+              "November", "December")
+    weekdays = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(length)).capitalize()
+
+    posts = []
+    for index in range(count):
+        hour, minute = rng.randint(1, 12), rng.randint(0, 59)
+        rng.choice(weekdays)  # kept so the seeds produce the same posts, the weekday follows from the date
+        month, day, pm = months.index(rng.choice(months)) + 1, rng.randint(1, 28), rng.choice((False, True))
+        date = format_timestamp(datetime(2025, month, day, hour % 12 + (12 if pm else 0), minute).timestamp())
+        posts.append({
+            "username": f"Member {index:04d}",
+            "post_text": "\n".join(sentence(rng.randint(4, 14)) for _ in range(rng.randint(1, 3))),
+            "date": date,
+            "comments": [],
+        })
+        for _ in range(comments_per_post):
+            comments = posts[-1]["comments"]
+            parent = len(comments)
+            comments.append({"username": f"Commenter {rng.randint(0, 999):03d}",
+                             "comment_text": sentence(rng.randint(2, 10)), "parent": None})
+            for _ in range(rng.randint(0, max_replies) if max_replies else 0):
+                comments.append({"username": f"Commenter {rng.randint(0, 999):03d}",
+                                 "comment_text": sentence(rng.randint(2, 10)), "parent": parent})
+    return posts
+
+
+def graphql_story(post: dict, position: int) -> dict:
+    """A post-dict as the Story node of a GraphQL feed payload (see network_capture.py), comments nested as replies."""
+    comments = post.get("comments", [])
+    nodes = [{"__typename": "Comment", "id": f"comment:{position}:{index}",
+              "author": {"__typename": "User", "name": comment.get("username", "")},
+              "body": {"text": comment.get("comment_text", "")},
+              "feedback": {"replies_connection": {"edges": []}}} for index, comment in enumerate(comments)]
+    top_level = []
+    for index, comment in enumerate(comments):
+        parent = comment.get("parent")
+        edges = nodes[parent]["feedback"]["replies_connection"]["edges"] if parent is not None else top_level
+        edges.append({"node": nodes[index]})
+    timestamp = parse_tooltip_date(post.get("date", ""))
+    return {
+        "__typename": "Story",
+        "id": f"story:{position}",
+        "post_id": str(position),
+        "actors": [{"__typename": "User", "name": post.get("username", "")}],
+        "message": {"text": post.get("post_text", "")},
+        "creation_time": int(timestamp) if timestamp is not None else None,
+        "feedback": {"comment_list_renderer": {"comments": {"edges": top_level}}},
+    }
+
+
+def render_graphql_payload(posts: list[dict], offset: int) -> str:
+    """A streamed GraphQL response: the 'for (;;);' guard, then one JSON document per story."""
+    documents = [json.dumps({"data": {"node": graphql_story(post, offset + index)}}, ensure_ascii=False)
+                 for index, post in enumerate(posts)]
+    return "for (;;);" + "\n".join(documents)
+
+
+def load_payloads(payload_dir: str) -> list[str]:
+    """Loads recorded payloads (<sequence>.graphql.txt, see network_capture.py) in recording order."""
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(payload_dir, "*.graphql.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            payloads.append(f.read())
+    return payloads
+
+
+def write_fixtures(fixture_dir: str, posts: list[dict]) -> None:
+    """Writes posts in the capture layout (<name>.feed.html, <name>.html, <name>.json)."""
+    os.makedirs(fixture_dir, exist_ok=True)
+    for index, post in enumerate(posts):
+        name = os.path.join(fixture_dir, f"synthetic-{index:05d}")
+        with open(name + ".feed.html", "w", encoding="utf-8") as f:
+            f.write(render_feed_card(post, index + 1))
+        with open(name + ".html", "w", encoding="utf-8") as f:
+            f.write(render_dialog(post))
+        with open(name + ".json", "w", encoding="utf-8") as f:
+            json.dump(post, f, indent=4, ensure_ascii=False)
+
+
+def load_fixtures(fixture_dir: str) -> list[dict]:
+    """
+    Loads captured (or written) fixtures in capture order.
+
+    Returns:
+        [{"name": str, "feed_html": str, "dialog_html": str, "expected": dict}, ...], a missing feed card is rendered
+        from the expected post-dict.
+    """
+    fixtures = []
+    for html_path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        if html_path.endswith(".feed.html"):
+            continue
+        name = html_path[:-len(".html")]
+        if not os.path.exists(name + ".json"):
+            continue
+        with open(html_path, "r", encoding="utf-8") as f:
+            dialog_html = f.read()
+        with open(name + ".json", "r", encoding="utf-8") as f:
+            expected = json.load(f)
+        feed_html = ""
+        if os.path.exists(name + ".feed.html"):
+            with open(name + ".feed.html", "r", encoding="utf-8") as f:
+                feed_html = f.read()
+        fixtures.append({"name": os.path.basename(name), "feed_html": feed_html or render_feed_card(expected, 1),
+                         "dialog_html": dialog_html, "expected": expected})
+    return fixtures
+
+
+def _strip_external(root) -> None:
+    """Removes scripts and external resources so a replayed snapshot never reaches the network."""
+    for node in root.xpath(".//script | .//link"):
+        node.getparent().remove(node)
+    for node in root.xpath(".//*[@src or @srcset or @href]"):
+        for attribute in ("src", "srcset"):
+            node.attrib.pop(attribute, None)
+        if node.get("href") is not None:
+            node.set("href", "#")
+
+
+def _prepare_feed_card(feed_html: str, index: int) -> str:
+    root = lxml_html.fragment_fromstring(feed_html)
+    _strip_external(root)
+    root.set("data-replay-id", str(index))
+    return etree.tostring(root, encoding="unicode", method="html")
+
+
+def _collapse_replies(container) -> list[str]:
+    """
+    Replaces every reply list (an element after a comment that contains comments) with a "View N replies" button.
+
+    Returns:
+        [HTML of every reply list], indexed by the buttons' data-replay-replies attribute.
+    """
+    replies: list[str] = []
+    comment_xpath = compiled_xpaths["individual_comment_class_obj"]
+    for comment in comment_xpath(container):
+        if container not in comment.iterancestors():  # inside a reply list that was collapsed already
+            continue
+        for sibling in list(comment.itersiblings()):
+            count = len(comment_xpath(sibling))
+            if not count:
+                continue
+            button = etree.Element("div", {"role": "button", "data-replay-replies": str(len(replies))})
+            button.text = f"View {count} repl{'y' if count == 1 else 'ies'}"
+            replies.append(etree.tostring(sibling, encoding="unicode", method="html", with_tail=False))
+            sibling.addprevious(button)
+            button.tail = sibling.tail
+            sibling.getparent().remove(sibling)
+    return replies
+
+
+def _prepare_dialog(dialog_html: str, index: int, comment_batch: int) -> tuple[str, list[str], list[str]]:
+    """
+    Collapses the captured reply lists and splits the comments into lazy batches.
+
+    Returns:
+        (dialog HTML with the first batch and a loader, [HTML of every further batch], [HTML of every reply list])
+    """
+    root = lxml_html.fragment_fromstring(dialog_html)
+    _strip_external(root)
+    root.set("data-replay-id", str(index))
+    for loader in root.xpath(".//div[@role='status']"):
+        loader.getparent().remove(loader)
+
+    matches = compiled_xpaths["comment_pop_up_class_obj"](root.getroottree())
+    batches: list[str] = []
+    replies: list[str] = []
+    if matches:
+        container = matches[0]
+        replies = _collapse_replies(container)
+        comments = list(container)
+        for start in range(comment_batch, len(comments), comment_batch):
+            chunk = comments[start:start + comment_batch]
+            batches.append("".join(etree.tostring(node, encoding="unicode", method="html") for node in chunk))
+            for node in chunk:
+                container.remove(node)
+        if batches:
+            # the loader lives inside the comment list, so it does not change which divs the XPaths match
+            loader = etree.SubElement(container, "div", {"role": "status", "aria-label": "Loading..."})
+            etree.SubElement(loader, "div")
+    return etree.tostring(root, encoding="unicode", method="html"), batches, replies
+
+
+# ------------------------------------------------
+# SERVER
+# ------------------------------------------------
+
+class ReplayServer:
+    """
+    Serves fixtures as an infinitely scrolling group page on localhost.
+
+    Args:
+        fixtures: As returned by load_fixtures.
+        port: 0 picks a free port.
+        feed_batch: Posts per feed page.
+        comment_batch: Comments per lazy comment batch.
+        latency: Seconds added to every 'feed', 'dialog' and 'comments' (also replies) request, e.g. {"feed": 0.5}.
+        debug: Log every request.
+        payloads: Recorded GraphQL payloads served one per feed batch, generated from the fixtures if not given.
+    """
+
+    def __init__(self, fixtures: list[dict], host: str = "127.0.0.1", port: int = 0, feed_batch: int = 5,
+                 comment_batch: int = 10, latency: Optional[dict] = None, debug: bool = False,
+                 payloads: Optional[list[str]] = None):
+        self.fixtures = fixtures
+        self.payloads = payloads
+        self.feed_batch = max(1, feed_batch)
+        self.latency = latency or {}
+        self.debug = debug
+        self.cards = [_prepare_feed_card(fixture["feed_html"], index) for index, fixture in enumerate(fixtures)]
+        self.dialogs = [_prepare_dialog(fixture["dialog_html"], index, max(1, comment_batch))
+                        for index, fixture in enumerate(fixtures)]
+        self.page = (replay_page.replace("__FEED_BATCH__", str(self.feed_batch))
+                     .replace("__JS_DATE_CLASS__", js_date_class))
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                if server.debug: print(f"replay: {format % args}")
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/groups/replay/"
+
+    def _delay(self, kind: str) -> None:
+        seconds = self.latency.get(kind, 0)
+        if seconds:
+            time.sleep(seconds)
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(request.path)
+        parts = [part for part in parsed.path.split("/") if part]
+        try:
+            if parts[:2] == ["api", "graphql"]:
+                self._delay("feed")
+                query = parse_qs(parsed.query)
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", [str(self.feed_batch)])[0])
+                if self.payloads is not None:
+                    batch = offset // self.feed_batch
+                    payload = self.payloads[batch] if batch < len(self.payloads) else ""
+                else:
+                    expected = [fixture["expected"] for fixture in self.fixtures[offset:offset + limit]]
+                    payload = render_graphql_payload(expected, offset)
+                self._send(request, 200, "text/plain; charset=utf-8", payload)
+                return
+            if parts[:1] == ["feed"]:
+                self._delay("feed")
+                query = parse_qs(parsed.query)
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", [str(self.feed_batch)])[0])
+                body = {"posts": self.cards[offset:offset + limit], "more": offset + limit < len(self.cards)}
+            elif parts[:1] == ["dialog"] and len(parts) == 2:
+                self._delay("dialog")
+                index = int(parts[1])
+                body = {"html": self.dialogs[index][0], "date": self.fixtures[index]["expected"].get("date", "")}
+            elif parts[:1] == ["replies"] and len(parts) == 3:
+                self._delay("comments")
+                body = {"html": self.dialogs[int(parts[1])][2][int(parts[2])]}
+            elif parts[:1] == ["comments"] and len(parts) == 3:
+                self._delay("comments")
+                batches = self.dialogs[int(parts[1])][1]
+                batch = int(parts[2])
+                body = {"html": batches[batch - 1] if 0 < batch <= len(batches) else "", "more": batch < len(batches)}
+            else:
+                self._send(request, 200, "text/html; charset=utf-8", self.page)
+                return
+            self._send(request, 200, "application/json", json.dumps(body))
+        except (ValueError, IndexError) as e:
+            self._send(request, 404, "text/plain", str(e))
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, content_type: str, body: str) -> None:
+        payload = body.encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(payload)))
+        request.send_header("Cache-Control", "no-store")
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# ------------------------------------------------
+# REPLAY RUNS
+# ------------------------------------------------
+
+def compare_posts(expected: list[dict], scraped: list[dict]) -> list[str]:
+    """
+    Compares scraped post-dicts with the fixtures' expected ones, in order, and describes every difference.  Posts read
+    from their feed card (fast mode, they have a 'comment_count') only show a relative date and are compared by their
+    comment count.
+    """
+    mismatches = []
+    if len(scraped) != len(expected):
+        mismatches.append(f"posts: {len(scraped)} scraped != {len(expected)} expected")
+    for index, (got, want) in enumerate(zip(scraped, expected)):
+        from_card = "comment_count" in got
+        for field in ("username", "post_text") if from_card else ("username", "post_text", "date"):
+            if got.get(field, "") != want.get(field, ""):
+                mismatches.append(f"[{index}].{field}: {got.get(field)!r} != {want.get(field)!r}")
+        if from_card:
+            if got["comment_count"] != len(want.get("comments", [])):
+                mismatches.append(f"[{index}].comment_count: {got['comment_count']} != {len(want.get('comments', []))}")
+            continue
+        got_comments, want_comments = got.get("comments", []), want.get("comments", [])
+        if len(got_comments) != len(want_comments):
+            mismatches.append(f"[{index}].comments: {len(got_comments)} scraped != {len(want_comments)} expected")
+        for position, (got_comment, want_comment) in enumerate(zip(got_comments, want_comments)):
+            for field, default in (("username", ""), ("comment_text", ""), ("parent", None)):
+                if got_comment.get(field, default) != want_comment.get(field, default):
+                    mismatches.append(f"[{index}].comments[{position}].{field}: "
+                                      f"{got_comment.get(field)!r} != {want_comment.get(field)!r}")
+    return mismatches
+
+
+def run_replay(fixtures: list[dict], extraction_mode: str = "selenium", headless: bool = True,
+               use_observer: bool = True, feed_batch: int = 5, comment_batch: int = 10,
+               latency: Optional[dict] = None, debug: bool = False, network_capture: bool = False,
+               payloads: Optional[list[str]] = None, fast_mode: bool = False, fast_comment_threshold: int = 0) -> dict:
+    """
+    Scrapes the fixtures through a ReplayServer with a fresh (headless) Chrome, in capture mode from the served
+    GraphQL payloads (falling back to DOM scraping like main.py).
+
+    Returns:
+        {"posts": [post-dict, ...], "mismatches": [str, ...], "seconds": float, "stats": StageStats}
+    """
+    from selenium.webdriver import ActionChains
+    from scraper_functions import driver_init, scrape_feed
+    from network_capture import NetworkCapture, capture_feed
+    from pipeline import StageStats
+
+    stats = StageStats()
+    posts: list[dict] = []
+    with ReplayServer(fixtures, feed_batch=feed_batch, comment_batch=comment_batch, latency=latency,
+                      debug=debug, payloads=payloads) as server:
+        driver = driver_init(headless=headless, capture_network=network_capture)
+        try:
+            driver.implicitly_wait(0)
+            driver.get(server.url)
+            started = time.perf_counter()
+            captured = None
+            if network_capture:
+                captured = capture_feed(driver, posts.append, NetworkCapture(driver, debug=debug), debug=debug)
+            if captured is None:
+                scrape_feed(driver, ActionChains(driver), posts.append, extraction_mode=extraction_mode, debug=debug,
+                            stats=stats, use_observer=use_observer, fast_mode=fast_mode,
+                            fast_comment_threshold=fast_comment_threshold)
+            seconds = time.perf_counter() - started
+        finally:
+            driver.quit()
+
+    return {"posts": posts, "mismatches": compare_posts([fixture["expected"] for fixture in fixtures], posts),
+            "seconds": seconds, "stats": stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured or generated group fixtures locally.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Write synthetic fixtures.")
+    generate_parser.add_argument("fixture_dir")
+    generate_parser.add_argument("--posts", type=int, default=50)
+    generate_parser.add_argument("--comments", type=int, default=10)
+    generate_parser.add_argument("--replies", type=int, default=0, help="Maximum replies per comment.")
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    for name, help_text in (("serve", "Serve fixtures until Ctrl-C."),
+                            ("run", "Scrape the fixtures with headless Chrome and check the result.")):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument("fixture_dir")
+        command_parser.add_argument("--feed-batch", type=int, default=5)
+        command_parser.add_argument("--comment-batch", type=int, default=10)
+        command_parser.add_argument("--feed-latency", type=float, default=0.0)
+        command_parser.add_argument("--dialog-latency", type=float, default=0.0)
+        command_parser.add_argument("--comment-latency", type=float, default=0.0)
+        command_parser.add_argument("--debug", action="store_true")
+        command_parser.add_argument("--payloads", default="", help="Directory of recorded GraphQL payloads.")
+    subparsers.choices["serve"].add_argument("--port", type=int, default=8765)
+    subparsers.choices["run"].add_argument("--extraction-mode", default="selenium",
+                                           choices=("selenium", "js", "offline"))
+    subparsers.choices["run"].add_argument("--no-headless", action="store_true")
+    subparsers.choices["run"].add_argument("--network-capture", action="store_true",
+                                           help="Read the posts from the GraphQL payloads instead of the popups.")
+    subparsers.choices["run"].add_argument("--fast-mode", action="store_true",
+                                           help="Only open the posts whose feed card is not enough.")
+    subparsers.choices["run"].add_argument("--fast-comment-threshold", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        write_fixtures(args.fixture_dir, generate_fixtures(args.posts, args.comments, args.seed, args.replies))
+        print(f"Wrote {args.posts} fixtures to {args.fixture_dir}")
+        raise SystemExit(0)
+
+    loaded = load_fixtures(args.fixture_dir)
+    if not loaded:
+        print(f"{Fore.RED}No fixtures found in {args.fixture_dir}{Style.RESET_ALL}")
+        raise SystemExit(1)
+    delays = {"feed": args.feed_latency, "dialog": args.dialog_latency, "comments": args.comment_latency}
+    recorded = load_payloads(args.payloads) if args.payloads else None
+
+    if args.command == "serve":
+        replay_server = ReplayServer(loaded, port=args.port, feed_batch=args.feed_batch,
+                                     comment_batch=args.comment_batch, latency=delays, debug=args.debug,
+                                     payloads=recorded)
+        print(f"Serving {len(loaded)} posts at {replay_server.url} (Ctrl-C to stop)")
+        try:
+            replay_server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            replay_server.stop()
+    elif args.command == "run":
+        result = run_replay(loaded, extraction_mode=args.extraction_mode, headless=not args.no_headless,
+                            feed_batch=args.feed_batch, comment_batch=args.comment_batch, latency=delays,
+                            debug=args.debug, network_capture=args.network_capture, payloads=recorded,
+                            fast_mode=args.fast_mode, fast_comment_threshold=args.fast_comment_threshold)
+        print(result["stats"].summary())
+        print(f"{len(result['posts'])} posts in {result['seconds']:.1f}s")
+        for mismatch in result["mismatches"]:
+            print(f"{Fore.RED}{mismatch}{Style.RESET_ALL}")
+        raise SystemExit(1 if result["mismatches"] else 0)
@@ -0,0 +1,168 @@
+"""
+Resource Policy
+
+Blocks the resources the scraper never reads (video, fonts, tracking pixels and, in the text-only
+preset, images) with the DevTools Network.setBlockedURLs command, so every scroll transfers and
+renders less.  Presets ('resource_policy' in settings.json):
+- "full":             nothing is blocked
+- "text+thumbnails":  video and audio, fonts, tracking/logging endpoints
+- "text":             the above and every image
+
+Blocking happens in the browser's network stack before a request is sent, there is no
+per-request round trip to Python.  The feed's own data requests (/api/graphql/, the page's
+scripts and stylesheets) are never blocked: every pattern is checked against them when the policy
+is created, including the 'resource_block_extra' patterns from settings.json.
+
+With a policy other than "full" the driver records the performance log, which is read between
+feed batches (or by network_capture.py in capture mode) to count the blocked requests per
+resource type and the bytes that were still transferred.  The bytes saved are an estimate: blocked
+requests have no size, the average size of that resource type is used (seen in this run, or
+typical_bytes).
+"""
+import json
+import re
+from collections import Counter
+from typing import Optional
+
+from colorama import Fore, Style
+from selenium.common import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+import metrics
+
+_media = ["*.mp4*", "*.m4a*", "*.m4v*", "*.webm*", "*.m3u8*", "*video*.fbcdn.net/*"]
+_fonts = ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"]
+_tracking = ["*facebook.com/tr/*", "*facebook.com/tr?*", "*/ajax/bz*", "*/ajax/bnzai*", "*connect.facebook.net/*",
+             "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*"]
+_images = ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.ico*", "*scontent*.fbcdn.net/*"]
+
+PRESETS = {
+    "full": [],
+    "text+thumbnails": _media + _fonts + _tracking,
+    "text": _media + _fonts + _tracking + _images,
+}
+
+# Requests the scraper depends on, no pattern may match them
+required_urls = [
+    "https://www.facebook.com/api/graphql/",
+    "https://www.facebook.com/groups/421208944706635/?sorting_setting=CHRONOLOGICAL",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yA/r/abcdef.js?_nc_x=Ij3Wp8lg5Kz",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yB/l/0,cross/abcdef.css?_nc_x=Ij3Wp8lg5Kz",
+]
+
+# Typical transfer size of a resource type, for the estimate when none of that type loaded in this run
+typical_bytes = {"Image": 40_000, "Media": 500_000, "Font": 30_000, "Script": 20_000, "Ping": 500, "Other": 1_000}
+
+
+def pattern_regex(pattern: str) -> re.Pattern:
+    """The regular expression of a setBlockedURLs pattern ('*' matches any characters)."""
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")) + "$")
+
+
+class ResourcePolicy:
+    """
+    A blocking preset and the statistics of what it blocked.
+
+    Args:
+        preset: A key of PRESETS.
+        extra_patterns: Additional setBlockedURLs patterns.
+
+    Raises:
+        ValueError: For an unknown preset, or a pattern that would block one of required_urls.
+    """
+
+    def __init__(self, preset: str = "full", extra_patterns: Optional[list[str]] = None):
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown resource policy {preset!r}, expected one of {', '.join(PRESETS)}")
+        self.preset = preset
+        self.patterns = PRESETS[preset] + list(extra_patterns or [])
+        for pattern in self.patterns:
+            regex = pattern_regex(pattern)
+            blocked = [url for url in required_urls if regex.match(url)]
+            if blocked:
+                raise ValueError(f"The resource pattern {pattern!r} would block {blocked[0]}")
+
+        self.blocked: Counter = Counter()  # resource type -> blocked requests
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+        self._loaded_by_type: Counter = Counter()  # resource type -> requests / bytes, for the estimate
+        self._bytes_by_type: Counter = Counter()
+        self._types: dict[str, str] = {}  # requestId -> resource type
+        self._cdp_handle: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.patterns)
+
+    def apply(self, driver: WebDriver) -> bool:
+        """
+        Blocks the patterns in the driver's current tab (again after the tab changed).
+
+        Returns:
+            True if the patterns are in place.
+        """
+        if not self.active:
+            return True
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
+            self._cdp_handle = driver.current_window_handle
+        except (AttributeError, WebDriverException) as e:  # not a Chromium driver
+            print(f"{Fore.RED}Could not apply the resource policy '{self.preset}': {e}{Style.RESET_ALL}")
+            return False
+        return True
+
+    def observe(self, method: str, params: dict) -> None:
+        """Counts one DevTools Network event (from the performance log)."""
+        if method == "Network.responseReceived":
+            self._types[params.get("requestId")] = params.get("type", "Other")
+        elif method == "Network.loadingFinished":
+            resource_type = self._types.pop(params.get("requestId"), "Other")
+            size = int(params.get("encodedDataLength", 0))
+            self.loaded_requests += 1
+            self.loaded_bytes += size
+            self._loaded_by_type[resource_type] += 1
+            self._bytes_by_type[resource_type] += size
+        elif method == "Network.loadingFailed":
+            self._types.pop(params.get("requestId"), None)
+            if params.get("blockedReason") == "inspector":  # blocked by setBlockedURLs
+                resource_type = params.get("type", "Other")
+                self.blocked[resource_type] += 1
+                metrics.requests_blocked.labels(type=resource_type).inc()
+
+    def collect(self, driver: WebDriver) -> None:
+        """Reads the performance log and re-applies the patterns if the tab changed, called between feed batches."""
+        if not self.active:
+            return
+        try:
+            if self._cdp_handle != driver.current_window_handle:
+                self.apply(driver)
+            entries = driver.get_log("performance")
+        except WebDriverException as e:
+            print(f"{Fore.RED}Could not read the performance log: {e}{Style.RESET_ALL}")
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            self.observe(message.get("method", ""), message.get("params", {}))
+
+    def saved_bytes(self) -> int:
+        """Estimated bytes not transferred because of the blocked requests."""
+        saved = 0
+        for resource_type, requests in self.blocked.items():
+            if self._loaded_by_type[resource_type]:
+                average = self._bytes_by_type[resource_type] / self._loaded_by_type[resource_type]
+            else:
+                average = typical_bytes.get(resource_type, typical_bytes["Other"])
+            saved += int(requests * average)
+        return saved
+
+    def summary(self) -> str:
+        if not self.active:
+            return f"Resource policy '{self.preset}': nothing blocked."
+        blocked = ", ".join(f"{resource_type} {requests}" for resource_type, requests in self.blocked.most_common())
+        return (f"Resource policy '{self.preset}': blocked {sum(self.blocked.values())} requests ({blocked or 'none'}), "
+                f"~{self.saved_bytes() / 2 ** 20:.1f} MB saved (estimated), "
+                f"{self.loaded_bytes / 2 ** 20:.1f} MB transferred in {self.loaded_requests} requests")
@@ -1,19 +1,39 @@
+"""
+Scraper Functions
+
+Browser setup, login, CAPTCHA handling and the feed/popup scraping loop.
+
+Only Selenium, colorama and the scraper's own modules are imported eagerly.  Everything a run may not need is
+imported on first use, so it does not pay for it at startup (see 'python benchmark.py startup'):
+- the CAPTCHA solver's dependencies (google-genai, requests, BeautifulSoup, python-dotenv), by the solver
+- lxml, by the offline extraction and snapshots (offline_parser.py, the selector registry compiles its lxml XPaths
+  lazily)
+- prometheus_client, by metrics.start_metrics_server
+"""
 import os
-from google import genai
 import re
-from google.genai import types
 
-
-from constants import *
+from constants import captcha_input_class, captcha_login_class, js_date_class
+from selector_registry import registry
+from locators import locators
+from comment_threads import expand_comments, comment_parents, js_parent_of
+from date_engine import dates, ResolvedDate, js_read_date_link, js_read_date_tooltip
+from output_sinks import append_to_json_array
+from pipeline import StageStats
+from adaptive_wait import waits, dialog_gone, feed_posts_rendered, url_changed
+from feed_observer import install_feed_observer, drain_new_posts, read_rendered_posts, remove_posts, wait_for_new_posts
+from checkpoint import Checkpoint
+from dedup import DedupIndex
+from fingerprint import card_fingerprint, post_id_from_url
+import metrics
+from memory_governor import MemoryGovernor
+from resource_policy import ResourcePolicy
 import random
-import requests
 from colorama import Fore, Style
-from bs4 import BeautifulSoup
 from selenium.webdriver.chrome.options import Options
 from selenium import webdriver
 import json
 from selenium.webdriver.common.keys import Keys
-from dotenv import load_dotenv
 from selenium.common import TimeoutException, ElementClickInterceptedException, NoSuchElementException, \
     StaleElementReferenceException, JavascriptException, WebDriverException # Added JS/WD Exceptions
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -22,13 +42,23 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC # Keep for potential standard waits elsewhere
 from selenium.webdriver.common.by import By # Keep for potential standard waits elsewhere
 from selenium.webdriver.common.action_chains import ActionChains
-from typing import Optional, Tuple, List # Use Tuple, List directly
+from typing import Optional, Tuple, List, Callable # Use Tuple, List directly
 import time
 
 
-def driver_init(window_size:tuple=(), headless=False) -> WebDriver:
+def driver_init(window_size:tuple=(), headless=False, user_data_dir: str = "", capture_network: bool = False,
+                resource_policy: Optional[ResourcePolicy] = None, debugger_address: str = "") -> WebDriver:
     """
     This function initializes the webdriver instance, in order to be undetectable by facebook.
+    Args:
+        window_size: Optional (width, height).
+        headless: Run Chrome without a window.
+        user_data_dir: Optional Chrome profile directory, so several browsers can run side by side in isolation.
+        capture_network: Record the DevTools Network events in the performance log (see network_capture.py).
+        resource_policy: Optional ResourcePolicy, its patterns are blocked before the first page load (the
+                         performance log is recorded as well, to count what was blocked).
+        debugger_address: Attach to the Chrome listening on this "host:port" instead of launching one (see
+                          browser_session.py), the other options were set when that Chrome was started.
     Returns:
         WebDriver
     """
@@ -53,6 +83,8 @@ def driver_init(window_size:tuple=(), headless=False) -> WebDriver:
     chrome_options.add_argument('--disable-notifications')
     chrome_options.add_argument("--disable-infobars")
     chrome_options.add_argument("--disable-extensions")
+    if user_data_dir:
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(user_data_dir)}")
     if headless:
         chrome_options.add_argument('headless')
     else:
@@ -63,7 +95,16 @@ def driver_init(window_size:tuple=(), headless=False) -> WebDriver:
     user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
     chrome_options.add_argument(f"user-agent={user_agent}")
 
+    if debugger_address:
+        # chromedriver refuses launch-only options (excludeSwitches, ...) when attaching
+        chrome_options = Options()
+        chrome_options.add_experimental_option("debuggerAddress", debugger_address)
+    if capture_network or (resource_policy is not None and resource_policy.active):
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
     driver = webdriver.Chrome(options=chrome_options)
+    if debugger_address:
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
     if headless:
         driver.set_window_size(1440, 797)
 
@@ -81,17 +122,22 @@ def driver_init(window_size:tuple=(), headless=False) -> WebDriver:
         """
     })
 
+    if resource_policy is not None:
+        resource_policy.apply(driver)
+
     return driver
 
 
 def login(driver: WebDriver, group_link: str, use_cookies: bool = False):
+    from dotenv import load_dotenv
+
     driver.get("https://facebook.com")
     load_dotenv()
     email = os.getenv("EMAIL")
     password = os.getenv("PASSWORD")
 
-    # Use variable wait times for different elements
-    driver.implicitly_wait(random.uniform(2, 4))
+    # No implicit wait: a failed find_element would block for the whole wait, elements are waited for explicitly
+    driver.implicitly_wait(0)
 
 
     if use_cookies and group_link:
@@ -104,11 +150,9 @@ def login(driver: WebDriver, group_link: str, use_cookies: bool = False):
 
         driver.refresh()
     else:
-        # Find login elements
-        email_input = driver.find_element(by=By.ID, value="email")
-        time.sleep(1.2)
+        # Find login elements, once the login form has rendered
+        email_input = waits.until(driver, "login_form", lambda d: d.find_element(by=By.ID, value="email"), timeout=10)
         password_input = driver.find_element(by=By.NAME, value="pass")
-        time.sleep(1.1)
         submit_button = driver.find_element(by=By.NAME, value="login")
 
         # Type like a human with varied speed
@@ -122,8 +166,32 @@ def login(driver: WebDriver, group_link: str, use_cookies: bool = False):
         time.sleep(1)
         human_type(password_input, password)
         time.sleep(random.uniform(1, 2))
+        login_url = driver.current_url
         submit_button.click()
-        time.sleep(random.uniform(1, 2))
+        # wait for the login to navigate away instead of sleeping
+        waits.pause(driver, "login_submitted", url_changed(login_url), timeout=10)
+
+
+def session_valid(driver: WebDriver, group_link: str) -> bool:
+    """
+    Checks whether an attached browser is still logged in, without the cookie login: the c_user cookie is set and the
+    group does not redirect to a login or checkpoint page.  Only opens the group if the tab is not on Facebook already.
+
+    Returns:
+        True if the session can be used as it is (the driver is then on a Facebook page).
+    """
+    try:
+        if "facebook.com" not in driver.current_url:
+            driver.get(group_link)
+        if not any(cookie.get("name") == "c_user" and cookie.get("value") for cookie in driver.get_cookies()):
+            return False
+        url = driver.current_url
+        if "/login" in url or "/checkpoint" in url:
+            return False
+        return not driver.find_elements(By.CSS_SELECTOR, 'form[action*="login"] input[name="pass"]')
+    except WebDriverException as e:
+        print(f"{Fore.RED}Could not check the browser session: {e}{Style.RESET_ALL}")
+        return False
 
 
 def check_facebook_captcha_links(html_content: str) -> Tuple[bool, Optional[str], Optional[str]]:
@@ -141,11 +209,16 @@ def check_facebook_captcha_links(html_content: str) -> Tuple[bool, Optional[str]
     """
     if not html_content:
         return False, None, None
+    # pages without a CAPTCHA link are not parsed at all (and BeautifulSoup is never imported)
+    if "/captcha/tfb" not in html_content.lower():
+        return False, None, None
 
     image_link = None
     audio_link = None
 
     try:
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html_content, 'html.parser')
 
         # 1. Check for the CAPTCHA image source pattern
@@ -172,6 +245,12 @@ def check_facebook_captcha_links(html_content: str) -> Tuple[bool, Optional[str]
 
 
 def solve_captch(audio_link) -> str:
+    import requests
+    from bs4 import BeautifulSoup
+    from dotenv import load_dotenv
+    from google import genai
+    from google.genai import types
+
     # get GEMINI_API and GEMINI_MODEL from .env
     load_dotenv()
     api_key = os.getenv("GEMINI_API")
@@ -260,15 +339,8 @@ def scroll_and_wait_for_new_posts(driver: WebDriver, known_post_count: int, time
         True if the number of posts increased within the timeout period,
         False if the timeout was reached without detecting new posts.
     """
-    if not post_class:
-        print(f"{Fore.RED}Error: post_class constant is empty. Cannot wait for posts.{Style.RESET_ALL}")
-        return False # Cannot proceed without a valid selector
-
-    # Construct the CSS selector: ".class1.class2" if post_class is "class1 class2"
-    post_class_selector = "." + ".".join(post_class.split())
-    if post_class_selector == ".": # Avoid overly broad selector if split results in an empty list
-         print(f"{Fore.RED}Error: post_class resulted in an invalid selector '{post_class_selector}'.{Style.RESET_ALL}")
-         return False
+    # ".class1.class2" for post_class "class1 class2", validated and compiled once by the selector registry
+    post_class_selector = registry.css("post_class")
 
     try:
         wait = WebDriverWait(driver, timeout)
@@ -299,32 +371,9 @@ def get_rendered_posts(driver: WebDriver) -> list[WebElement]:
     try:
         feed_element = driver.find_element(By.CSS_SELECTOR, 'div[role="feed"]')
 
-        # --- Dynamically build the XPath selector ---
-
-        # 1. Split the post_class string from constants.py into individual classes
-        individual_classes = post_class.split()  # Handles space separation
-
-        if not individual_classes:
-            raise ValueError("Error: post_class constant seems to be empty or invalid.")
-        else:
-            # 2. Create the "contains(...)" condition string for each class
-            #    We use f-strings for easy insertion of the class name 'cls'.
-            #    Note the crucial spaces inside the single quotes: '{cls}'
-            conditions = [f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')" for cls in
-                          individual_classes]
-
-            # 3. Join these conditions with "and"
-            joined_conditions = " and ".join(conditions)
-
-            # 4. Construct the final relative XPath selector
-            #    Selects direct children (*) of the current node (.)
-            #    that satisfy all the joined conditions [...]
-            dynamic_xpath_selector = f"./*[{joined_conditions}]"
-
-            # --- End of dynamic XPath building ---
-
+        # the direct children of the feed that have every class of post_class (compiled once by the registry)
         try:
-            post_elements = feed_element.find_elements(By.XPATH, dynamic_xpath_selector)
+            post_elements = feed_element.find_elements(By.XPATH, registry.class_xpath("post_class"))
             return post_elements
         except NoSuchElementException as e:
             raise NoSuchElementException(f"Unable to locate posts: {e}")
@@ -355,23 +404,15 @@ def open_post(post: WebElement, driver: WebDriver, actions: ActionChains, wait_t
         # find the entire info section of a post's author
 
         try:
-            driver.implicitly_wait(2)
-            post_date_element = post.find_element(By.XPATH, date_enclosing_span_obj["xpath"])
-
-        except TimeoutException as e:
-            print(f"{Fore.RED}TimeoutException occurred during open_post:\n{e}{Style.RESET_ALL}")
+            # poll the date link's whole locator chain (relative XPath, then the class selectors) instead of
+            # waiting for one selector to time out before trying the next
+            # relative to the post: processed posts above it stay in the DOM until the end of their batch
+            post_date_element = locators.until(driver, post, "post_date_link", timeout=2)
+
+        except (TimeoutException, StaleElementReferenceException) as e:
+            print(f"{Fore.RED}Exception occurred during open_post, no date link found:\n{e}{Style.RESET_ALL}")
+            metrics.popup_open_failures.labels(reason="no_date_link").inc()
             return None
-        except NoSuchElementException as e:
-            print(f"{Fore.RED}NoSuchElementException occurred during open_post:\n{e}{Style.RESET_ALL}")
-            try:
-                css_selector_info_section = "." + ".".join(poster_info_class.split())
-                css_selector_date = "." + ".".join(date_enclosing_span.split())
-
-                info_section = post.find_element(By.CSS_SELECTOR, css_selector_info_section) # find the whole info section
-                post_date_element = info_section.find_element(By.CSS_SELECTOR, css_selector_date) # find the date element to click on
-            except Exception as e:
-                print(f"{Fore.RED}Exception occurred during open_post (attempt two):\n{e}{Style.RESET_ALL}")
-                return None
         except Exception as e:
             print(f"{Fore.RED}Exception occurred during open_post:\n{e}{Style.RESET_ALL}")
             return None
@@ -409,63 +450,20 @@ def open_post(post: WebElement, driver: WebDriver, actions: ActionChains, wait_t
         # --- If a click was attempted/successful, wait for the popup ---
         if clicked_element_successfully:
 
-            def find_popup_window(d: WebDriver) -> Optional[WebElement]:
-
-                try:
-                    dialog_window = d.find_element(By.XPATH, pop_up_whole_window_class_obj["xpath"])
-                    return dialog_window
-                except NoSuchElementException as e:
-                    print(f"{Fore.RED}An error occurred in 'find_popup_window'\n{e}{Style.RESET_ALL}")
-                except Exception as e2:
-                    print(f"{Fore.RED}An error occurred in 'find_popup_window'\n{e2}{Style.RESET_ALL}")
-                    print("Resorting to alternative locating approach")
-
-
-                # --- Dynamically build the CSS selector ---
-
-                # 1. Get the class string from the constant
-                class_string = pop_up_whole_window_class
-
-                # 2. Split the class string into individual classes
-                individual_classes = class_string.split()
-
-                if not individual_classes:
-                    print(
-                        f"{Fore.RED}Error: pop_up_whole_window_class constant seems to be empty or invalid.{Style.RESET_ALL}")
-                    # Handle the error appropriately, maybe skip finding the element
-                    return None
-                else:
-                    # 3. Create the chained class selector part by prepending '.' to each class
-                    #    and joining them without spaces.
-                    chained_classes = "".join([f".{cls}" for cls in individual_classes])
-
-                    # 4. Combine the tag, attribute selector, and the chained classes
-                    #    Using single quotes for the role value makes defining the f-string easier.
-                    dynamic_css_selector = f"div[role='dialog']{chained_classes}"
-
-                    # --- End of dynamic CSS building ---
-
-                try:
-                    dialog_window = d.find_element(By.CSS_SELECTOR, dynamic_css_selector)
-                    if dialog_window:
-                        return dialog_window
-                    else:
-                        return None
-                except NoSuchElementException:
-                    return None
-                except Exception as e2:
-                    print(f"{Fore.RED}An error occurred in 'find_popup_window'\n{e2}{Style.RESET_ALL}")
-                    return None
-
             try:
-                # wait.until will call find_popup_window repeatedly until it returns
-                # a WebElement or the timeout (wait_time) occurs.
-                pop_up_window = wait.until(find_popup_window)
+                # polls the dialog's locator chain (with backoff) until a strategy matches or wait_time passes
+                pop_up_window = locators.until(driver, driver, "popup_window", timeout=wait_time, name="dialog_present")
+
+                # the dialog is attached before its content has rendered
+                waits.pause(driver, "dialog_content",
+                            lambda d: locators.locate(pop_up_window, "popup_username")
+                            or locators.locate(pop_up_window, "popup_post_text"), timeout=5)
                 return pop_up_window
             except TimeoutException:
+                metrics.popup_open_failures.labels(reason="timeout").inc()
                 try:
                     driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-                    time.sleep(0.5)
+                    waits.pause(driver, "dialog_gone", dialog_gone, timeout=2)
                 except Exception:
                     pass # Ignore errors sending escape
                 return None
@@ -475,6 +473,7 @@ def open_post(post: WebElement, driver: WebDriver, actions: ActionChains, wait_t
         else:
             # Neither date nor comments button could be clicked successfully
             print(f"{Fore.RED}Failed to click any interactable element to open post details.{Style.RESET_ALL}")
+            metrics.popup_open_failures.labels(reason="click").inc()
             return None
 
     except Exception as e:
@@ -593,6 +592,53 @@ def find_element_bs4(driver: WebDriver, element: WebElement, exact_class_strings
         return None
 
 
+def scrape_post_date(popup_window: WebElement, driver: WebDriver, actions: ActionChains) -> str:
+    """
+    Resolves the date of the popup's post (see date_engine.py): the date link's attributes and label are read in one
+    call, and only when they do not give a date precise to the minute (or date_resolution is "hover") the date is
+    hovered and the rendered tooltip read.
+
+    Returns:
+        The date string in the tooltip format, or "" when it could not be resolved.
+    """
+    date = ""
+    try:
+        date_hover_section = locators.find(popup_window, "popup_date")
+        if dates.resolution != "hover":
+            resolved = read_date_link(date_hover_section, driver)
+            if resolved is not None and (resolved.precise or dates.resolution == "label"):
+                return resolved.tooltip
+
+        actions.move_to_element(date_hover_section).perform()
+        # wait until the date tooltip has rendered, one call per poll
+        date = waits.until(driver, "date_tooltip", lambda d: d.execute_script(js_read_date_tooltip, js_date_class),
+                           timeout=3)
+
+    except TimeoutException as e:
+        print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
+    except NoSuchElementException as e:
+        print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
+    except Exception as e:
+        print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
+
+    return date
+
+
+def read_date_link(date_section: WebElement, driver: WebDriver) -> Optional[ResolvedDate]:
+    """
+    Resolves a date link (or the element around it) from its attributes, href and label, without hovering.
+
+    Returns:
+        The resolved date, or None if neither gives a date.
+    """
+    try:
+        link = driver.execute_script(js_read_date_link, date_section)
+    except (JavascriptException, WebDriverException) as e:
+        print(f"{Fore.YELLOW}Could not read the date link: {e}{Style.RESET_ALL}")
+        return None
+    return dates.resolve(link["label"], link["href"], link["hints"])
+
+
 def scrape_for_post_info(popup_window: WebElement, driver: WebDriver, actions: ActionChains) -> tuple[str, str, str]:
     """
 
@@ -610,52 +656,19 @@ def scrape_for_post_info(popup_window: WebElement, driver: WebDriver, actions: A
     try:
         # Get username information, if it gets AttributeError it falls back on another place
         try:
-            username = popup_window.find_element(By.XPATH, username_popup_obj['xpath']).text.replace("'s post", "")
+            username = locators.find(popup_window, "popup_username").text.replace("'s post", "")
         except Exception as e:
             username=""
             print(f"{Fore.RED}Error scraping Username {e}{Style.RESET_ALL}")
 
         # Get post text information
         try:
-            post_text = popup_window.find_element(By.XPATH, post_text_obj["xpath"]).text
+            post_text = locators.find(popup_window, "popup_post_text").text
         except Exception as e:
             post_text = ""
             print(f"{Fore.RED}An Error occurred while scraping text information: {e}{Style.RESET_ALL}")
 
-        date=""
-        try: # Get date information
-            date_hover_section = popup_window.find_element(By.XPATH, date_popup_obj['xpath'])
-            actions.move_to_element(date_hover_section).perform()
-            # wait until the date_hover element is ready
-
-            wait = WebDriverWait(driver, 3)
-
-            def get_date(d: WebDriver) -> str:
-                try:
-                    found_date = ""
-
-                    date_list = d.execute_script(
-                        f"return document.getElementsByClassName(\"{js_date_class}\");")  # find the readable date
-                    if date_list:
-                        # First, try to find an element containing the Unicode character
-                        for i, item in enumerate(date_list):
-                            if hasattr(item, 'text') and item.text and '\u202f' in item.text:
-                                found_date = str(item.text)
-                                break
-
-                    return found_date
-                except Exception as e2:
-                    print(f"{Fore.RED}Error during get_date():\n{e2}{Style.RESET_ALL}")
-                    return ""
-
-            date = wait.until(get_date)
-
-        except TimeoutException as e:
-            print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
-        except NoSuchElementException as e:
-            print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
-        except Exception as e:
-            print(f"{Fore.RED}Error while getting date:\n{e}{Style.RESET_ALL}")
+        date = scrape_post_date(popup_window, driver, actions)
 
         return username, post_text, date
 
@@ -667,18 +680,189 @@ def scrape_for_post_info(popup_window: WebElement, driver: WebDriver, actions: A
         return "", "", ""
 
 
-def pop_up_scrape(popup_window: WebElement, driver: WebDriver, actions: ActionChains) -> dict:
+def extract_popup_js(popup_window: WebElement, driver: WebDriver) -> Optional[dict]:
     """
-    This function scrapes the username, date, and post-text content of any given post.  Next it scrolls to the bottom
-    of the comment section. Finally, it scrapes the comments, then it returns a dict.
+    Extracts the username, post-text and every comment of an opened popup with a single execute_script call,
+    using the same XPaths as the per-field Selenium extraction.
+
+    Args:
+        popup_window: The popup WebElement returned by open_post.
+        driver: The WebDriver instance.
+
+    Returns:
+        {"username": str, "post_text": str, "comments": [{"username": str, "comment_text": str, "parent": int}, ...]},
+        or None if the script failed (the caller should fall back to per-field extraction).
+    """
+    js_extract_popup = js_parent_of + """
+    const popup = arguments[0];
+    const xpaths = arguments[1];
+
+    function first(xpath, context) {
+        return document.evaluate(xpath, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    function all(xpath, context) {
+        const snapshot = document.evaluate(xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const nodes = [];
+        for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+        return nodes;
+    }
+    function text(node) {
+        return node ? (node.innerText || "").trim() : null;
+    }
+
+    const result = {
+        username: text(first(xpaths.username, popup)),
+        post_text: text(first(xpaths.post_text, popup)),
+        comments: null
+    };
+
+    const container = first(xpaths.comment_container, popup);
+    if (container) {
+        const comments = all(xpaths.comment, container);
+        const index = new Map(comments.map((comment, position) => [comment, position]));
+        result.comments = comments.map(comment => ({
+            username: text(first(xpaths.comment_name, comment)) || "",
+            comment_text: text(first(xpaths.comment_text, comment)) || "",
+            parent: parentOf(comment, container, index)
+        }));
+    }
+    return JSON.stringify(result);
+    """
+
+    xpaths = {
+        "username": registry.xpath("username_popup_obj"),
+        "post_text": registry.xpath("post_text_obj"),
+        "comment_container": registry.xpath("comment_pop_up_class_obj"),
+        "comment": registry.xpath("individual_comment_class_obj"),
+        "comment_name": registry.xpath("individual_comment_name_obj"),
+        "comment_text": registry.xpath("individual_comment_text_obj"),
+    }
+
+    try:
+        payload = json.loads(driver.execute_script(js_extract_popup, popup_window, xpaths))
+    except (JavascriptException, WebDriverException, ValueError, TypeError) as e:
+        print(f"{Fore.RED}Batched popup extraction failed:\n{e}{Style.RESET_ALL}")
+        return None
+
+    registry.record("username_popup_obj", payload["username"] is not None)
+    registry.record("post_text_obj", payload["post_text"] is not None)
+    registry.record("comment_pop_up_class_obj", payload["comments"] is not None)
+    if payload["username"] is None:
+        print(f"{Fore.RED}Error scraping Username: no element matched {registry.xpath('username_popup_obj')}{Style.RESET_ALL}")
+    if payload["post_text"] is None:
+        print(f"{Fore.RED}An Error occurred while scraping text information: no element matched{Style.RESET_ALL}")
+
+    return {
+        "username": (payload["username"] or "").replace("'s post", ""),
+        "post_text": payload["post_text"] or "",
+        "comments": payload["comments"] or [],
+    }
+
+
+def keep_snapshot(popup_window: WebElement, driver: WebDriver, snapshot_dir: str, post_info: dict,
+                  feed_html: str = "") -> None:
+    """
+    Stores the popup's HTML next to the post-dict extracted from it (used for offline parity checks), and the post's
+    feed card if given (used as a replay fixture).
+    """
+    from offline_parser import save_snapshot, snapshot_popup
+
+    try:
+        save_snapshot(snapshot_dir, snapshot_popup(popup_window, driver), post_info, feed_html=feed_html)
+    except Exception as e:
+        print(f"{Fore.RED}Could not store the popup snapshot:\n{e}{Style.RESET_ALL}")
+
+
+def pop_up_scrape_js(popup_window: WebElement, driver: WebDriver, actions: ActionChains,
+                     snapshot_dir: str = "", feed_html: str = "", max_comments: int = 0,
+                     comment_timeout: float = 30.0) -> Optional[dict]:
+    """
+    Batched version of pop_up_scrape: the date is read with the hover tooltip, the comments are loaded, and then
+    everything else is extracted with one execute_script call (see extract_popup_js).
+
+    Returns:
+        The same dict as pop_up_scrape, or None if the batched extraction failed.
+    """
+    date = scrape_post_date(popup_window, driver, actions)
+    expand_comments(popup_window, driver, max_comments=max_comments, timeout=comment_timeout)
+
+    extracted = extract_popup_js(popup_window, driver)
+    if extracted is None:
+        return None
+
+    post_info = {"username": extracted["username"], "post_text": extracted["post_text"], "date": date,
+                 "comments": extracted["comments"]}
+    if snapshot_dir:
+        keep_snapshot(popup_window, driver, snapshot_dir, post_info, feed_html=feed_html)
+
+    actions.send_keys(Keys.ESCAPE).perform()
+    return post_info
+
+
+def pop_up_scrape_offline(popup_window: WebElement, driver: WebDriver, actions: ActionChains,
+                          snapshot_dir: str = "", feed_html: str = "", max_comments: int = 0,
+                          comment_timeout: float = 30.0) -> Optional[dict]:
+    """
+    Offline version of pop_up_scrape: the date is read with the hover tooltip, the comments are loaded, and then the
+    dialog's outerHTML is fetched in one call and parsed locally with lxml (see offline_parser.py).
+
+    Returns:
+        The same dict as pop_up_scrape, or None if the snapshot could not be taken or parsed.
+    """
+    from offline_parser import parse_popup_html, save_snapshot, snapshot_popup
+
+    date = scrape_post_date(popup_window, driver, actions)
+    expand_comments(popup_window, driver, max_comments=max_comments, timeout=comment_timeout)
+
+    try:
+        snapshot = snapshot_popup(popup_window, driver)
+        post_info = parse_popup_html(snapshot, date=date)
+    except Exception as e:
+        print(f"{Fore.RED}Offline popup extraction failed:\n{e}{Style.RESET_ALL}")
+        return None
+
+    if snapshot_dir:
+        save_snapshot(snapshot_dir, snapshot, post_info, feed_html=feed_html)
+
+    actions.send_keys(Keys.ESCAPE).perform()
+    return post_info
+
+
+def pop_up_scrape(popup_window: WebElement, driver: WebDriver, actions: ActionChains,
+                  extraction_mode: str = "selenium", snapshot_dir: str = "", feed_html: str = "",
+                  max_comments: int = 0, comment_timeout: float = 30.0) -> dict:
+    """
+    This function scrapes the username, date, and post-text content of any given post.  Next it loads the comment
+    section, expanding every reply thread. Finally, it scrapes the comments, then it returns a dict.
     Args:
         popup_window:
         driver:
         actions:
+        extraction_mode: "selenium" reads every field with its own WebDriver call, "js" extracts the whole popup
+                         with one execute_script call, "offline" parses a single HTML snapshot of the popup with
+                         lxml.  Both batched modes fall back to "selenium" if they fail.
+        snapshot_dir: If set, the popup's HTML is stored there together with the extracted dict.
+        feed_html: The outerHTML of the post's feed card, stored with the snapshot (capture mode, see replay_server.py).
+        max_comments: Stop loading comments and replies once this many are loaded (0 = no limit).
+        comment_timeout: Maximum seconds spent loading the comments of the post (see comment_threads.py).
 
     Returns:
 
     """
+    if extraction_mode == "js":
+        post_info = pop_up_scrape_js(popup_window, driver, actions, snapshot_dir=snapshot_dir, feed_html=feed_html,
+                                     max_comments=max_comments, comment_timeout=comment_timeout)
+        if post_info is not None:
+            return post_info
+        print(f"{Fore.YELLOW}Falling back to per-field extraction.{Style.RESET_ALL}")
+    elif extraction_mode == "offline":
+        post_info = pop_up_scrape_offline(popup_window, driver, actions, snapshot_dir=snapshot_dir,
+                                          feed_html=feed_html, max_comments=max_comments,
+                                          comment_timeout=comment_timeout)
+        if post_info is not None:
+            return post_info
+        print(f"{Fore.YELLOW}Falling back to per-field extraction.{Style.RESET_ALL}")
+
     username, post_text, date = "", "", ""
     comment_list = []
     try:
@@ -690,53 +874,18 @@ def pop_up_scrape(popup_window: WebElement, driver: WebDriver, actions: ActionCh
 
         # --------------------- SCRAPE FOR COMMENTS -------------------------------------------------------------
 
-        comment_container = popup_window.find_element(By.XPATH, comment_pop_up_class_obj["xpath"]) # find the comment container in the popup dialog
+        comment_container = locators.find(popup_window, "comment_container") # find the comment container in the popup dialog
 
-        try:
-            bottom_loader = popup_window.find_element(By.XPATH, comment_loader_class_obj["xpath"])
-        except NoSuchElementException:
-            bottom_loader = None
-
-        if bottom_loader:
-            def check_loading() -> bool:
-                try:
-                    if bottom_loader.size['height'] != 0 and bottom_loader.size['width'] != 0:
-                        try:
-                            children = bottom_loader.find_elements(By.CSS_SELECTOR, "div")
-                            if children:
-                                return True
-                            else:
-                                return False
-                        except NoSuchElementException as e2:
-                            print(f"{Fore.RED}NoSuchElementException in pop_up_scrape:\n{e2}{Style.RESET_ALL}")
-                            return False
-                        except StaleElementReferenceException:
-                            return False
-                        except Exception as e2:
-                            print(f"{Fore.RED}Error in pop_up_scrape:\n{e2}{Style.RESET_ALL}")
-                            return False
-                    else:
-                        return False
-                except StaleElementReferenceException:
-                    return False
-                except Exception as e2:
-                    print(f"{Fore.RED}Error in pop_up_scrape (check loading outer):\n{e2}{Style.RESET_ALL}")
-
-            while check_loading(): # keep forcing the bottom of the comment section until all comments have been loaded
-                try:
-                    actions.scroll_to_element(bottom_loader).perform()
-                except StaleElementReferenceException:
-                    break
-                except Exception as e:
-                    print(f"{Fore.RED}Error in pop_up_scrape (check loading):\n{e}{Style.RESET_ALL}")
+        expand_comments(popup_window, driver, max_comments=max_comments, timeout=comment_timeout)
 
         # Find all individual comment elements using the predefined class
-        comments = comment_container.find_elements(By.XPATH, individual_comment_class_obj["xpath"])
+        comments = locators.find_all(comment_container, "comment")
         if comments:
-            for comment in comments:
+            parents = comment_parents(driver, comment_container, comments)
+            for comment, parent in zip(comments, parents):
                 try:
                     # Extract the commenter's username
-                    poster = comment.find_element(By.XPATH, individual_comment_name_obj["xpath"]).text
+                    poster = locators.find(comment, "comment_name").text
                 except AttributeError:
                     poster = ""
                 except Exception as e:
@@ -744,17 +893,21 @@ def pop_up_scrape(popup_window: WebElement, driver: WebDriver, actions: ActionCh
                     poster = ""
                 try:
                     # Extract the comment's text content
-                    text = comment.find_element(By.XPATH, individual_comment_text_obj["xpath"]).text
+                    text = locators.find(comment, "comment_text").text
                 except AttributeError:
                     text = ""
                 except Exception as e:
                     print(e)
                     text = ""
                 # Store the comment data in our list
-                comment_list.append({"username": poster, "comment_text": text})
+                comment_list.append({"username": poster, "comment_text": text, "parent": parent})
         else:
             comment_list = []
 
+        if snapshot_dir:
+            keep_snapshot(popup_window, driver, snapshot_dir,
+                          {"username": username, "post_text": post_text, "date": date, "comments": comment_list},
+                          feed_html=feed_html)
         actions.send_keys(Keys.ESCAPE).perform()
         return {"username": username, "post_text": post_text, "date": date, "comments": comment_list}
 
@@ -765,21 +918,283 @@ def pop_up_scrape(popup_window: WebElement, driver: WebDriver, actions: ActionCh
         return {"username": username, "post_text": post_text, "date": date, "comments": comment_list}
 
 
-def store_post_data(file_path:str, post_data: dict) -> None:
+def wait_for_popup_close(pop_up_window: WebElement, wait: WebDriverWait, debug: bool = False) -> None:
+    """
+    Waits until a popup that was sent ESCAPE is no longer attached to the DOM (stale).
+    """
     try:
-        # Load existing data if the file exists
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = []
+        if debug: print("Waiting for popup to become stale (max 10s)...")
+        wait.until(EC.staleness_of(pop_up_window))
+        if debug: print(f"{Fore.GREEN}Popup element is stale (closed/removed).{Style.RESET_ALL}")
+    except TimeoutException:
+        # The popup didn't become stale within the wait time after sending ESCAPE
+        print(
+            f"{Fore.YELLOW}Popup element did not become stale after sending ESCAPE.{Style.RESET_ALL}")
+        metrics.popup_close_timeouts.inc()
+        # You might want additional fallback logic here if the popup is stuck
+    except StaleElementReferenceException:
+        # This is actually GOOD - means the element was already gone before the wait even checked properly.
+        print(f"{Fore.GREEN}Popup element was already stale before explicit wait.{Style.RESET_ALL}")
+    except Exception as e:
+        # Catch other potential errors during the close wait
+        print(f"{Fore.RED}Error occurred during popup close/wait: {e}{Style.RESET_ALL}")
+
+
+def needs_popup(card: dict, comment_threshold: int = 0) -> bool:
+    """
+    Whether a post has to be opened (fast mode): its feed card has no author or text, its text is truncated behind
+    "See more", or it has more than comment_threshold comments.
+    """
+    if not card.get("username") or not card.get("post_text"):
+        return True
+    return bool(card.get("truncated")) or card.get("comment_count", 0) > comment_threshold
+
+
+def feed_card_post(card: dict) -> dict:
+    """
+    The post-dict of a post read from its feed card only (fast mode), the comments are not loaded, only counted.
+
+    'date' is only set when the card carries the exact time (a timestamp attribute or href).  A date resolved from the
+    card's label (e.g. "3h", see date_engine.py) is an estimate that changes from run to run: it is kept apart, as
+    date_iso/timestamp with its date_precision, next to the raw date_label.
+    """
+    resolved = dates.resolve(card.get("date_label", ""), card.get("permalink", ""), card.get("date_hints", []))
+    exact = resolved is not None and resolved.source != "label"
+    return {"username": card["username"], "post_text": card["post_text"],
+            "date": resolved.tooltip if exact else "", "date_label": card.get("date_label", ""),
+            "date_iso": resolved.iso if resolved else "", "timestamp": resolved.epoch if resolved else None,
+            "date_precision": resolved.precision if resolved else "",
+            "comments": [], "comment_count": card.get("comment_count", 0), "permalink": card.get("permalink", "")}
+
+
+def card_key(card: dict) -> str:
+    """
+    The checkpoint/dedup key of a feed card (see fingerprint.card_fingerprint): the post id of its permalink, or its
+    author and text when the card links no post id.
+    """
+    return card_fingerprint(card["username"], card["post_text"], post_id_from_url(card.get("permalink", "")))
+
+
+def scrape_feed(driver: WebDriver, actions: ActionChains, on_post: Callable[[dict], None],
+                extraction_mode: str = "selenium", snapshot_dir: str = "", debug: bool = False,
+                should_stop: Optional[Callable[[], bool]] = None, stats: Optional[StageStats] = None,
+                use_observer: bool = True, checkpoint: Optional[Checkpoint] = None,
+                dedup: Optional[DedupIndex] = None, governor: Optional[MemoryGovernor] = None,
+                max_comments: int = 0, comment_timeout: float = 30.0, fast_mode: bool = False,
+                fast_comment_threshold: int = 0, resource_policy: Optional[ResourcePolicy] = None) -> int:
+    """
+    The main scraping loop: opens, scrapes, closes and removes every rendered post, then scrolls for more, until no
+    new posts load.
+
+    Closing is pipelined: after ESCAPE is sent the loop moves on, and the wait for the popup to go stale happens right
+    before the next popup is opened (by then it usually already has).
+
+    The feed is handled in batches: one call returns the new posts with their feed-card metadata (used for the
+    checkpoint/dedup fingerprints and capture), and one call removes every processed post at the end of the batch.  Storage should be
+    handed off as well, by passing StoragePipeline.submit as on_post.
+
+    New posts are detected by a MutationObserver on the feed (see feed_observer.py); if it cannot be installed the
+    loop falls back to scroll_and_wait_for_new_posts and read_rendered_posts.
 
-        # Append new post-data
-        existing_data.append(post_data)
+    Args:
+        driver: The WebDriver instance, already logged in and on the group page.
+        actions: The ActionChains instance.
+        on_post: Called with every scraped post-dict (e.g. StoragePipeline.submit, a sink's write method or a
+                 queue's put method).
+        extraction_mode: Passed on to pop_up_scrape.
+        snapshot_dir: Passed on to pop_up_scrape, every post's feed card is captured there as well, so the directory
+                      can be replayed with replay_server.py.
+        debug: Print additional information.
+        should_stop: Optional callable checked after every post, the loop ends when it returns True.
+        stats: Optional StageStats that receives the latency of every stage (scroll, find_posts, open, extract, close,
+               remove).
+        use_observer: Detect new posts with the in-page MutationObserver.
+        checkpoint: Optional Checkpoint: known posts are skipped without opening them, chronological crawls stop at
+                    the previous crawl's high-water mark, and progress is saved as the loop goes.
+        dedup: Optional DedupIndex: posts whose feed card fingerprint was seen before are skipped without opening
+               them, and every scraped post's feed card fingerprint is added to it.
+        governor: Optional MemoryGovernor, checked between batches: it prunes the page and recycles the tab when the
+                  page grows too large (the checkpoint/dedup index then skips what was already scraped).
+        max_comments: Passed on to pop_up_scrape, caps the comments and replies loaded per post.
+        comment_timeout: Passed on to pop_up_scrape, caps the seconds spent loading the comments of a post.
+        fast_mode: Read posts from their feed card and only open the ones that need it (see needs_popup).  In
+                   every mode a post gets its card's permalink, whose post id is its storage key.
+        fast_comment_threshold: In fast mode, posts with at most this many comments are not opened (their comments
+                                are counted but not scraped).
+        resource_policy: Optional ResourcePolicy, its statistics are collected between batches (and its patterns
+                         applied to a recycled tab).
+
+    Returns:
+        The number of posts scraped.
+    """
+    stats = stats if stats is not None else StageStats()
+
+    observing = False
+    if use_observer:
+        waits.pause(driver, "feed_present", lambda d: d.find_elements(By.CSS_SELECTOR, 'div[role="feed"]'), timeout=10)
+        observing = install_feed_observer(driver, registry["post_class"].classes)
+        if not observing:
+            print(f"{Fore.YELLOW}Feed observer unavailable, falling back to scroll-and-count.{Style.RESET_ALL}")
+
+    # Check for new content and scroll to the page-bottom
+    with stats.time("scroll"):
+        loaded = wait_for_new_posts(driver) if observing else scroll_and_wait_for_new_posts(driver, 0)
+
+    # set num_posts
+    num_posts = 0
+    wait = WebDriverWait(driver, 10)  # Default wait time (seconds) for conditions
+    closing_popup: Optional[WebElement] = None  # the popup that was sent ESCAPE but not confirmed closed yet
+
+    # Main scraping loop: continue scrolling and scraping until no new posts load
+    while loaded:
+        # Allow time for new posts to render, but only as long as they actually need
+        with stats.time("render_wait"):
+            waits.pause(driver, "feed_rendered", feed_posts_rendered, timeout=2)
+
+        if metrics.enabled:  # a growing page is the usual cause of a slowing run
+            try:
+                metrics.dom_nodes.set(driver.execute_script("return document.getElementsByTagName('*').length;"))
+            except WebDriverException:
+                pass
+
+        # Get the new posts and their feed-card metadata in one call
+        with stats.time("find_posts"):
+            cards = drain_new_posts(driver, with_html=bool(snapshot_dir)) if observing else None
+            if cards is None:
+                cards = read_rendered_posts(driver, registry["post_class"].classes, with_html=bool(snapshot_dir))
+
+        # every post of the batch is removed in one call once the batch is done
+        processed: list[WebElement] = []
+
+        if debug: print(f"{Fore.BLUE}Processing posts len: {len(cards)}{Style.RESET_ALL}")
+        for card in cards:
+            rendered_post = card["element"]
+            processed.append(rendered_post)
+
+            card_id = ""
+            if (checkpoint is not None or dedup is not None) and (card["username"] or card["post_text"]):
+                card_id = card_key(card)
+
+            if card_id:
+                if checkpoint is not None and checkpoint.reached_high_water_mark(card_id, card.get("pinned", False)):
+                    print(f"{Fore.GREEN}Reached the previous crawl's newest posts, stopping.{Style.RESET_ALL}")
+                    checkpoint.passed(card_id)
+                    checkpoint.finish()
+                    return num_posts
+
+                known = checkpoint is not None and checkpoint.is_known(card_id)
+                duplicate = not known and dedup is not None and dedup.seen(card_id)
+                if known or duplicate:
+                    # skip it before paying for open_post
+                    if debug: print(f"{Fore.YELLOW}Skipping {'known' if known else 'duplicate'} post "
+                                    f"{card_id}{Style.RESET_ALL}")
+                    if checkpoint is not None: checkpoint.passed(card_id, card.get("pinned", False))
+                    continue
+
+            if fast_mode and not needs_popup(card, fast_comment_threshold):
+                with stats.time("feed_card"):
+                    post_info = feed_card_post(card)
+                    on_post(post_info)
+                num_posts += 1
+                metrics.posts_scraped.inc()
+                if checkpoint is not None and card_id:
+                    checkpoint.record(card_id, post_info["date"], card.get("pinned", False))
+                if dedup is not None and card_id:
+                    dedup.add(card_id)
+                print(f"{Fore.BLUE}{post_info}{Style.RESET_ALL}")
+                if should_stop is not None and should_stop():
+                    if checkpoint is not None: checkpoint.save()
+                    return num_posts
+                continue
+
+            # the previous popup has to be gone before the next one can be opened
+            if closing_popup is not None:
+                with stats.time("close"):
+                    wait_for_popup_close(closing_popup, wait, debug)
+                closing_popup = None
+
+            # click for the pop-up
+            with stats.time("open"):
+                pop_up_window = open_post(rendered_post, driver, actions)  # Use the specific element
+
+            if pop_up_window:
+                try:
+                    try: # scrape data from post
+                        with stats.time("extract"):
+                            post_info = pop_up_scrape(pop_up_window, driver, actions, extraction_mode=extraction_mode,
+                                                      snapshot_dir=snapshot_dir, feed_html=card["html"],
+                                                      max_comments=max_comments, comment_timeout=comment_timeout)
+                        post_info.update(dates.fields(post_info.get("date", "")))
+                        # the storage key is the permalink's post id (see fingerprint.post_key) in every mode
+                        post_info["permalink"] = card.get("permalink", "")
+                        on_post(post_info)
+                        num_posts += 1
+                        metrics.posts_scraped.inc()
+                        metrics.comments_scraped.inc(len(post_info.get("comments", [])))
+                        if checkpoint is not None and card_id:
+                            checkpoint.record(card_id, post_info.get("date", ""), card.get("pinned", False))
+                        if dedup is not None and card_id:
+                            dedup.add(card_id)
+                        print(f"{Fore.BLUE}{post_info}{Style.RESET_ALL}")
+                    except Exception as e:
+                        print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+                    if debug: print(
+                        f"Popup window element found: {pop_up_window.tag_name if pop_up_window else 'None'}. Attempting to close with ESCAPE.")
+                    # Send ESCAPE key - targeting body is often effective
+                    body_element = driver.find_element(By.TAG_NAME, 'body')
+                    body_element.send_keys(Keys.ESCAPE)
+                    if debug: print("Sent ESCAPE key.")
+                    closing_popup = pop_up_window
+
+                except StaleElementReferenceException:
+                    # This is actually GOOD - means the element was already gone before ESCAPE was even needed.
+                    print(f"{Fore.GREEN}Popup element was already stale before explicit wait.{Style.RESET_ALL}")
+                except NoSuchElementException:
+                    print(f"{Fore.RED}Could not find body element to send ESCAPE key.{Style.RESET_ALL}")
+                except Exception as e:
+                    # Catch other potential errors during the close attempt
+                    print(f"{Fore.RED}Error occurred during popup close/wait: {e}{Style.RESET_ALL}")
 
-        # Write back to the file
-        with open(file_path, "w") as f:
-            json.dump(existing_data, f, indent=4)
+            if should_stop is not None and should_stop():
+                if checkpoint is not None: checkpoint.save()
+                return num_posts
+
+        # the feed can only be scrolled once the last popup is closed
+        if closing_popup is not None:
+            with stats.time("close"):
+                wait_for_popup_close(closing_popup, wait, debug)
+            closing_popup = None
+
+        # for memory efficiency and cleanness, remove the whole processed batch at once
+        with stats.time("remove"):
+            remove_posts(driver, processed)
+
+        if governor is not None:
+            with stats.time("memory"):
+                recycled = governor.check(driver, num_posts)
+            if recycled and resource_policy is not None:
+                resource_policy.apply(driver)
+            if recycled and use_observer:
+                waits.pause(driver, "feed_present", lambda d: d.find_elements(By.CSS_SELECTOR, 'div[role="feed"]'),
+                            timeout=10)
+                observing = install_feed_observer(driver, registry["post_class"].classes)
+
+        if resource_policy is not None:
+            with stats.time("resources"):
+                resource_policy.collect(driver)
+
+        # Check if new content was loaded
+        with stats.time("scroll"):
+            loaded = wait_for_new_posts(driver) if observing else scroll_and_wait_for_new_posts(driver, 0)
+
+    if checkpoint is not None: checkpoint.finish()
+    return num_posts
+
+
+def store_post_data(file_path:str, post_data: dict) -> None:
+    try:
+        # Append the new post-data in place, the existing content is never re-read or re-written
+        append_to_json_array(file_path, post_data)
     except Exception as e:
         print(f"Error saving post data to JSON: {e}")
 
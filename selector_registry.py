@@ -0,0 +1,177 @@
+"""
+Selector Registry
+
+Every selector in constants.py, validated and compiled once at import instead of being rebuilt
+from the class strings on every call:
+- class strings (e.g. post_class) become a chained CSS selector (".x1yztbdb.x1n2onr6...") and a
+  class-matching XPath predicate
+- *_obj dicts keep their CSS selector and XPath, and the XPath is also compiled with lxml for
+  offline parsing (see offline_parser.py) the first time it is needed, so lxml is not imported by
+  runs that only use Selenium
+
+Selectors are looked up by their constant name, and every lookup made through the registry is
+counted as a hit or a miss, so the summary at the end of a run shows which selectors (and which
+fallbacks) are actually used:
+    python selector_registry.py            lists every compiled selector
+"""
+import re
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from selenium.common import NoSuchElementException
+
+if TYPE_CHECKING:
+    from lxml import etree
+
+import constants
+
+_class_name = re.compile(r"^-?[_a-zA-Z][\w-]*$")
+
+# The values of By.XPATH and By.CSS_SELECTOR: importing selenium.webdriver loads every browser's driver module, which
+# offline parsing and the replay server never need
+XPATH = "xpath"
+CSS_SELECTOR = "css selector"
+
+
+class Selector:
+    """
+    The compiled forms of one constant.
+
+    Args:
+        name: The constant's name in constants.py.
+        css: The CSS selector ("" if there is none).
+        xpath: The XPath ("" if there is none).
+        class_predicate: For class strings, an XPath predicate matching elements that have every class.
+        classes: For class strings, the individual classes.
+
+    An absolute XPath is also kept in a relative form ('//div...' -> './/div...') for searches inside an element.
+
+    Raises:
+        ValueError: On first access of 'lxml', if the XPath is invalid.
+    """
+
+    def __init__(self, name: str, css: str = "", xpath: str = "", class_predicate: str = "",
+                 classes: Optional[list[str]] = None):
+        self.name = name
+        self.classes = classes or []
+        self.css = css
+        self.xpath = xpath
+        self.class_predicate = class_predicate
+        self.relative_xpath = "." + xpath if xpath.startswith("//") else xpath
+        self._lxml: Optional["etree.XPath"] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def lxml(self) -> Optional["etree.XPath"]:
+        """The XPath compiled with lxml (None if there is no XPath), compiled on first access."""
+        if self._lxml is None and self.xpath:
+            from lxml import etree
+            try:
+                self._lxml = etree.XPath(self.xpath)
+            except etree.XPathSyntaxError as e:
+                raise ValueError(f"constants.{self.name} has an invalid XPath {self.xpath!r}: {e}") from e
+        return self._lxml
+
+
+def compile_class_string(name: str, class_string: str) -> Selector:
+    classes = class_string.split()
+    invalid = [cls for cls in classes if not _class_name.match(cls)]
+    if not classes or invalid:
+        raise ValueError(f"constants.{name} is not a valid class string: {invalid or class_string!r}")
+    css = "".join(f".{cls}" for cls in classes)
+    predicate = " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')" for cls in classes)
+    return Selector(name, css=css, class_predicate=predicate, classes=classes)
+
+
+def compile_selector_dict(name: str, value: dict) -> Selector:
+    return Selector(name, css=value.get("css_selector", "") or "", xpath=value.get("xpath", "") or "")
+
+
+class SelectorRegistry:
+    """All selectors of a constants module by name, with hit/miss statistics."""
+
+    def __init__(self, module=constants):
+        self.selectors: dict[str, Selector] = {}
+        self._lock = threading.Lock()
+        for name, value in vars(module).items():
+            if name.startswith("_"):
+                continue
+            if isinstance(value, dict) and ("xpath" in value or "css_selector" in value):
+                self.selectors[name] = compile_selector_dict(name, value)
+            elif isinstance(value, str):  # every string constant is a class string
+                self.selectors[name] = compile_class_string(name, value)
+
+    def __getitem__(self, name: str) -> Selector:
+        return self.selectors[name]
+
+    def css(self, name: str) -> str:
+        return self.selectors[name].css
+
+    def xpath(self, name: str) -> str:
+        return self.selectors[name].xpath
+
+    def class_xpath(self, name: str, axis: str = "./*") -> str:
+        """XPath for elements on 'axis' that have every class of a class string, e.g. './*[contains(...) and ...]'."""
+        return f"{axis}[{self.selectors[name].class_predicate}]"
+
+    def lxml_xpaths(self) -> dict[str, "etree.XPath"]:
+        """Every XPath compiled with lxml by name (for offline_parser.py)."""
+        return {name: selector.lxml for name, selector in self.selectors.items() if selector.xpath}
+
+    def record(self, name: str, found: bool) -> None:
+        with self._lock:
+            selector = self.selectors[name]
+            if found:
+                selector.hits += 1
+            else:
+                selector.misses += 1
+
+    def find(self, context, name: str, by: str = XPATH):
+        """
+        find_element with a registered selector, counted as a hit or a miss.
+
+        Args:
+            context: A WebDriver or WebElement.
+            name: The constant's name.
+            by: By.XPATH or By.CSS_SELECTOR.
+
+        Raises:
+            NoSuchElementException: Like find_element.
+        """
+        value = self.xpath(name) if by == XPATH else self.css(name)
+        try:
+            element = context.find_element(by, value)
+        except NoSuchElementException:
+            self.record(name, False)
+            raise
+        self.record(name, True)
+        return element
+
+    def find_all(self, context, name: str, by: str = XPATH) -> list:
+        """find_elements with a registered selector, an empty result counts as a miss."""
+        value = self.xpath(name) if by == XPATH else self.css(name)
+        elements = context.find_elements(by, value)
+        self.record(name, bool(elements))
+        return elements
+
+    def summary(self) -> str:
+        lines = [f"{'selector':<34}{'hits':>8}{'misses':>8}"]
+        for name, selector in sorted(self.selectors.items()):
+            if selector.hits or selector.misses:
+                lines.append(f"{name:<34}{selector.hits:>8}{selector.misses:>8}")
+        return "\n".join(lines)
+
+
+# Shared registry, compiled when the module is imported
+registry = SelectorRegistry()
+
+
+if __name__ == "__main__":
+    registry.lxml_xpaths()  # validates every XPath
+    for selector_name, compiled in sorted(registry.selectors.items()):
+        print(selector_name)
+        if compiled.css:
+            print(f"    css:   {compiled.css}")
+        if compiled.xpath:
+            print(f"    xpath: {compiled.xpath}")
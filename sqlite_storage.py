@@ -0,0 +1,169 @@
+"""
+SQLite Storage Backend
+
+Stores the post-dicts produced by pop_up_scrape in a normalized SQLite database instead of a
+single JSON array, so downstream jobs can query posts without parsing the whole output.
+
+Tables:
+- posts:    one row per post, keyed by a stable fingerprint (see fingerprint.py: the post id, or the
+            username and text, never the date), with the normalized date (date_iso, timestamp) for
+            sorting and its precision ("hour" for a date estimated from a feed card's "3h" label)
+- comments: one row per comment, referencing its post (replies also reference the position of the
+            comment they answer)
+
+Writes are batched into transactions that commit every 'batch_size' posts or 'batch_seconds'
+seconds, whichever comes first.  Re-scraping a post updates its row instead of duplicating it.
+"""
+import sqlite3
+import threading
+import time
+
+from fingerprint import post_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    username TEXT,
+    post_text TEXT,
+    date TEXT,
+    date_iso TEXT,
+    timestamp INTEGER,
+    date_precision TEXT,
+    first_scraped REAL,
+    last_scraped REAL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    username TEXT,
+    comment_text TEXT,
+    parent INTEGER,
+    UNIQUE (post_id, position)
+);
+CREATE INDEX IF NOT EXISTS posts_username_index ON posts(username);
+CREATE INDEX IF NOT EXISTS posts_date_index ON posts(date);
+CREATE INDEX IF NOT EXISTS comments_post_index ON comments(post_id);
+"""
+
+
+class SqliteSink:
+    """
+    Writes posts and their comments into a SQLite database with idempotent upserts.
+
+    The sink is created on the main thread and written from the StoragePipeline thread, so the connection is shared
+    between threads and only used under self._lock.
+    """
+
+    def __init__(self, file_path: str, batch_size: int = 50, batch_seconds: float = 10.0):
+        self.file_path = file_path
+        self.batch_size = max(1, batch_size)
+        self.batch_seconds = batch_seconds
+        self._pending = 0
+        self._batch_started = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        migrate(self.connection)
+        self.connection.commit()
+
+    def write(self, post_data: dict) -> None:
+        with self._lock:
+            store_post_data_sqlite(self.connection, post_data)
+            if self._pending == 0:
+                self._batch_started = time.monotonic()
+            self._pending += 1
+
+            if self._pending >= self.batch_size or time.monotonic() - self._batch_started >= self.batch_seconds:
+                self._commit()
+
+    def _commit(self) -> None:
+        self.connection.commit()
+        self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._commit()
+            finally:
+                self.connection.close()
+
+
+def migrate(connection: sqlite3.Connection) -> None:
+    """Adds the columns introduced after a database was created."""
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(comments)")}
+    if "parent" not in columns:
+        connection.execute("ALTER TABLE comments ADD COLUMN parent INTEGER")
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(posts)")}
+    if "timestamp" not in columns:
+        connection.execute("ALTER TABLE posts ADD COLUMN date_iso TEXT")
+        connection.execute("ALTER TABLE posts ADD COLUMN timestamp INTEGER")
+    if "date_precision" not in columns:
+        connection.execute("ALTER TABLE posts ADD COLUMN date_precision TEXT")
+    connection.execute("CREATE INDEX IF NOT EXISTS posts_timestamp_index ON posts(timestamp)")
+
+
+def store_post_data_sqlite(connection: sqlite3.Connection, post_data: dict) -> int:
+    """
+    Upserts one post and replaces its comments.  The caller is responsible for committing.
+
+    Args:
+        connection: An open connection to a database created by SqliteSink.
+        post_data: A post-dict as returned by pop_up_scrape.
+
+    Returns:
+        The row id of the post.
+    """
+    username = post_data.get("username", "")
+    post_text = post_data.get("post_text", "")
+    date = post_data.get("date", "")
+    fingerprint = post_key(post_data)
+    now = time.time()
+
+    connection.execute(
+        """
+        INSERT INTO posts (fingerprint, username, post_text, date, date_iso, timestamp, date_precision, first_scraped,
+                           last_scraped)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(fingerprint) DO UPDATE SET
+            username = excluded.username,
+            post_text = excluded.post_text,
+            date = excluded.date,
+            date_iso = excluded.date_iso,
+            timestamp = excluded.timestamp,
+            date_precision = excluded.date_precision,
+            last_scraped = excluded.last_scraped
+        """,
+        (fingerprint, username, post_text, date, post_data.get("date_iso", ""), post_data.get("timestamp"),
+         post_data.get("date_precision", ""), now, now),
+    )
+    post_id = connection.execute("SELECT id FROM posts WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+
+    # A re-scrape may have loaded more (or fewer) comments, so the comment rows are replaced as a whole
+    connection.execute("DELETE FROM comments WHERE post_id = ?", (post_id,))
+    connection.executemany(
+        "INSERT INTO comments (post_id, position, username, comment_text, parent) VALUES (?, ?, ?, ?, ?)",
+        [(post_id, position, comment.get("username", ""), comment.get("comment_text", ""), comment.get("parent"))
+         for position, comment in enumerate(post_data.get("comments", []))],
+    )
+    return post_id
+
+
+def load_post(connection: sqlite3.Connection, post_id: int) -> dict:
+    """Rebuilds the original post-dict shape for one stored post."""
+    username, post_text, date, date_iso, timestamp, date_precision = connection.execute(
+        "SELECT username, post_text, date, date_iso, timestamp, date_precision FROM posts WHERE id = ?",
+        (post_id,)).fetchone()
+    comments = [{"username": row[0], "comment_text": row[1], "parent": row[2]} for row in connection.execute(
+        "SELECT username, comment_text, parent FROM comments WHERE post_id = ? ORDER BY position", (post_id,))]
+    return {"username": username, "post_text": post_text, "date": date, "date_iso": date_iso, "timestamp": timestamp,
+            "date_precision": date_precision, "comments": comments}
@@ -0,0 +1,45 @@
+"""The parts of the benchmark that need no browser: result comparison and import-time parsing."""
+from benchmark import compare_results, compare_startup, parse_importtime
+
+importtime_output = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       2100 |   colorama
+import time:      3000 |      42000 | scraper_functions
+"""
+
+
+def case(posts_per_minute: float, run: int = 0) -> dict:
+    return {"posts": 20, "comments_per_post": 5, "extraction_mode": "js", "run": run,
+            "posts_per_minute": posts_per_minute, "commands_per_post": 12.0, "peak_rss_browser_mb": 300.0,
+            "stages": {"extract": {"p95": 0.25}}}
+
+
+def test_parse_importtime():
+    assert parse_importtime(importtime_output) == {
+        "_io": (120, 120), "colorama": (1500, 2100), "scraper_functions": (3000, 42000)}
+    assert parse_importtime("unrelated\n") == {}
+
+
+def test_compare_results_matches_cases():
+    table = compare_results({"cases": [case(60.0)]}, {"cases": [case(90.0), case(95.0, run=1)]})
+    lines = table.splitlines()
+    assert len(lines) == 2  # header and the one case present in both
+    assert "20x5 js" in lines[1]
+    assert "60.0 -> 90.0" in lines[1]
+    assert "250.0 -> 250.0" in lines[1]
+
+
+def test_compare_results_missing_stage():
+    current = case(90.0)
+    current["stages"] = {}
+    columns = compare_results({"cases": [case(60.0)]}, {"cases": [current]}).splitlines()[1].split()
+    assert "-" in columns  # the extract p95 column
+    assert "250.0" not in columns
+
+
+def test_compare_startup():
+    baseline = {"startup": {"scraper_functions": {"median_ms": 850.0}}}
+    current = {"startup": {"scraper_functions": {"median_ms": 190.4}, "worker_pool": {"median_ms": 200.0}}}
+    lines = compare_startup(baseline, current).splitlines()
+    assert len(lines) == 2
+    assert lines[1].split() == ["scraper_functions", "850", "->", "190"]
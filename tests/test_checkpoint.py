@@ -0,0 +1,79 @@
+"""Checkpoints: resuming, the known-post index and the high-water marks of incremental crawls."""
+import json
+
+from checkpoint import Checkpoint, checkpoint_path
+
+chronological_group = "https://www.facebook.com/groups/1/?sorting_setting=CHRONOLOGICAL"
+
+
+def crawl(path: str, feed: list[tuple[str, bool]], marks: int = 3) -> list[str]:
+    """Walks a feed of (key, pinned) like scrape_feed does, returns the keys that were scraped."""
+    checkpoint = Checkpoint(path, chronological_group, marks=marks)
+    scraped = []
+    for key, pinned in feed:
+        if checkpoint.reached_high_water_mark(key, pinned):
+            checkpoint.passed(key)
+            break
+        if checkpoint.is_known(key):
+            checkpoint.passed(key, pinned)
+            continue
+        checkpoint.record(key, pinned=pinned)
+        scraped.append(key)
+    checkpoint.finish()
+    checkpoint.close()
+    return scraped
+
+
+def test_checkpoint_path_is_per_group():
+    first = checkpoint_path("storage/checkpoint.json", "https://www.facebook.com/groups/1")
+    second = checkpoint_path("storage/checkpoint.json", "https://www.facebook.com/groups/2")
+    assert first != second and first.startswith("storage/checkpoint.") and first.endswith(".json")
+
+
+def test_file_holds_no_fingerprint_set(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, chronological_group, every=2)
+    for number in range(10):
+        checkpoint.record(f"card:{number}", "date")
+    checkpoint.close()
+
+    with open(path) as f:
+        state = json.load(f)
+    assert "fingerprints" not in state
+    assert state["posts_processed"] == 10 and len(state["crawl_newest"]) == 5
+
+    resumed = Checkpoint(path, chronological_group)
+    assert resumed.is_known("card:3") and not resumed.is_known("card:10")
+    resumed.close()
+
+
+def test_incremental_crawl_stops_at_the_previous_newest_posts(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    assert crawl(path, [("a", False), ("b", False), ("c", False), ("d", False)]) == ["a", "b", "c", "d"]
+    # two new posts on top, and "a" was deleted: "b" is still a mark
+    assert crawl(path, [("y", False), ("x", False), ("b", False), ("c", False), ("e", False)]) == ["y", "x"]
+
+
+def test_pinned_post_does_not_end_the_crawl(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    crawl(path, [("pinned", True), ("a", False), ("b", False)])
+    assert crawl(path, [("pinned", True), ("x", False), ("a", False), ("z", False)]) == ["x"]
+
+
+def test_loads_a_single_legacy_mark(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"group_link": chronological_group, "crawl_newest": "b", "high_water_mark": "a",
+                                "complete": True}))
+    checkpoint = Checkpoint(str(path), chronological_group)
+    assert checkpoint.high_water_marks == ["b"] and checkpoint.crawl_newest == []
+    checkpoint.close()
+
+
+def test_not_resuming_forgets_known_posts(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, chronological_group)
+    checkpoint.record("card:1")
+    checkpoint.close()
+    checkpoint = Checkpoint(path, chronological_group, resume=False)
+    assert not checkpoint.is_known("card:1")
+    checkpoint.close()
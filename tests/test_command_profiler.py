@@ -0,0 +1,44 @@
+import os
+import sysconfig
+
+from command_profiler import CommandProfiler, _is_scraper_file
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeDriver:
+    def execute(self, driver_command, params=None):
+        return {"value": None}
+
+
+def define(file_name: str, source: str, namespace: dict) -> None:
+    exec(compile(source, file_name, "exec"), namespace)
+
+
+def test_only_top_level_modules_are_scraper_files():
+    assert _is_scraper_file(os.path.join(repo_dir, "scraper_functions.py"))
+    assert not _is_scraper_file(os.path.join(repo_dir, "command_profiler.py"))
+    assert not _is_scraper_file(os.path.join(repo_dir, ".venv", "lib", "python3.12", "site-packages", "selenium",
+                                             "webdriver", "remote", "webelement.py"))
+    assert not _is_scraper_file(os.path.join(repo_dir, "tests", "test_command_profiler.py"))
+    assert not _is_scraper_file(repo_dir + "-old" + os.sep + "scraper_functions.py")
+    assert not _is_scraper_file(os.path.join(sysconfig.get_paths()["stdlib"], "threading.py"))
+    assert not _is_scraper_file("<frozen runpy>")
+
+
+def test_virtualenv_frames_are_not_call_sites():
+    driver = FakeDriver()
+    profiler = CommandProfiler(driver)
+    namespace = {"driver": driver}
+    define(os.path.join(repo_dir, ".venv", "lib", "site-packages", "selenium", "webelement.py"),
+           "def get_text():\n    return driver.execute('getElementText')\n", namespace)
+    define(os.path.join(repo_dir, "scraper_functions.py"),
+           "def pop_up_scrape():\n    return scrape_for_post_info()\n"
+           "def scrape_for_post_info():\n    return get_text()\n", namespace)
+
+    namespace["pop_up_scrape"]()
+    profiler.stop()
+
+    assert list(profiler.stacks) == [("pop_up_scrape", "scrape_for_post_info", "getElementText")]
+    assert list(profiler.by_call_site()) == ["scrape_for_post_info"]
+    assert driver.execute.__func__ is FakeDriver.execute
@@ -0,0 +1,89 @@
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+from selenium.common import WebDriverException
+
+from comment_threads import (expand_comments, expander_pattern, js_expand_pass, js_track_requests,
+                             js_untrack_requests)
+
+
+@pytest.mark.parametrize("text", ["View all 12 replies", "View 1 reply", "View more replies", "View more comments",
+                                  "See previous comments"])
+def test_expander_pattern_matches(text):
+    assert re.match(expander_pattern, text, re.IGNORECASE)
+
+
+@pytest.mark.parametrize("text", ["Reply", "Most relevant", "View profile", "See translation"])
+def test_expander_pattern_ignores(text):
+    assert not re.match(expander_pattern, text, re.IGNORECASE)
+
+
+class FakeDriver:
+    def __init__(self, fail_on: str = ""):
+        self.scripts: list[str] = []
+        self.fail_on = fail_on
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+        if script == self.fail_on:
+            raise WebDriverException("popup went away")
+        return True
+
+
+def test_request_tracking_is_removed_when_a_pass_fails():
+    driver = FakeDriver(fail_on=js_expand_pass)
+    assert expand_comments(object(), driver) == 0
+    assert driver.scripts == [js_track_requests, js_expand_pass, js_untrack_requests]
+
+
+# A minimal window with fetch and XMLHttpRequest, the scripts are run as execute_script runs them (function bodies)
+node_harness = """
+const performance = {now: () => Date.now()};
+class XMLHttpRequest {
+    addEventListener(name, listener) { this.listener = listener; }
+}
+const pageSend = function () { return 'sent'; };
+XMLHttpRequest.prototype.send = pageSend;
+const pageFetch = async () => 'response';
+const window = {fetch: pageFetch};
+const run = body => new Function('window', 'XMLHttpRequest', 'performance', body)(window, XMLHttpRequest, performance);
+const results = {};
+
+(async () => {
+    results.installed = run(TRACK_SCRIPT);
+    results.wrapped = window.fetch !== pageFetch && XMLHttpRequest.prototype.send !== pageSend;
+    const request = new XMLHttpRequest();
+    request.send();
+    results.pendingXhr = window.__scraperRequests.started.size;
+    request.listener();
+    await window.fetch();
+    results.pendingAfter = window.__scraperRequests.started.size;
+    results.restored = run(UNTRACK_SCRIPT);
+    results.original = window.fetch === pageFetch && XMLHttpRequest.prototype.send === pageSend;
+    results.stateRemoved = window.__scraperRequests === undefined;
+
+    run(TRACK_SCRIPT);
+    const tracked = window.fetch;
+    window.fetch = function (...args) { return tracked.apply(this, args); };  // the page wraps fetch again
+    const pageWrapper = window.fetch;
+    results.replacedRestored = run(UNTRACK_SCRIPT);
+    results.pageWrapperKept = window.fetch === pageWrapper && XMLHttpRequest.prototype.send === pageSend;
+    results.stillWorks = await window.fetch();
+    console.log(JSON.stringify(results));
+})();
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_request_tracking_restores_the_page_functions():
+    script = (node_harness.replace("UNTRACK_SCRIPT", json.dumps(js_untrack_requests))
+              .replace("TRACK_SCRIPT", json.dumps(js_track_requests)))
+    result = subprocess.run(["node", "-e", script], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == {
+        "installed": True, "wrapped": True, "pendingXhr": 1, "pendingAfter": 0, "restored": True, "original": True,
+        "stateRemoved": True, "replacedRestored": False, "pageWrapperKept": True, "stillWorks": "response",
+    }
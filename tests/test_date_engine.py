@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+from date_engine import DateEngine, ResolvedDate, format_timestamp, parse_label, parse_tooltip_date
+
+
+def local(*fields) -> int:
+    return int(datetime(*fields).timestamp())
+
+
+# The crawl runs on Wednesday, March 12, 2025 at 10:30 (local time)
+now = local(2025, 3, 12, 10, 30)
+hour, day = 3600, 86400
+utc_0937 = int(datetime.fromisoformat("2025-03-12T09:37:00+00:00").timestamp())
+
+en_labels = [
+    ("Just now", now, "minute"),
+    ("5m", now - 5 * 60, "minute"),
+    ("3h", now - 3 * hour, "hour"),
+    ("3 hrs ago", now - 3 * hour, "hour"),
+    ("2d", now - 2 * day, "day"),
+    ("1w", now - 7 * day, "day"),
+    ("2y", now - 2 * 365 * day, "year"),
+    ("Yesterday at 4:12 PM", local(2025, 3, 11, 16, 12), "minute"),
+    ("Yesterday at 4:12\u202fPM", local(2025, 3, 11, 16, 12), "minute"),
+    ("Yesterday", local(2025, 3, 11), "day"),
+    ("Today at 12:05 AM", local(2025, 3, 12, 0, 5), "minute"),
+    ("Monday at 9:03 AM", local(2025, 3, 10, 9, 3), "minute"),
+    ("Friday at 11:59 PM", local(2025, 3, 7, 23, 59), "minute"),
+    ("Wednesday at 8:00 AM", local(2025, 3, 5, 8, 0), "minute"),  # the crawl's own weekday is last week
+    ("Thursday", local(2025, 3, 6), "day"),
+    ("9:15 AM", local(2025, 3, 12, 9, 15), "minute"),
+    ("11:00 PM", local(2025, 3, 11, 23, 0), "minute"),  # later than the crawl, so yesterday
+    ("March 3 at 4:37 PM", local(2025, 3, 3, 16, 37), "minute"),
+    ("March 3", local(2025, 3, 3), "day"),
+    ("Mar 3", local(2025, 3, 3), "day"),
+    ("March 13", local(2025, 3, 13), "day"),  # tomorrow is kept (time zones)
+    ("December 30 at 8:00 PM", local(2024, 12, 30, 20, 0), "minute"),  # in the future, so last year
+    ("March 12, 2023", local(2023, 3, 12), "day"),
+    ("Wednesday, March 12, 2025 at 4:37 PM", local(2025, 3, 12, 16, 37), "minute"),
+    (" \u00b7 2h \u00b7 ", now - 2 * hour, "hour"),
+]
+
+es_labels = [
+    ("justo ahora", now, "minute"),
+    ("hace 3 h", now - 3 * hour, "hour"),
+    ("3 h", now - 3 * hour, "hour"),
+    ("2 sem", now - 14 * day, "day"),
+    ("hace 1 a\u00f1o", now - 365 * day, "year"),
+    ("Ayer a las 16:12", local(2025, 3, 11, 16, 12), "minute"),
+    ("Ayer a las 4:12 p. m.", local(2025, 3, 11, 16, 12), "minute"),
+    ("lunes a las 9:03", local(2025, 3, 10, 9, 3), "minute"),
+    ("mi\u00e9rcoles a las 8:00", local(2025, 3, 5, 8, 0), "minute"),
+    ("3 de marzo a las 16:37", local(2025, 3, 3, 16, 37), "minute"),
+    ("30 de diciembre", local(2024, 12, 30), "day"),
+    ("12 de marzo de 2023", local(2023, 3, 12), "day"),
+]
+
+unparseable = ["", "Sponsored", "25:10", "February 30", "March", "Shared with Public"]
+
+
+@pytest.mark.parametrize("label, epoch, precision", en_labels, ids=[label for label, _, _ in en_labels])
+def test_parse_label_en(label, epoch, precision):
+    assert parse_label(label, "en", now) == (epoch, precision)
+
+
+@pytest.mark.parametrize("label, epoch, precision", es_labels, ids=[label for label, _, _ in es_labels])
+def test_parse_label_es(label, epoch, precision):
+    assert parse_label(label, "es", now) == (epoch, precision)
+
+
+@pytest.mark.parametrize("label", unparseable)
+def test_parse_label_unparseable(label):
+    assert parse_label(label, "en", now) is None
+
+
+def test_unknown_locale_falls_back_to_en():
+    assert parse_label("3h", "xx", now) == (now - 3 * hour, "hour")
+
+
+def test_tooltip_format_round_trip():
+    tooltip = format_timestamp(local(2025, 3, 12, 16, 37))
+    assert tooltip == "Wednesday, March 12, 2025 at 4:37\u202fPM"
+    assert parse_tooltip_date(tooltip) == local(2025, 3, 12, 16, 37)
+    assert parse_tooltip_date("3h") is None
+
+
+engine_cases = [
+    # (label, href, hints, expected)
+    ("3h", "", ["1741772220"], ResolvedDate(1741772220, "second", "attribute")),
+    ("3h", "", ["", "1741772220123"], ResolvedDate(1741772220, "second", "attribute")),
+    ("3h", "", ["2025-03-12T09:37:00Z"], ResolvedDate(utc_0937, "second", "attribute")),
+    ("3h", "", ["Wednesday, March 12, 2025 at 8:37 AM"],
+     ResolvedDate(local(2025, 3, 12, 8, 37), "minute", "attribute")),
+    ("3h", "", ["2h"], ResolvedDate(now - 3 * hour, "hour", "label")),  # an imprecise hint does not win
+    ("3h", "https://www.facebook.com/groups/1/posts/2/?utime=1741772220", [],
+     ResolvedDate(1741772220, "second", "href")),
+    ("Yesterday at 4:12 PM", "https://www.facebook.com/groups/1/posts/2/", [],
+     ResolvedDate(local(2025, 3, 11, 16, 12), "minute", "label")),
+    ("Sponsored", "", [], None),
+]
+
+
+@pytest.mark.parametrize("label, href, hints, expected", engine_cases)
+def test_date_engine_resolve(label, href, hints, expected):
+    assert DateEngine(now=now).resolve(label, href, hints) == expected
+
+
+def test_date_engine_uses_the_crawl_minute():
+    engine = DateEngine(now=now + 45)
+    assert engine.resolve("3h") == ResolvedDate(now - 3 * hour, "hour", "label")
+    assert engine.resolve("Just now").precise and not engine.resolve("3h").precise
+
+
+def test_date_engine_locale_and_fields():
+    assert DateEngine(locale="es", now=now).resolve("hace 2 h") == ResolvedDate(now - 2 * hour, "hour", "label")
+    fields = DateEngine(now=now).fields("Wednesday, March 12, 2025 at 4:37 PM")
+    assert fields["timestamp"] == local(2025, 3, 12, 16, 37)
+    assert fields["date_iso"].startswith("2025-03-12T16:37:00")
+    assert DateEngine(now=now).fields("") == {"date_iso": "", "timestamp": None}
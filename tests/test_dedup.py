@@ -0,0 +1,102 @@
+"""The Bloom filter and the exact SQLite set behind DedupIndex."""
+import os
+
+from dedup import BloomFilter, DedupIndex
+from fingerprint import card_fingerprint, post_fingerprint, post_id_from_url
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    items = [f"item-{index}" for index in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{index}" in bloom for index in range(10_000))
+    assert false_positives < 300  # 1% expected at capacity
+
+
+def test_bloom_filter_save_and_load(tmp_path):
+    bloom = BloomFilter(100, 0.001)
+    bloom.add("a")
+    path = str(tmp_path / "filter.bloom")
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert "a" in loaded and loaded.count == 1
+    assert (loaded.capacity, loaded.error_rate, loaded.bits) == (bloom.capacity, bloom.error_rate, bloom.bits)
+
+
+def test_dedup_index_add_and_seen(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup"), capacity=1000)
+    assert not index.seen("a")
+    assert index.add("a")
+    assert not index.add("a")
+    assert index.seen("a")
+    # a "no" from the filter never touches SQLite (one item in a filter sized for 1000 gives no false positive)
+    lookups, disk_lookups = index.lookups, index.disk_lookups
+    index.seen("never-added")
+    assert (index.lookups, index.disk_lookups) == (lookups + 1, disk_lookups)
+    index.close()
+
+
+def test_dedup_index_persists_between_runs(tmp_path):
+    base = str(tmp_path / "dedup")
+    index = DedupIndex(base, capacity=1000)
+    for number in range(50):
+        index.add(f"fp-{number}")
+    index.close()
+    assert os.path.exists(base + ".db") and os.path.exists(base + ".bloom")
+
+    index = DedupIndex(base, capacity=1000)
+    assert all(index.seen(f"fp-{number}") for number in range(50))
+    assert index.bloom.count == 50
+    index.close()
+
+
+def test_dedup_index_rebuilds_a_stale_filter(tmp_path):
+    base = str(tmp_path / "dedup")
+    index = DedupIndex(base, capacity=1000)
+    index.add("a")
+    index.close()
+    BloomFilter(1000).save(base + ".bloom")  # out of date: holds nothing
+
+    index = DedupIndex(base, capacity=1000)
+    assert index.seen("a")
+    index.close()
+    # a different capacity rebuilds it as well
+    index = DedupIndex(base, capacity=2000)
+    assert index.seen("a") and index.bloom.capacity == 2000
+    index.close()
+
+
+def test_dedup_index_flush_commits(tmp_path):
+    base = str(tmp_path / "dedup")
+    index = DedupIndex(base, capacity=1000, commit_every=1000)
+    index.add("a")
+    index.flush()
+    other = DedupIndex(base, capacity=1000)  # a second connection sees committed rows only
+    assert other.seen("a")
+    other.close()
+    index.close()
+
+
+def test_card_keys_do_not_collide_with_stored_post_keys(tmp_path):
+    # the browser adds feed-card keys, the storage pipeline stored-post keys, to the same index
+    index = DedupIndex(str(tmp_path / "dedup"), capacity=1000)
+    assert index.add(card_fingerprint("Ann", "Hello"))
+    assert index.add(post_fingerprint("Ann", "Hello"))
+    index.close()
+
+
+def test_card_keys_prefer_the_post_id():
+    assert card_fingerprint("Ann", "Hello", "456") == card_fingerprint("Ann", "Hello (edited)", "456")
+    assert card_fingerprint("Ann", "Hello", "456") != card_fingerprint("Ann", "Hello")
+    assert post_id_from_url("https://www.facebook.com/groups/1/posts/456/?comment_id=9") == "456"
+    assert post_id_from_url("https://www.facebook.com/permalink.php?story_fbid=pfbid02x&id=4") == "pfbid02x"
+    assert post_id_from_url("https://www.facebook.com/groups/1/?multi_permalinks=555") == "555"
+    assert post_id_from_url("#") == ""
+
+
+def test_card_key_does_not_change_as_the_label_ages():
+    from scraper_functions import card_key
+    card = {"username": "Ann", "post_text": "Hello", "permalink": "", "date_hints": []}
+    assert card_key(dict(card, date_label="3h")) == card_key(dict(card, date_label="Yesterday at 9:00 AM"))
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(source: str) -> str:
+    result = subprocess.run([sys.executable, "-c", source], cwd=repo_dir, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.mark.parametrize("module", ["scraper_functions", "worker_pool"])
+def test_optional_dependencies_are_not_imported_at_startup(module):
+    loaded = run(f"import sys, {module}\n"
+                 "print(sorted({name.split('.')[0] for name in sys.modules} & "
+                 "{'lxml', 'prometheus_client', 'bs4', 'google', 'requests', 'dotenv'}))")
+    assert loaded == "[]"
+
+
+def test_selector_registry_compiles_lxml_xpaths_on_first_use():
+    output = run("import sys\n"
+                 "from selector_registry import registry\n"
+                 "print('lxml' in sys.modules)\n"
+                 "xpaths = registry.lxml_xpaths()\n"
+                 "print('lxml' in sys.modules, len(xpaths) > 0,\n"
+                 "      registry['post_text_obj'].lxml is xpaths['post_text_obj'])")
+    assert output.splitlines() == ["False", "True True True"]
+
+
+def test_metrics_are_noops_until_the_server_starts():
+    pytest.importorskip("prometheus_client")
+    output = run("import sys, metrics\n"
+                 "metrics.posts_scraped.inc()\n"
+                 "print(type(metrics.posts_scraped).__name__, 'prometheus_client' in sys.modules)\n"
+                 "print(metrics.start_metrics_server(0, host='127.0.0.1'))\n"
+                 "metrics.posts_scraped.inc()\n"
+                 "print(type(metrics.posts_scraped).__name__, metrics.posts_scraped._value.get())")
+    assert output.splitlines()[0] == "_NoopMetric False"
+    assert output.splitlines()[-1] == "Counter 1.0"
+
+
+def test_invalid_xpath_is_reported_when_compiled():
+    from selector_registry import Selector
+
+    selector = Selector("broken_obj", xpath="//div[@role='dialog'")
+    with pytest.raises(ValueError, match="broken_obj"):
+        selector.lxml
@@ -0,0 +1,90 @@
+import json
+
+from date_engine import format_timestamp
+from network_capture import iter_json_documents, parse_payload, parse_story
+from replay_server import generate_fixtures, render_graphql_payload
+
+
+def comment(comment_id, name, text, replies=()):
+    return {"__typename": "Comment", "id": comment_id, "author": {"name": name}, "body": {"text": text},
+            "feedback": {"replies_connection": {"edges": [{"node": reply} for reply in replies]}}}
+
+
+def story(post_id, name, text, comments=(), creation_time=1741252440):
+    return {"__typename": "Story", "id": f"story:{post_id}", "post_id": post_id,
+            "actors": [{"__typename": "User", "name": name}], "message": {"text": text},
+            "creation_time": creation_time,
+            "feedback": {"comment_list_renderer": {"comments": {"edges": [{"node": node} for node in comments]}}}}
+
+
+def test_render_graphql_payload_round_trip():
+    posts = generate_fixtures(4, 3, seed=11, max_replies=2)
+    parsed = parse_payload(render_graphql_payload(posts, 20))
+
+    assert [post["id"] for post in parsed] == ["20", "21", "22", "23"]
+    for got, want in zip(parsed, posts):
+        assert got["username"] == want["username"]
+        assert got["post_text"] == want["post_text"]
+        assert got["date"] == want["date"]
+        assert got["comments"] == want["comments"]
+    assert any(comment["parent"] is not None for post in parsed for comment in post["comments"])
+
+
+def test_iter_json_documents_guard_and_separators():
+    body = 'for (;;);{"a": 1}\n{"b": [2]}{"c": "x"}\r\n  for (;;);{"d": null}\n'
+    assert list(iter_json_documents(body)) == [{"a": 1}, {"b": [2]}, {"c": "x"}, {"d": None}]
+
+
+def test_iter_json_documents_stops_at_a_malformed_document():
+    assert list(iter_json_documents('{"a": 1}\n{"b": \n{"c": 3}')) == [{"a": 1}]
+    assert list(iter_json_documents("")) == []
+    assert list(iter_json_documents("for (;;);")) == []
+
+
+def test_parse_payload_multi_document_body():
+    documents = [{"data": {"node": story("1", "Ann", "first")}},
+                 {"label": "stream", "data": {"node": story("2", "Bob", "second")}},
+                 {"extensions": {"is_final": True}}]
+    body = "for (;;);" + "\n".join(json.dumps(document) for document in documents)
+
+    posts = parse_payload(body)
+    assert [(post["id"], post["username"], post["post_text"]) for post in posts] == [("1", "Ann", "first"),
+                                                                                   ("2", "Bob", "second")]
+    assert posts[0]["timestamp"] == 1741252440
+    assert posts[0]["date"] == format_timestamp(1741252440)
+
+
+def test_parse_payload_nested_replies():
+    thread = [comment("c1", "Mia", "top", replies=[comment("c2", "Rafael", "reply",
+                                                           replies=[comment("c3", "Mia", "reply to reply")]),
+                                                   comment("c4", "Tom", "second reply")]),
+              comment("c5", "Lee", "another top")]
+    post = parse_payload(json.dumps({"data": {"node": story("7", "Ann", "text", thread)}}))[0]
+
+    assert post["comments"] == [
+        {"username": "Mia", "comment_text": "top", "parent": None},
+        {"username": "Rafael", "comment_text": "reply", "parent": 0},
+        {"username": "Mia", "comment_text": "reply to reply", "parent": 1},
+        {"username": "Tom", "comment_text": "second reply", "parent": 0},
+        {"username": "Lee", "comment_text": "another top", "parent": None},
+    ]
+
+
+def test_parse_payload_keeps_only_outermost_stories():
+    shared = story("9", "Ann", "look at this")
+    shared["attachments"] = [{"target": story("8", "Bob", "the original")}]
+    assert [post["id"] for post in parse_payload(json.dumps({"data": {"node": shared}}))] == ["9"]
+
+
+def test_parse_payload_repeated_comment_is_kept_once():
+    repeated = comment("c1", "Mia", "top")
+    node = story("3", "Ann", "text", [repeated])
+    node["preview"] = {"edges": [{"node": repeated}]}
+    assert len(parse_payload(json.dumps(node))[0]["comments"]) == 1
+
+
+def test_parse_story_without_exact_time_or_author():
+    node = story("4", "Ann", "text", creation_time=None)
+    post = parse_story(node)
+    assert post["date"] == "" and post["date_iso"] == "" and post["timestamp"] is None
+    assert parse_story({"__typename": "Story", "id": "x", "attachments": []}) is None
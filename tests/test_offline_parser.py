@@ -0,0 +1,94 @@
+"""
+Parity of the lxml dialog parser with the post-dicts of dialogs that were not made by replay_server.py.
+
+fixtures/markup holds hand-written dialogs modelled on the live markup, their .json files were written by hand from
+how innerText renders them.  fixtures/captured holds anonymized snapshots of a real session (see its README.md).
+"""
+import glob
+import json
+import os
+
+import pytest
+from lxml import html as lxml_html
+
+from offline_parser import Anonymizer, anonymize_snapshots, check_parity, parse_popup_html, visible_text
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+dialog_dirs = [os.path.join(fixture_dir, "markup"), os.path.join(fixture_dir, "captured")]
+dialog_paths = sorted(path for directory in dialog_dirs for path in glob.glob(os.path.join(directory, "*.html"))
+                      if not path.endswith(".feed.html"))
+
+
+def load_expected(html_path: str) -> dict:
+    with open(html_path[:-len(".html")] + ".json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_fixtures_are_checked_in():
+    assert len(dialog_paths) >= 3
+
+
+@pytest.mark.parametrize("html_path", dialog_paths, ids=os.path.basename)
+def test_parse_popup_html_matches_expected(html_path):
+    expected = load_expected(html_path)
+    with open(html_path, "r", encoding="utf-8") as f:
+        parsed = parse_popup_html(f.read(), date=expected["date"])
+
+    assert parsed["username"] == expected["username"]
+    assert parsed["post_text"] == expected["post_text"]
+    assert parsed["date"] == expected["date"]
+    assert len(parsed["comments"]) == len(expected["comments"])
+    for got, want in zip(parsed["comments"], expected["comments"]):
+        assert got == {"username": want["username"], "comment_text": want["comment_text"], "parent": want["parent"]}
+
+
+def test_fixtures_contain_replies():
+    # the thread reconstruction is only exercised if some comment has a parent
+    parents = [comment["parent"] for path in dialog_paths for comment in load_expected(path)["comments"]]
+    assert any(parent is not None for parent in parents)
+
+
+@pytest.mark.parametrize("directory", dialog_dirs, ids=os.path.basename)
+def test_check_parity_reports_no_mismatches(directory):
+    assert check_parity(directory) == []
+
+
+def test_check_parity_reports_a_changed_field(tmp_path):
+    html_path = dialog_paths[0]
+    expected = load_expected(html_path)
+    expected["post_text"] += " (edited)"
+    expected["comments"] = expected["comments"][:-1]
+    with open(html_path, "r", encoding="utf-8") as f:
+        (tmp_path / "post.html").write_text(f.read(), encoding="utf-8")
+    (tmp_path / "post.json").write_text(json.dumps(expected), encoding="utf-8")
+
+    descriptions = [description for _, description in check_parity(str(tmp_path))]
+    assert any(description.startswith("post_text:") for description in descriptions)
+    assert any(description.startswith("comments:") for description in descriptions)
+
+
+def test_visible_text_skips_hidden_content():
+    element = lxml_html.fromstring('<div><div>First</div><span hidden>secret</span><script>x()</script>'
+                                   '<div style="display: none">gone</div><div>Second<br>line</div></div>')
+    assert visible_text(element) == "First\nSecond\nline"
+
+
+def test_anonymized_snapshots_keep_parity(tmp_path):
+    markup_dir = dialog_dirs[0]
+    count = anonymize_snapshots(markup_dir, str(tmp_path), salt=b"test")
+
+    assert count == len(glob.glob(os.path.join(markup_dir, "*.json")))
+    assert check_parity(str(tmp_path)) == []
+    for html_path in glob.glob(os.path.join(str(tmp_path), "*")):
+        with open(html_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        assert "Rafael" not in content and "Ortiz" not in content and "fbcdn" not in content
+
+
+def test_anonymizer_is_consistent_and_keeps_shape():
+    anonymizer = Anonymizer(salt=b"test")
+    assert anonymizer.text("Mia Chen, mia chen!") == anonymizer.text("Mia Chen, mia chen!")
+    first, last = anonymizer.text("Mia Chen").split(" ")
+    assert len(first) == 3 and first[0].isupper() and first[1:].islower() and len(last) == 4
+    assert anonymizer.text("Leave a comment 3 replies") == "Leave a comment 3 replies"
+    assert Anonymizer(salt=b"other").text("Chen") != anonymizer.text("Chen")
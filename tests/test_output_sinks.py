@@ -0,0 +1,143 @@
+"""Output sinks: JSON array appends, JSON Lines flushing, segment rotation and resume."""
+import gzip
+import json
+import os
+
+import pytest
+
+import output_sinks
+from output_sinks import (JsonLinesSink, SegmentedJsonLinesSink, append_to_json_array, convert_to_json_array,
+                          iter_posts, open_sink, segment_index, segment_paths)
+
+
+def posts(count: int, start: int = 0) -> list[dict]:
+    return [{"username": f"Member {index}", "post_text": f"Post {index} \u00fc", "comments": []}
+            for index in range(start, start + count)]
+
+
+def test_append_to_json_array(tmp_path):
+    path = str(tmp_path / "data.json")
+    for post in posts(3):
+        append_to_json_array(path, post)
+    with open(path) as f:
+        assert json.load(f) == posts(3)
+
+
+def test_append_to_json_array_empty_array(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("[]\n")
+    append_to_json_array(str(path), posts(1)[0])
+    assert json.loads(path.read_text()) == posts(1)
+
+
+def test_append_to_json_array_rejects_other_content(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text('{"a": 1}')
+    with pytest.raises(ValueError):
+        append_to_json_array(str(path), posts(1)[0])
+
+
+def test_json_lines_sink_buffers_until_full(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    sink = JsonLinesSink(path, buffer_size=3, fsync_interval=3600)
+    for post in posts(2):
+        sink.write(post)
+    assert os.path.getsize(path) == 0
+    sink.write(posts(1, 2)[0])
+    assert list(iter_posts(path)) == posts(3)
+    sink.close()
+
+
+def test_json_lines_sink_flushes_after_the_interval(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(output_sinks.time, "monotonic", lambda: clock[0])
+    path = str(tmp_path / "data.jsonl")
+    sink = JsonLinesSink(path, buffer_size=100, fsync_interval=5.0)
+    sink.write(posts(1)[0])
+    assert os.path.getsize(path) == 0
+
+    clock[0] += 5.0  # a slow crawl: the buffer is far from full, the interval has passed
+    sink.write(posts(1, 1)[0])
+    assert list(iter_posts(path)) == posts(2)
+    sink.close()
+
+
+def test_json_lines_sink_appends_across_runs(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    for batch in (posts(2), posts(2, 2)):
+        sink = JsonLinesSink(path)
+        for post in batch:
+            sink.write(post)
+        sink.close()
+    assert list(iter_posts(path)) == posts(4)
+
+
+def test_segmented_sink_rotates(tmp_path):
+    base = str(tmp_path / "data")
+    sink = SegmentedJsonLinesSink(base + ".jsonl.gz", segment_size=2)
+    for post in posts(5):
+        sink.write(post)
+    sink.close()
+
+    assert [os.path.basename(path) for path in segment_paths(base)] == \
+        ["data.00001.jsonl.gz", "data.00002.jsonl.gz", "data.00003.jsonl.gz"]
+    with gzip.open(segment_paths(base)[0], "rt", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == posts(2)
+    assert list(iter_posts(base)) == posts(5)
+
+
+def test_segmented_sink_resumes_after_the_highest_segment(tmp_path):
+    base = str(tmp_path / "data")
+    sink = SegmentedJsonLinesSink(base + ".jsonl.gz", segment_size=1)
+    for post in posts(3):
+        sink.write(post)
+    sink.close()
+    os.remove(f"{base}.00002.jsonl.gz")  # a gap, e.g. a segment that was moved away
+
+    sink = SegmentedJsonLinesSink(base + ".jsonl.gz", segment_size=1)
+    sink.write(posts(1, 3)[0])
+    sink.close()
+
+    assert [segment_index(path) for path in segment_paths(base)] == [1, 3, 4]
+    assert list(iter_posts(base)) == [posts(4)[0], posts(4)[2], posts(4)[3]]
+
+
+def test_segmented_sink_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        SegmentedJsonLinesSink(str(tmp_path / "data"), compression="bz2")
+
+
+def test_segmented_sink_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    base = str(tmp_path / "data")
+    sink = SegmentedJsonLinesSink(base + ".jsonl.zst", compression="zstd", segment_size=2)
+    for post in posts(3):
+        sink.write(post)
+    sink.close()
+    assert list(iter_posts(base)) == posts(3)
+
+
+def test_convert_to_json_array(tmp_path):
+    base = str(tmp_path / "data")
+    sink = SegmentedJsonLinesSink(base + ".jsonl.gz", segment_size=2)
+    for post in posts(3):
+        sink.write(post)
+    sink.close()
+
+    destination = str(tmp_path / "data.json")
+    assert convert_to_json_array(base, destination) == 3
+    with open(destination, encoding="utf-8") as f:
+        assert json.load(f) == posts(3)
+    assert convert_to_json_array(base, destination, limit=0) == 0
+    with open(destination, encoding="utf-8") as f:
+        assert json.load(f) == []
+
+
+def test_open_sink(tmp_path):
+    assert type(open_sink(str(tmp_path / "data.json"), "json")).__name__ == "JsonArraySink"
+    sink = open_sink(str(tmp_path / "data.jsonl"), "jsonl", buffer_size=5)
+    assert isinstance(sink, JsonLinesSink) and sink.buffer_size == 5
+    sink.close()
+    assert isinstance(open_sink(str(tmp_path / "data"), "jsonl.gz"), SegmentedJsonLinesSink)
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / "data.csv"), "csv")
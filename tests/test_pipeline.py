@@ -0,0 +1,55 @@
+"""The storage pipeline writing from its background thread."""
+import sqlite3
+
+from output_sinks import iter_posts, open_sink
+from pipeline import StoragePipeline
+from replay_server import generate_fixtures
+
+
+def test_pipeline_writes_into_a_sqlite_sink(tmp_path):
+    path = str(tmp_path / "data.db")
+    posts = generate_fixtures(5, 2, seed=1)
+    sink = open_sink(path)  # created on this thread, written from the "storage-pipeline" thread
+    storage = StoragePipeline(sink)
+    for post in posts + posts[:2]:
+        storage.submit(post)
+    storage.close()
+    sink.close()
+
+    assert (storage.written, storage.duplicates) == (5, 2)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 5
+        assert connection.execute("SELECT COUNT(*) FROM comments").fetchone()[0] == 10
+        usernames = [row[0] for row in connection.execute("SELECT username FROM posts ORDER BY id")]
+    assert usernames == [post["username"] for post in posts]
+
+
+def test_pipeline_writes_into_a_json_lines_sink(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    posts = generate_fixtures(3, 1, seed=2)
+    sink = open_sink(path, "jsonl", buffer_size=100)
+    storage = StoragePipeline(sink)
+    for post in posts:
+        storage.submit(post)
+    storage.close()
+    sink.close()
+
+    assert list(iter_posts(path)) == posts
+
+
+def test_feed_card_posts_are_not_duplicated_as_their_label_ages(tmp_path):
+    from scraper_functions import feed_card_post
+
+    path = str(tmp_path / "data.db")
+    card = {"username": "Ann", "post_text": "Hello", "permalink": "", "date_hints": [], "comment_count": 0}
+    first, later = feed_card_post(dict(card, date_label="3h")), feed_card_post(dict(card, date_label="4h"))
+    assert first["date"] == "" and first["date_precision"] == "hour" and first["date_label"] == "3h"
+
+    for post in (first, later):  # two runs
+        sink = open_sink(path)
+        storage = StoragePipeline(sink)
+        storage.submit(post)
+        storage.close()
+        sink.close()
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 1
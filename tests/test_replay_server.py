@@ -0,0 +1,107 @@
+"""Fixture rendering and comparison of the replay harness, no browser needed."""
+import json
+
+from lxml import html as lxml_html
+
+from date_engine import parse_tooltip_date
+from offline_parser import parse_popup_html, visible_text
+from replay_server import (compare_posts, generate_fixtures, load_fixtures, render_dialog, render_feed_card,
+                           render_graphql_payload, write_fixtures, _prepare_dialog)
+
+
+def test_generate_fixtures_is_deterministic():
+    assert generate_fixtures(5, 3, seed=1, max_replies=2) == generate_fixtures(5, 3, seed=1, max_replies=2)
+    assert generate_fixtures(5, 3, seed=1) != generate_fixtures(5, 3, seed=2)
+
+
+def test_generated_fixtures_have_tooltip_dates_and_threads():
+    posts = generate_fixtures(10, 4, seed=3, max_replies=2)
+    assert [post["username"] for post in posts[:2]] == ["Member 0000", "Member 0001"]
+    for post in posts:
+        assert "\u202f" in post["date"]  # the narrow no-break space of the tooltip
+        assert parse_tooltip_date(post["date"]) is not None
+        for index, comment in enumerate(post["comments"]):
+            # replies point back at a top-level comment
+            if comment["parent"] is not None:
+                assert comment["parent"] < index
+                assert post["comments"][comment["parent"]]["parent"] is None
+    assert sum(comment["parent"] is not None for post in posts for comment in post["comments"]) > 0
+
+
+def test_render_feed_card():
+    post = {"username": "Ann <Admin>", "post_text": "x" * 250, "comments": [{}, {}]}
+    card = lxml_html.fragment_fromstring(render_feed_card(post, 7))
+
+    assert card.xpath("./div/@aria-posinset") == ["7"]
+    assert visible_text(card.xpath(".//*[@data-ad-rendering-role='profile_name']")[0]) == "Ann <Admin>"
+    message = card.xpath(".//*[@data-ad-rendering-role='story_message']")[0]
+    assert visible_text(message).endswith("See more")
+    assert "2 comments" in visible_text(card)
+
+
+def test_render_feed_card_short_post_without_comments():
+    card = render_feed_card({"username": "Bo", "post_text": "Hi", "comments": []}, 1)
+    assert "See more" not in card
+    assert "comment" not in card
+
+
+def test_render_dialog_round_trips_through_the_parser():
+    for post in generate_fixtures(6, 4, seed=5, max_replies=2):
+        parsed = parse_popup_html(render_dialog(post), date=post["date"])
+        assert compare_posts([post], [parsed]) == []
+
+
+def test_write_and_load_fixtures(tmp_path):
+    posts = generate_fixtures(3, 2, seed=9)
+    write_fixtures(str(tmp_path), posts)
+    fixtures = load_fixtures(str(tmp_path))
+
+    assert [fixture["expected"] for fixture in fixtures] == posts
+    assert [fixture["name"] for fixture in fixtures] == ["synthetic-00000", "synthetic-00001", "synthetic-00002"]
+    assert all(fixture["feed_html"] and fixture["dialog_html"] for fixture in fixtures)
+
+
+def test_prepare_dialog_collapses_replies_and_batches_comments():
+    post = generate_fixtures(1, 6, seed=4, max_replies=2)[0]
+    reply_count = sum(comment["parent"] is not None for comment in post["comments"])
+    dialog, batches, replies = _prepare_dialog(render_dialog(post), 0, comment_batch=2)
+
+    assert len(batches) == 2  # 6 top-level threads, 2 in the dialog and 2 per batch
+    assert 'role="status"' in dialog
+    assert sum(len(lxml_html.fragment_fromstring(reply).xpath(".//div[@role='article']")) for reply in replies) \
+        == reply_count
+
+
+def test_render_graphql_payload():
+    posts = generate_fixtures(2, 1, seed=0)
+    payload = render_graphql_payload(posts, 10)
+    assert payload.startswith("for (;;);")
+    stories = [json.loads(line)["data"]["node"] for line in payload[len("for (;;);"):].splitlines()]
+    assert [story["post_id"] for story in stories] == ["10", "11"]
+    assert stories[0]["creation_time"] == int(parse_tooltip_date(posts[0]["date"]))
+
+
+def test_compare_posts_identical():
+    posts = generate_fixtures(3, 2, seed=0, max_replies=1)
+    assert compare_posts(posts, json.loads(json.dumps(posts))) == []
+
+
+def test_compare_posts_describes_differences():
+    expected = generate_fixtures(2, 2, seed=0)
+    scraped = json.loads(json.dumps(expected))
+    scraped[0]["post_text"] = "changed"
+    scraped[1]["comments"][1]["parent"] = 0
+    mismatches = compare_posts(expected, scraped)
+
+    assert any(mismatch.startswith("[0].post_text:") for mismatch in mismatches)
+    assert "[1].comments[1].parent: 0 != None" in mismatches
+    assert compare_posts(expected, scraped[:1])[0] == "posts: 1 scraped != 2 expected"
+
+
+def test_compare_posts_feed_card_posts():
+    expected = generate_fixtures(1, 3, seed=0)
+    card = {"username": expected[0]["username"], "post_text": expected[0]["post_text"], "date": "1h",
+            "comments": [], "comment_count": 3}
+    assert compare_posts(expected, [card]) == []
+    card["comment_count"] = 2
+    assert compare_posts(expected, [card]) == ["[0].comment_count: 2 != 3"]
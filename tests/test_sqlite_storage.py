@@ -0,0 +1,113 @@
+"""The SQLite sink: idempotent upserts, comment replacement and the migration of older databases."""
+import sqlite3
+
+from sqlite_storage import SqliteSink, load_post, migrate
+
+
+def post(text: str = "Hello group", comments: int = 2, **fields) -> dict:
+    data = {"username": "Ann", "post_text": text, "date": "Monday, March 3, 2025 at 4:12\u202fPM",
+            "comments": [{"username": f"C{index}", "comment_text": f"comment {index}", "parent": None}
+                         for index in range(comments)]}
+    data.update(fields)
+    return data
+
+
+def rows(path: str, table: str) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_rewriting_a_post_updates_its_row(tmp_path):
+    path = str(tmp_path / "data.db")
+    sink = SqliteSink(path)
+    sink.write(post())
+    sink.close()
+    sink = SqliteSink(path)  # a later run scrapes it again
+    sink.write(post())
+    sink.close()
+    assert rows(path, "posts") == 1
+
+
+def test_a_changing_label_date_does_not_add_rows(tmp_path):
+    # fast mode: the date estimated from "3h" differs on every run, the key must not
+    path = str(tmp_path / "data.db")
+    sink = SqliteSink(path)
+    sink.write(post(date="", date_iso="2025-03-03T13:00:00", date_precision="hour", date_label="3h"))
+    sink.write(post(date="", date_iso="2025-03-03T12:00:00", date_precision="hour", date_label="4h"))
+    sink.close()
+    assert rows(path, "posts") == 1
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT date_iso, date_precision FROM posts").fetchone() == \
+            ("2025-03-03T12:00:00", "hour")
+
+
+def test_posts_with_a_permalink_are_keyed_by_their_id(tmp_path):
+    path = str(tmp_path / "data.db")
+    sink = SqliteSink(path)
+    sink.write(post(permalink="https://www.facebook.com/groups/1/posts/42/"))
+    sink.write(post(text="Hello group (edited)", permalink="https://www.facebook.com/groups/1/posts/42/"))
+    sink.write(post(permalink="https://www.facebook.com/groups/1/posts/43/"))
+    sink.close()
+    assert rows(path, "posts") == 2
+
+
+def test_comments_are_replaced(tmp_path):
+    path = str(tmp_path / "data.db")
+    sink = SqliteSink(path)
+    sink.write(post(comments=3))
+    sink.write(post(comments=1))
+    sink.close()
+
+    assert rows(path, "comments") == 1
+    with sqlite3.connect(path) as connection:
+        stored = load_post(connection, 1)
+    assert stored["comments"] == [{"username": "C0", "comment_text": "comment 0", "parent": None}]
+    assert stored["date"] == post()["date"]
+
+
+def test_replies_keep_their_parent(tmp_path):
+    path = str(tmp_path / "data.db")
+    data = post(comments=2)
+    data["comments"][1]["parent"] = 0
+    sink = SqliteSink(path)
+    sink.write(data)
+    sink.close()
+    with sqlite3.connect(path) as connection:
+        assert [comment["parent"] for comment in load_post(connection, 1)["comments"]] == [None, 0]
+
+
+def test_batches_commit_by_size(tmp_path):
+    path = str(tmp_path / "data.db")
+    sink = SqliteSink(path, batch_size=2, batch_seconds=3600)
+    sink.write(post(text="one"))
+    assert rows(path, "posts") == 0
+    sink.write(post(text="two"))
+    assert rows(path, "posts") == 2
+    sink.close()
+
+
+def test_migrates_an_older_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as connection:
+        connection.executescript("""
+            CREATE TABLE posts (id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL UNIQUE, username TEXT,
+                                post_text TEXT, date TEXT, first_scraped REAL, last_scraped REAL);
+            CREATE TABLE comments (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL REFERENCES posts(id),
+                                   position INTEGER NOT NULL, username TEXT, comment_text TEXT,
+                                   UNIQUE (post_id, position));
+            INSERT INTO posts (fingerprint, username, post_text, date) VALUES ('old', 'Bo', 'Old post', '');
+        """)
+
+    sink = SqliteSink(path)
+    sink.write(post())
+    sink.close()
+
+    with sqlite3.connect(path) as connection:
+        posts_columns = {row[1] for row in connection.execute("PRAGMA table_info(posts)")}
+        comments_columns = {row[1] for row in connection.execute("PRAGMA table_info(comments)")}
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list(posts)")}
+        assert {"date_iso", "timestamp", "date_precision"} <= posts_columns
+        assert "parent" in comments_columns
+        assert "posts_timestamp_index" in indexes
+        assert connection.execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 2
+        migrate(connection)  # idempotent
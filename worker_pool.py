@@ -0,0 +1,277 @@
+"""
+Parallel Worker Pool
+
+Scrapes several Facebook groups at the same time.  Every worker is its own process with its own
+Chrome profile directory, takes group links from a shared task queue, and sends every scraped
+post back through a result queue to a single writer (the output sink) in the main process.
+
+Usage:
+    python worker_pool.py
+
+Settings (settings.json):
+- group_scrape_links: list of group URLs (falls back to group_scrape_link)
+- workers:            number of browsers to run at once
+- profile_dir:        directory for the per-worker Chrome profiles
+- cookie login is required, run main.py once first so storage/cookies.json exists
+
+Ctrl-C asks every worker to stop after its current post; every worker quits its driver on the way out.
+"""
+import json
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import time
+
+from colorama import Fore, Style
+
+from output_sinks import open_sink
+from dedup import DedupIndex
+from fingerprint import post_key
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def worker_main(worker_id: int, task_queue, result_queue, stop_event, options: dict) -> None:
+    """
+    Runs one browser: logs in with the stored cookies, then scrapes group links from task_queue until it is empty
+    or stop_event is set.  Results are sent to result_queue as (kind, worker_id, payload) tuples.
+    """
+    # Ctrl-C is handled by the main process (which sets stop_event), terminate() still runs the finally block
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _raise_system_exit)
+
+    from selenium.webdriver import ActionChains
+    from scraper_functions import driver_init, login, scrape_feed
+    from adaptive_wait import waits
+    from locators import locators
+    from date_engine import dates
+    from resource_policy import ResourcePolicy
+    from checkpoint import Checkpoint, checkpoint_path
+
+    # start from the latencies and locator orders learned by earlier runs (only the single-browser run writes them back)
+    waits.load(options.get("wait_stats_file", ""))
+    locators.load(options.get("locator_stats_file", ""))
+    dates.locale, dates.resolution = options.get("date_locale", "en"), options.get("date_resolution", "auto")
+    driver = None
+    checkpoint = None
+    resource_policy = None
+    try:
+        resource_policy = ResourcePolicy(options.get("resource_policy", "full"), options.get("resource_block_extra", []))
+        profile = os.path.join(options["profile_dir"], f"worker-{worker_id}")
+        driver = driver_init(window_size=options["window_size"], headless=options["headless"], user_data_dir=profile,
+                             resource_policy=resource_policy)
+        actions = ActionChains(driver)
+        logged_in = False
+
+        while not stop_event.is_set():
+            try:
+                group_link = task_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if not logged_in:
+                login(driver, group_link, use_cookies=True)
+                logged_in = True
+            else:
+                driver.get(group_link)
+            result_queue.put(("group", worker_id, group_link))
+
+            if checkpoint is not None:
+                checkpoint.close()
+            checkpoint = None
+            if options.get("checkpoint_file"):
+                checkpoint = Checkpoint(checkpoint_path(options["checkpoint_file"], group_link), group_link,
+                                        every=options.get("checkpoint_every", 25), resume=options.get("resume", True))
+
+            scrape_feed(driver, actions, lambda post: result_queue.put(("post", worker_id, post)),
+                        extraction_mode=options["extraction_mode"], snapshot_dir=options["snapshot_dir"],
+                        debug=options["debug"], should_stop=stop_event.is_set,
+                        use_observer=options.get("feed_observer", True), checkpoint=checkpoint,
+                        max_comments=options.get("max_comments", 0), comment_timeout=options.get("comment_timeout", 30.0),
+                        fast_mode=options.get("fast_mode", False),
+                        fast_comment_threshold=options.get("fast_comment_threshold", 0),
+                        resource_policy=resource_policy)
+    except SystemExit:
+        pass
+    except Exception as e:
+        result_queue.put(("error", worker_id, str(e)))
+    finally:
+        if checkpoint is not None:
+            try:
+                checkpoint.close()
+            except Exception:
+                pass
+        if driver is not None:
+            try:
+                resource_policy.collect(driver)
+                result_queue.put(("resources", worker_id, resource_policy.summary()))
+            except Exception:
+                pass
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        result_queue.put(("done", worker_id, None))
+
+
+class ThroughputReport:
+    """Keeps per-worker and aggregate post counts and prints posts/min."""
+
+    def __init__(self, worker_count: int):
+        self.started = time.monotonic()
+        self.worker_started: dict[int, float] = {}
+        self.worker_posts = {worker_id: 0 for worker_id in range(worker_count)}
+
+    def start_worker(self, worker_id: int) -> None:
+        # a worker's rate is measured from its first group, not from when its browser was launched
+        self.worker_started.setdefault(worker_id, time.monotonic())
+
+    def add_post(self, worker_id: int) -> None:
+        self.worker_posts[worker_id] += 1
+
+    @staticmethod
+    def _rate(posts: int, started: float) -> float:
+        minutes = max(time.monotonic() - started, 1e-6) / 60
+        return posts / minutes
+
+    def summary(self) -> str:
+        parts = [f"worker {worker_id}: {posts} posts "
+                 f"({self._rate(posts, self.worker_started.get(worker_id, self.started)):.1f}/min)"
+                 for worker_id, posts in self.worker_posts.items()]
+        total = sum(self.worker_posts.values())
+        parts.append(f"total: {total} posts ({self._rate(total, self.started):.1f}/min)")
+        return " | ".join(parts)
+
+
+def run_pool(group_links: list[str], sink, options: dict, workers: int = 2, report_interval: float = 30.0,
+             dedup: DedupIndex = None) -> int:
+    """
+    Scrapes every group link with up to 'workers' browsers and writes all posts to 'sink' from this process.
+    If a DedupIndex is given, posts that were stored before (by any worker or an earlier run) are dropped.
+
+    Returns:
+        The number of posts written.
+    """
+    workers = max(1, min(workers, len(group_links)))
+    context = mp.get_context("spawn")
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+    stop_event = context.Event()
+    for group_link in group_links:
+        task_queue.put(group_link)
+
+    processes = [context.Process(target=worker_main, args=(worker_id, task_queue, result_queue, stop_event, options),
+                                 name=f"scraper-worker-{worker_id}")
+                 for worker_id in range(workers)]
+    for process in processes:
+        process.start()
+
+    report = ThroughputReport(workers)
+    running = set(range(workers))
+    last_report = time.monotonic()
+    written = 0
+
+    def handle(message) -> None:
+        nonlocal written
+        kind, worker_id, payload = message
+        if kind == "post":
+            if dedup is not None and not dedup.add(post_key(payload)):
+                return
+            sink.write(payload)
+            report.add_post(worker_id)
+            written += 1
+        elif kind == "group":
+            report.start_worker(worker_id)
+            print(f"{Fore.BLUE}Worker {worker_id} started {payload}{Style.RESET_ALL}")
+        elif kind == "resources":
+            print(f"{Fore.CYAN}Worker {worker_id}: {payload}{Style.RESET_ALL}")
+        elif kind == "error":
+            print(f"{Fore.RED}Worker {worker_id} failed: {payload}{Style.RESET_ALL}")
+        elif kind == "done":
+            running.discard(worker_id)
+            print(f"{Fore.GREEN}Worker {worker_id} finished.{Style.RESET_ALL}")
+
+    try:
+        while running:
+            try:
+                handle(result_queue.get(timeout=1))
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+            if time.monotonic() - last_report >= report_interval:
+                print(f"{Fore.CYAN}{report.summary()}{Style.RESET_ALL}")
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        print(f"{Fore.YELLOW}Stopping workers after their current post (Ctrl-C again to force).{Style.RESET_ALL}")
+        stop_event.set()
+        try:
+            deadline = time.monotonic() + 60
+            while running and time.monotonic() < deadline:
+                try:
+                    handle(result_queue.get(timeout=1))
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        break
+        except KeyboardInterrupt:
+            pass
+    finally:
+        for process in processes:
+            process.join(timeout=15)
+            if process.is_alive():
+                # SIGTERM raises SystemExit in the worker, so its finally block still quits the driver
+                process.terminate()
+                process.join(timeout=15)
+        sink.flush()
+        print(f"{Fore.CYAN}{report.summary()}{Style.RESET_ALL}")
+
+    return written
+
+
+if __name__ == "__main__":
+    with open('settings.json', 'r') as settings_file:
+        settings = json.load(settings_file)[0]
+
+    links = settings.get('group_scrape_links') or [settings['group_scrape_link']]
+    if not os.path.exists("storage/cookies.json"):
+        print(f"{Fore.RED}storage/cookies.json not found. Run main.py once to log in before using the worker pool.{Style.RESET_ALL}")
+        sys.exit(1)
+
+    worker_options = {
+        "window_size": tuple(settings.get('window_size', ())),
+        "headless": settings.get('headless_bool', False),
+        "extraction_mode": settings.get('extraction_mode', 'selenium'),
+        "snapshot_dir": settings.get('snapshot_dir', ''),
+        "debug": settings.get('debug', False),
+        "profile_dir": settings.get('profile_dir', 'storage/profiles'),
+        "wait_stats_file": settings.get('wait_stats_file', 'storage/wait_stats.json'),
+        "locator_stats_file": settings.get('locator_stats_file', 'storage/locator_stats.json'),
+        "feed_observer": settings.get('feed_observer', True),
+        "checkpoint_file": settings.get('checkpoint_file', 'storage/checkpoint.json'),
+        "checkpoint_every": settings.get('checkpoint_every', 25),
+        "resume": settings.get('resume', True),
+        "max_comments": settings.get('max_comments', 0),
+        "comment_timeout": settings.get('comment_timeout', 30.0),
+        "fast_mode": settings.get('fast_mode', False),
+        "fast_comment_threshold": settings.get('fast_comment_threshold', 0),
+        "date_locale": settings.get('date_locale', 'en'),
+        "date_resolution": settings.get('date_resolution', 'auto'),
+        "resource_policy": settings.get('resource_policy', 'full'),
+        "resource_block_extra": settings.get('resource_block_extra', []),
+    }
+    output_sink = open_sink(settings.get('output_file', 'data.json'), settings.get('output_format', 'json'),
+                            fsync_interval=settings.get('fsync_interval', 5.0),
+                            segment_size=settings.get('segment_size', 5000),
+                            batch_size=settings.get('sqlite_batch_size', 50),
+                            batch_seconds=settings.get('sqlite_batch_seconds', 10.0))
+    dedup_index = DedupIndex(settings['dedup_index'], capacity=settings.get('dedup_capacity', 10_000_000),
+                             error_rate=settings.get('dedup_error_rate', 0.001)) if settings.get('dedup_index') else None
+    try:
+        run_pool(links, output_sink, worker_options, workers=settings.get('workers', 2),
+                 report_interval=settings.get('report_interval', 30.0), dedup=dedup_index)
+    finally:
+        output_sink.close()
+        if dedup_index is not None: dedup_index.close()